@@ -5,6 +5,13 @@ Batch Image Optimization Script for Sanity Integration (Workstream 3.2)
 - Resizes, compresses, and converts images to WebP (or keeps original if preferred)
 - Outputs optimized images to sanity_image_staging/optimized/
 - Designed for batch processing and future integration with Sanity upload
+- Incremental: a manifest in the output directory records each source's
+  content hash, the output parameters and the output hash, so re-runs skip
+  unchanged sources, remove outputs whose source is gone, and only encode
+  new or changed files (in parallel, one process per core)
+
+Usage:
+    python batch_optimize_images.py [--workers N] [--force]
 
 Requirements:
 - Python 3.x
@@ -13,38 +20,202 @@ Requirements:
 TODO: Integrate with Sanity upload script after optimization is verified.
 """
 
+import argparse
+import hashlib
+import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 
 # Configuration
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))  # Go up one level from listings/
 SOURCE_DIR = os.path.join(PROJECT_ROOT, 'sanity_image_staging', 'images')
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, 'sanity_image_staging', 'optimized')
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, 'manifest.json')
 TARGET_SIZE = (1600, 1200)  # Example max dimensions (width, height)
 QUALITY = 85  # JPEG/WebP quality
+# libwebp effort 0-6; 6 is several times slower than the default 4 for a
+# few percent smaller files
+WEBP_METHOD = 4
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.webp')
 
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def output_params():
+    """Everything that affects the encoded output; a change re-encodes every source"""
+    return {"format": "WEBP", "target_size": list(TARGET_SIZE), "quality": QUALITY, "method": WEBP_METHOD}
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest():
+    """Manifest entries keyed by source file name; empty if missing or unreadable"""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable manifest {MANIFEST_PATH}: {e}")
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("files", {})
+
+def save_manifest(entries):
+    tmp_path = MANIFEST_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": entries}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
 def optimize_image(src_path, dest_path):
+    """Resize and encode one image; returns the output path, or None on failure"""
+    dest_path = os.path.splitext(dest_path)[0] + '.webp'
+    # Write next to the destination and rename, so an interrupted run
+    # never leaves a truncated file that looks up to date
+    tmp_path = dest_path + '.tmp'
     try:
         with Image.open(src_path) as img:
+            # JPEGs are decoded straight at the smallest 1/2-1/8 scale that is
+            # still at least TARGET_SIZE; no-op for other formats
+            img.draft(None, TARGET_SIZE)
             img = img.convert('RGB')
             img.thumbnail(TARGET_SIZE, Image.LANCZOS)
-            dest_path = os.path.splitext(dest_path)[0] + '.webp'
-            img.save(dest_path, 'WEBP', quality=QUALITY, method=6)
+            img.save(tmp_path, 'WEBP', quality=QUALITY, method=WEBP_METHOD)
+            os.replace(tmp_path, dest_path)
             print(f"Optimized: {src_path} -> {dest_path}")
+            return dest_path
     except Exception as e:
         print(f"Error optimizing {src_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+def _stat_fields(path, prefix):
+    stat = os.stat(path)
+    return {f"{prefix}_size": stat.st_size, f"{prefix}_mtime_ns": stat.st_mtime_ns}
+
+def is_up_to_date(entry, src_path, dest_path, params):
+    """Cheap check from file stats alone: no reads, no hashing"""
+    if not entry or entry.get("params") != params or entry.get("output") != os.path.basename(dest_path):
+        return False
+    try:
+        return (_stat_fields(src_path, "source").items() <= entry.items()
+                and _stat_fields(dest_path, "output").items() <= entry.items())
+    except OSError:
+        return False
 
-def batch_optimize():
-    for fname in os.listdir(SOURCE_DIR):
-        if fname.lower().endswith(SUPPORTED_FORMATS):
-            src_path = os.path.join(SOURCE_DIR, fname)
-            dest_path = os.path.join(OUTPUT_DIR, fname)
-            optimize_image(src_path, dest_path)
+def process_source(src_path, dest_path, entry, params):
+    """
+    Bring one output up to date (runs in a worker process).
+
+    Sources whose stats changed but whose content did not (e.g. touched or
+    re-copied) keep their existing output. Returns (manifest entry, encoded)
+    or (None, False) on failure.
+    """
+    source_sha256 = file_sha256(src_path)
+    if (entry and entry.get("source_sha256") == source_sha256 and entry.get("params") == params
+            and os.path.exists(dest_path) and file_sha256(dest_path) == entry.get("output_sha256")):
+        encoded = False
+    elif optimize_image(src_path, dest_path):
+        encoded = True
+    else:
+        return None, False
+
+    new_entry = {
+        "source_sha256": source_sha256,
+        "output": os.path.basename(dest_path),
+        "output_sha256": file_sha256(dest_path),
+        "params": params,
+    }
+    new_entry.update(_stat_fields(src_path, "source"))
+    new_entry.update(_stat_fields(dest_path, "output"))
+    return new_entry, encoded
+
+def batch_optimize(workers=None, force=False):
+    params = output_params()
+    previous = {} if force else load_manifest()
+    entries = {}
+
+    # Each source maps to <stem>.webp; the first of any same-stem sources wins
+    sources = {}
+    outputs = {}
+    for fname in sorted(os.listdir(SOURCE_DIR)):
+        if not fname.lower().endswith(SUPPORTED_FORMATS):
+            continue
+        output = os.path.splitext(fname)[0] + '.webp'
+        if output in outputs:
+            print(f"Warning: Skipping {fname}: {outputs[output]} already produces {output}")
+            continue
+        outputs[output] = fname
+        sources[fname] = output
+
+    pending = []
+    for fname, output in sources.items():
+        src_path = os.path.join(SOURCE_DIR, fname)
+        dest_path = os.path.join(OUTPUT_DIR, output)
+        if is_up_to_date(previous.get(fname), src_path, dest_path, params):
+            entries[fname] = previous[fname]
+        else:
+            pending.append((fname, src_path, dest_path))
+
+    encoded = failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (fname, pool.submit(process_source, src_path, dest_path, previous.get(fname), params))
+                for fname, src_path, dest_path in pending
+            ]
+            for fname, future in futures:
+                try:
+                    entry, was_encoded = future.result()
+                except Exception as e:
+                    # e.g. the source vanished or became unreadable after listing;
+                    # count it and keep going so the manifest still gets saved
+                    print(f"Error processing {fname}: {e}")
+                    entry = None
+                if entry is None:
+                    failed += 1
+                    continue
+                entries[fname] = entry
+                encoded += was_encoded
+
+    # Outputs this tool produced for sources that no longer exist
+    removed = 0
+    for fname, entry in previous.items():
+        output = entry.get("output")
+        # Still-present sources (even ones that failed this run) keep their output,
+        # as does a file another source now produces
+        if fname in sources or not output or output in outputs:
+            continue
+        output_path = os.path.join(OUTPUT_DIR, output)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            print(f"Removed orphaned output: {output_path}")
+            removed += 1
+
+    save_manifest(entries)
+    print(f"{len(sources)} sources: {encoded} encoded, {len(sources) - encoded - failed} up to date, "
+          f"{failed} failed, {removed} orphaned outputs removed")
+    return failed == 0
 
 if __name__ == "__main__":
-    batch_optimize()
+    parser = argparse.ArgumentParser(description="Optimize staged images to WebP for Sanity")
+    parser.add_argument("--workers", type=int, default=None, help="encoder processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-encode everything")
+    args = parser.parse_args()
+
+    success = batch_optimize(workers=args.workers, force=args.force)
     print("Batch image optimization complete.")
+    sys.exit(0 if success else 1)
@@ -0,0 +1,160 @@
+"""
+Asset Upload Cache
+Sustainable Digital Nomads Directory - Sanity Asset Deduplication
+
+Persistent, content-addressed cache mapping the SHA-256 of uploaded image
+bytes to the Sanity asset `_id` it produced. Checked before every upload so
+unchanged images (and images shared between a listing's primary image and
+gallery) are only ever uploaded once.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Any, Union
+
+from migration_config import OUTPUT_DIR
+
+DEFAULT_CACHE_FILE = OUTPUT_DIR / "asset_cache.json"
+
+# Entries older than this are re-checked against the dataset before reuse
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def hash_bytes(data: Union[bytes, memoryview]) -> str:
+    """SHA-256 hex digest of in-memory content"""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(file_path: Path) -> str:
+    """SHA-256 hex digest of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AssetUploadCache:
+    """
+    Thread-safe content hash -> Sanity asset ID cache persisted as JSON.
+
+    Entries record when they were last confirmed to exist in the dataset;
+    `verify_stale()` re-checks all expired entries with a single bulk lookup
+    and drops the ones whose assets were deleted.
+    """
+
+    def __init__(self, cache_file: Path = DEFAULT_CACHE_FILE,
+                 max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+                 autosave_every: int = 20):
+        self.cache_file = Path(cache_file)
+        self.max_age_seconds = max_age_seconds
+        self.autosave_every = autosave_every
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+        self._lock = threading.Lock()
+        # Serializes writers so an older snapshot never replaces a newer one
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+
+        self.load()
+
+    def load(self):
+        """Load cache entries from disk, starting empty if the file is missing or corrupt"""
+        if not self.cache_file.exists():
+            return
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable asset cache {self.cache_file}: {e}")
+            self.entries = {}
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self._save_lock:
+            with self._lock:
+                payload = {"version": 1, "entries": dict(self.entries)}
+                self._unsaved = 0
+
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(
+                prefix=self.cache_file.name + ".", suffix=".tmp", dir=self.cache_file.parent
+            )
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(payload, f)
+                os.replace(tmp_file, self.cache_file)
+            except BaseException:
+                Path(tmp_file).unlink(missing_ok=True)
+                raise
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the cached asset ID for a content digest, if any"""
+        with self._lock:
+            entry = self.entries.get(digest)
+            if entry:
+                self.stats["hits"] += 1
+                return entry["asset_id"]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, digest: str, asset_id: str, filename: Optional[str] = None):
+        """Record the asset produced by uploading content with the given digest"""
+        with self._lock:
+            self.entries[digest] = {
+                "asset_id": asset_id,
+                "filename": filename,
+                "verified_at": time.time()
+            }
+            self.stats["stored"] += 1
+            self._unsaved += 1
+            should_save = self.autosave_every and self._unsaved >= self.autosave_every
+            if should_save:
+                # Claim this batch so other threads don't also decide to save it
+                self._unsaved = 0
+
+        if should_save:
+            self.save()
+
+    def verify_stale(self, client) -> int:
+        """
+        Confirm expired entries still exist in the dataset.
+
+        Uses one bulk `get_many` lookup for all stale asset IDs, drops the
+        entries whose assets are gone and refreshes the rest.
+
+        Returns:
+            Number of entries evicted
+        """
+        now = time.time()
+        with self._lock:
+            stale = {
+                digest: entry["asset_id"]
+                for digest, entry in self.entries.items()
+                if now - entry.get("verified_at", 0) > self.max_age_seconds
+            }
+
+        if not stale:
+            return 0
+
+        existing = client.get_many(list(stale.values()))
+
+        evicted = 0
+        with self._lock:
+            for digest, asset_id in stale.items():
+                if asset_id in existing:
+                    self.entries[digest]["verified_at"] = now
+                else:
+                    self.entries.pop(digest, None)
+                    evicted += 1
+            self.stats["evicted"] += evicted
+
+        self.save()
+        return evicted
@@ -0,0 +1,265 @@
+"""
+Async Sanity Client
+Sustainable Digital Nomads Directory - Sanity API Access
+
+Asyncio-native counterpart of `SanityClient` built on a bounded aiohttp
+connection pool, so hundreds of uploads and mutations can be in flight
+over keep-alive connections without a thread per request.
+"""
+
+import asyncio
+import json
+import os
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Any
+from urllib.parse import quote
+
+import aiohttp
+
+from migrate_listings_to_sanity import SanityAPIError, SanityTransaction, UploadSource, open_upload_body
+from sanity_rate_limit import ASSET, MUTATION, QUERY, RequestSlot, SanityRateLimiter
+
+# HTTP status codes retried with backoff, matching SanityClient's urllib3 Retry
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Size of each chunk read from disk while streaming an upload
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+@dataclass
+class ResponseSnapshot:
+    """
+    Minimal, already-read view of an aiohttp response.
+
+    Attached to `SanityAPIError.response` so callers can inspect
+    `status_code`, `headers` and `text` the same way as for requests.
+    """
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    text: str = ""
+
+class AsyncSanityClient:
+    """
+    Awaitable Sanity client with the same API surface as `SanityClient`.
+
+    Use as an async context manager (or call `close()`) so the pooled
+    connections are released:
+
+        async with AsyncSanityClient(project_id, dataset, token, api_version) as client:
+            asset = await client.assets_upload(data, "image/jpeg", "photo.jpg")
+    """
+
+    def __init__(self, project_id: str, dataset: str, token: str, api_version: str,
+                 use_cdn: bool = False, max_connections: int = 100,
+                 max_connections_per_host: int = 20, timeout: float = 120,
+                 max_retries: int = 3, backoff_factor: float = 1.0,
+                 rate_limiter: Optional[SanityRateLimiter] = None, api_host: Optional[str] = None):
+        self.project_id = project_id
+        self.dataset = dataset
+        self.token = token
+        self.api_version = api_version
+        # api_host overrides the API origin, e.g. to target fake_sanity_server offline
+        self.api_host = (api_host or f"https://{project_id}.api.sanity.io").rstrip("/")
+        self.base_url = f"{self.api_host}/v{api_version}/data"
+        self.cdn_url = f"https://{project_id}.apicdn.sanity.io/v{api_version}/data" if use_cdn and not api_host else None
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.rate_limiter = rate_limiter
+
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> 'AsyncSanityClient':
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session lazily, inside the running event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=self.timeout
+            )
+        return self._session
+
+    async def close(self):
+        """Close the session and release pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _limited(self, category: str):
+        """Rate-limit context for one request attempt of the given category"""
+        if self.rate_limiter is None:
+            return nullcontext(RequestSlot())
+        return self.rate_limiter.limit_async(category)
+
+    async def _make_request(self, method: str, url: str, category: str = QUERY, **kwargs) -> Dict[str, Any]:
+        """Make a request with retry logic and error handling"""
+        session = self._get_session()
+
+        # Streamed bodies are consumed by each attempt, so build a fresh one every time
+        body_factory = kwargs.pop("body_factory", None)
+
+        for attempt in range(self.max_retries + 1):
+            if body_factory is not None:
+                kwargs["data"] = body_factory()
+            try:
+                async with self._limited(category) as slot, session.request(method, url, **kwargs) as response:
+                    slot.ok = response.status < 500
+                    if response.status < 400:
+                        return await response.json(content_type=None)
+
+                    snapshot = ResponseSnapshot(
+                        status_code=response.status,
+                        headers=dict(response.headers),
+                        text=await response.text()
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+                    continue
+                raise SanityAPIError(f"Request failed: {str(e)}")
+
+            if snapshot.status_code == 429 and self.rate_limiter is not None:
+                self.rate_limiter.on_throttle(category, self._retry_after(snapshot))
+
+            if snapshot.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(snapshot, attempt))
+                continue
+
+            raise SanityAPIError(
+                f"API request failed: {snapshot.status_code} for url: {url}",
+                response=snapshot
+            )
+
+        raise SanityAPIError(f"Max retries exceeded for url: {url}")
+
+    def _retry_after(self, snapshot: ResponseSnapshot) -> Optional[float]:
+        """Seconds requested by a Retry-After header, if present and numeric"""
+        retry_after = snapshot.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return None
+
+    def _retry_delay(self, snapshot: ResponseSnapshot, attempt: int) -> float:
+        """Honour Retry-After when the API sends it, otherwise back off exponentially"""
+        retry_after = self._retry_after(snapshot)
+        if retry_after is not None:
+            return retry_after
+        return self.backoff_factor * (2 ** attempt)
+
+    def transaction(self) -> SanityTransaction:
+        """Start a new transaction; `await transaction.commit()` to send it"""
+        return SanityTransaction(self)
+
+    async def commit_transaction(self, mutations: List[Dict[str, Any]], return_docs: bool = False) -> Dict[str, Any]:
+        """Commit a transaction with mutations"""
+        url = f"{self.base_url}/mutate/{self.dataset}"
+        params = {"returnDocuments": "true"} if return_docs else {}
+        return await self._make_request("POST", url, category=MUTATION, json={"mutations": mutations}, params=params)
+
+    async def create(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new document"""
+        return await self.commit_transaction([{"create": document}])
+
+    async def create_or_replace(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Create or replace an existing document"""
+        return await self.commit_transaction([{"createOrReplace": document}])
+
+    async def delete(self, document_id: str) -> Dict[str, Any]:
+        """Delete a document"""
+        return await self.commit_transaction([{"delete": {"id": document_id}}])
+
+    async def get_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get a document by ID"""
+        url = f"{self.cdn_url or self.base_url}/doc/{self.dataset}/{quote(document_id, safe='')}"
+        try:
+            return await self._make_request("GET", url)
+        except SanityAPIError as e:
+            if e.response and e.response.status_code == 404:
+                return None
+            raise
+
+    async def query(self, groq: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Run a GROQ query and return its result"""
+        url = f"{self.cdn_url or self.base_url}/query/{self.dataset}"
+        query_params = {"query": groq}
+        for name, value in (params or {}).items():
+            query_params[f"${name}"] = json.dumps(value)
+        result = await self._make_request("GET", url, params=query_params)
+        return result.get("result")
+
+    async def assets_upload(self, file_content: UploadSource, content_type: str = "image/jpeg",
+                            filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload an asset (image)
+
+        Accepts the same sources as `SanityClient.assets_upload`. Anything other
+        than plain bytes is streamed in chunks with a fixed Content-Length, so
+        only one chunk per upload is held in memory.
+        """
+        url = f"{self.api_host}/v{self.api_version}/assets/images/{self.dataset}"
+        headers = {"Content-Type": content_type}
+
+        params = {}
+        if filename:
+            params["filename"] = filename
+
+        try:
+            with open_upload_body(file_content) as body:
+                if isinstance(body, bytes):
+                    body_factory = lambda: body
+                else:
+                    start = body.tell()
+                    length = _remaining_length(body, start)
+                    if length is not None:
+                        headers["Content-Length"] = str(length)
+
+                    def body_factory():
+                        body.seek(start)
+                        return _iter_chunks(body)
+
+                result = await self._make_request("POST", url, category=ASSET, body_factory=body_factory,
+                                                  headers=headers, params=params)
+                # The API wraps the asset in {"document": {...}}
+                return result.get("document", result)
+        except SanityAPIError as e:
+            raise SanityAPIError(f"Asset upload failed: {str(e)}", response=e.response)
+
+def _remaining_length(body, start: int) -> Optional[int]:
+    """Number of bytes left in a streamed body, if it can be determined"""
+    if hasattr(body, "__len__"):
+        return len(body)
+    try:
+        return os.fstat(body.fileno()).st_size - start
+    except (AttributeError, OSError, ValueError):
+        return None
+
+async def _iter_chunks(body) -> AsyncIterator[bytes]:
+    """Read a body in chunks off the event loop so disk reads never block it"""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, body.read, UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,117 @@
+"""
+Listing Transformer Benchmark
+Sustainable Digital Nomads Directory - Transform Throughput
+
+Micro-benchmark for ListingTransformer against the inline dict-building it
+replaced in migrate_listings_to_sanity. Both produce identical documents
+for merged_listings.json, which is checked before timing.
+
+Usage:
+    python benchmark_listing_transformer.py [--records 50000] [--repeat 5]
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(Path(__file__).parent))
+from listing_transformer import LISTING_TRANSFORMER, get_listing_doc_id
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+MERGED_LISTINGS_PATH = PROJECT_ROOT / "listings" / "merged_listings.json"
+
+def inline_transform(listing: Dict[str, Any]) -> Dict[str, Any]:
+    """The per-listing document construction previously duplicated in main() and test_migration()"""
+    doc_id = get_listing_doc_id(listing)
+    if not doc_id:
+        return None
+
+    sanity_doc = {
+        "_id": doc_id,
+        "_type": "listing",
+        "name": listing.get("name"),
+        "slug": {"_type": "slug", "current": listing.get("slug", doc_id)},
+        "descriptionShort": listing.get("description_short"),
+        "descriptionLong": listing.get("description_long"),
+        "address": listing.get("address_string"),
+        "city": listing.get("city"),
+        "country": listing.get("country"),
+        "postalCode": listing.get("postal_code"),
+        "category": listing.get("category"),
+        "website": listing.get("website_url"),
+        "phone": listing.get("phone_number"),
+        "status": listing.get("status", "active").lower(),
+        "sourceUrls": [url for url in listing.get("source_urls", []) if url and isinstance(url, str) and url.startswith("http")],
+        "digitalNomadFeatures": [feat for feat in listing.get("digital_nomad_features", []) if feat and isinstance(feat, str)],
+        "ecoFocusTags": [tag for tag in listing.get("eco_focus_tags", []) if tag and isinstance(tag, str)],
+    }
+
+    coords = listing.get("coordinates")
+    if coords and isinstance(coords, dict) and \
+       coords.get("latitude") is not None and coords.get("longitude") is not None:
+        try:
+            sanity_doc["location"] = {
+                "_type": "geopoint",
+                "lat": float(coords["latitude"]),
+                "lng": float(coords["longitude"])
+            }
+            if coords.get("altitude") is not None:
+                sanity_doc["location"]["alt"] = float(coords["altitude"])
+        except (ValueError, TypeError):
+            pass
+
+    s_rating = listing.get("sustainability_rating")
+    if s_rating is not None:
+        try:
+            sanity_doc["sustainabilityRating"] = float(s_rating)
+        except (ValueError, TypeError):
+            pass
+
+    return sanity_doc
+
+def time_best(function: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of `repeat` runs, with the cyclic GC paused like timeit does"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark listing -> Sanity document transformation")
+    parser.add_argument("--records", type=int, default=50000, help="number of records to transform per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per implementation (best is reported)")
+    args = parser.parse_args()
+
+    with open(MERGED_LISTINGS_PATH, 'r', encoding='utf-8') as f:
+        listings: List[Dict[str, Any]] = json.load(f)
+
+    # Parity check before timing anything
+    for listing in listings:
+        document, _ = LISTING_TRANSFORMER.transform(listing)
+        if document != inline_transform(listing):
+            print(f"❌ Output differs for listing {listing.get('name')}")
+            sys.exit(1)
+    print(f"✅ Transformer output matches inline builder for {len(listings)} listings")
+
+    records = (listings * (args.records // len(listings) + 1))[:args.records]
+
+    inline_seconds = time_best(lambda: [inline_transform(record) for record in records], args.repeat)
+    compiled_seconds = time_best(lambda: LISTING_TRANSFORMER.transform_all(records), args.repeat)
+
+    print(f"\nRecords per run: {len(records)} (best of {args.repeat})")
+    print(f"Inline builder:     {inline_seconds:.3f}s  ({len(records) / inline_seconds:,.0f} records/s)")
+    print(f"ListingTransformer: {compiled_seconds:.3f}s  ({len(records) / compiled_seconds:,.0f} records/s)")
+
+if __name__ == "__main__":
+    main()
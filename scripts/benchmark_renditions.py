@@ -0,0 +1,127 @@
+"""
+Rendition Parity Benchmark
+Sustainable Digital Nomads Directory - Draft-Mode Decoding
+
+Checks that RenditionEngine's JPEG draft-mode decoding produces the same
+rendition dimensions as a full-resolution decode and pixels within a PSNR
+threshold of it (compared before encoding, so codec noise does not hide
+differences), then times both.
+
+Usage:
+    python benchmark_renditions.py [paths ...] [--sizes large=1200x1200,...] [--min-psnr 40] [--draft-gap 1.0] [--repeat 3]
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+sys.path.append(str(Path(__file__).parent))
+from rendition_engine import DEFAULT_DRAFT_GAP, OutputFormat, RenditionEngine
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_IMAGE_DIR = PROJECT_ROOT / "sanity_image_staging" / "images"
+
+# Same sizes and formats as process-listing-images.py
+DEFAULT_SIZES = "large=1200x1200,medium=800x800,small=400x400,thumbnail=150x150"
+OUTPUT_FORMATS = [
+    OutputFormat('jpg', 'JPEG', {'quality': 85, 'optimize': True}),
+    OutputFormat('webp', 'WEBP', {'quality': 85}),
+]
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+def parse_sizes(spec: str) -> Dict[str, Tuple[int, int]]:
+    """Parse `name=WxH,name=WxH` into a sizes mapping"""
+    sizes = {}
+    for item in spec.split(','):
+        name, _, dimensions = item.partition('=')
+        width, _, height = dimensions.lower().partition('x')
+        sizes[name.strip()] = (int(width), int(height))
+    return sizes
+
+def collect_images(paths: List[str]) -> List[Path]:
+    images = []
+    for path in map(Path, paths or [DEFAULT_IMAGE_DIR]):
+        candidates = sorted(path.rglob('*')) if path.is_dir() else [path]
+        images += [p for p in candidates if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES]
+    return images
+
+def psnr(a: Image.Image, b: Image.Image) -> float:
+    """Peak signal-to-noise ratio in dB between two same-sized images (inf if identical)"""
+    a, b = a.convert('RGB'), b.convert('RGB')
+    squared = ImageStat.Stat(ImageChops.difference(a, b)).sum2
+    mse = sum(squared) / (a.width * a.height * 3)
+    return math.inf if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+def time_best(engine: RenditionEngine, images: List[Path], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for image_path in images:
+            engine.render(image_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time draft-mode JPEG decoding for renditions")
+    parser.add_argument("paths", nargs="*", help=f"image files or directories (default: {DEFAULT_IMAGE_DIR})")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="renditions as name=WxH,... (default: %(default)s)")
+    parser.add_argument("--min-psnr", type=float, default=40.0, help="lowest acceptable PSNR in dB")
+    parser.add_argument("--draft-gap", type=float, default=DEFAULT_DRAFT_GAP,
+                        help="minimum decoded size as a multiple of the largest rendition")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per mode (best is reported)")
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    images = collect_images(args.paths)
+    if not images:
+        print("❌ No images found")
+        sys.exit(1)
+
+    full = RenditionEngine(sizes, OUTPUT_FORMATS, draft_gap=None)
+    draft = RenditionEngine(sizes, OUTPUT_FORMATS, draft_gap=args.draft_gap)
+
+    worst = math.inf
+    full_pixels = draft_pixels = 0
+    failures = 0
+    for image_path in images:
+        full_image, full_size = full.decode(image_path)
+        draft_image, draft_full_size = draft.decode(image_path)
+        full_pixels += full_image.width * full_image.height
+        draft_pixels += draft_image.width * draft_image.height
+
+        expected = full.resize_cascade(full_image, full_size)
+        actual = draft.resize_cascade(draft_image, draft_full_size)
+        for name in sizes:
+            if expected[name].size != actual[name].size:
+                print(f"❌ {image_path.name} [{name}]: {actual[name].size} != {expected[name].size}")
+                failures += 1
+                continue
+            score = psnr(expected[name], actual[name])
+            worst = min(worst, score)
+            if score < args.min_psnr:
+                print(f"❌ {image_path.name} [{name}]: PSNR {score:.1f} dB below {args.min_psnr} dB")
+                failures += 1
+
+        if draft_image.size != full_image.size:
+            print(f"  {image_path.name}: decoded at {draft_image.size[0]}x{draft_image.size[1]} "
+                  f"instead of {full_image.size[0]}x{full_image.size[1]}")
+
+    if failures:
+        print(f"❌ {failures} rendition(s) out of parity")
+        sys.exit(1)
+    print(f"✅ {len(images)} images x {len(sizes)} sizes in parity (worst PSNR {worst:.1f} dB)")
+
+    full_seconds = time_best(full, images, args.repeat)
+    draft_seconds = time_best(draft, images, args.repeat)
+    print(f"\nDecoded megapixels: full {full_pixels / 1e6:.1f} MP, draft {draft_pixels / 1e6:.1f} MP")
+    print(f"Full decode:  {full_seconds:.3f}s  ({len(images) / full_seconds:.1f} images/s)")
+    print(f"Draft decode: {draft_seconds:.3f}s  ({len(images) / draft_seconds:.1f} images/s)")
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,7 @@ sys.path.append(str(PROJECT_ROOT))
 from scripts.test_sanity_auth import SanityAuthTester
 from scripts.migration_recovery import MigrationLogger, MigrationStatus
 from scripts.image_processing_pipeline import ImageProcessor, ImageProcessingConfig
+from scripts.listing_transformer import CSV_LISTING_TRANSFORMER
 
 class CompleteMigrationPipeline:
     """
@@ -203,28 +204,17 @@ class CompleteMigrationPipeline:
         listing_id = processed_listing.get('id', 'unknown')
 
         try:
-            # Parse source URLs
-            source_urls = self.parse_source_urls(processed_listing.get('source_urls', ''))
-
             # Get image processing results
             image_results = processed_listing.get('image_processing_results', {})
             primary_image = image_results.get('primary_image')
             gallery_images = image_results.get('gallery_images', [])
 
-            # Create Sanity document structure
-            sanity_doc = {
-                "_type": "listing",
-                "_id": listing_id,
-                "name": processed_listing.get('name', '').strip(),
-                "slug": {
-                    "_type": "slug",
-                    "current": listing_id.replace('_', '-').lower()
-                },
-                "sourceUrls": source_urls,
-                "status": "draft",
-                "createdAt": datetime.now(timezone.utc).isoformat(),
-                "updatedAt": datetime.now(timezone.utc).isoformat(),
-            }
+            # Create Sanity document structure from the CSV field mapping
+            sanity_doc, warnings = CSV_LISTING_TRANSFORMER.transform(processed_listing)
+            for warning in warnings:
+                self.logger.log_warning(warning.strip())
+            if sanity_doc is None:
+                return None
 
             # Add primary image if available
             if primary_image and primary_image.get('sanity_asset_id'):
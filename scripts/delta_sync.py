@@ -0,0 +1,282 @@
+"""
+Delta Sync
+Sustainable Digital Nomads Directory - Incremental Sanity Sync
+
+Fingerprints every transformed Sanity document with a canonical SHA-256
+hash (plus one hash per top-level field) and keeps the fingerprints in a
+local state file next to the remote `_rev` they were written as. The next
+sync only sends what changed:
+
+- new listings are created
+- changed listings get a minimal `patch` (set/unset of the changed fields)
+  guarded by `ifRevisionID`, falling back to createOrReplace on conflict
+- listings edited remotely since the last sync are replaced
+- tracked listings that disappeared from the source are deleted
+- everything else is skipped without a request
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from migration_config import OUTPUT_DIR
+
+DEFAULT_STATE_FILE = OUTPUT_DIR / "sync_state.json"
+
+# Written by Sanity itself, never part of a fingerprint
+SYSTEM_FIELDS = {"_id", "_rev", "_createdAt", "_updatedAt"}
+
+def canonical_json(value: Any) -> str:
+    """Stable JSON encoding: sorted keys, no whitespace, unicode kept as-is"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def fingerprint_document(document: Dict[str, Any]) -> Tuple[str, Dict[str, str]]:
+    """
+    Hash a document and each of its top-level fields.
+
+    Returns:
+        (document fingerprint, {field: field hash})
+    """
+    fields = {
+        name: hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+        for name, value in document.items()
+        if name not in SYSTEM_FIELDS
+    }
+    fingerprint = hashlib.sha256(canonical_json([document.get("_id"), fields]).encode("utf-8")).hexdigest()
+    return fingerprint, fields
+
+class SyncState:
+    """
+    Local record of what each document looked like when it was last synced.
+
+    Entries are `{fingerprint, fields, rev, synced_at}` keyed by document ID.
+    The file is scoped to one API host and dataset; a state written for a
+    different target is ignored rather than trusted.
+    """
+
+    def __init__(self, target: str, state_file: Path = DEFAULT_STATE_FILE):
+        self.target = target
+        self.state_file = Path(state_file)
+        self.documents: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self):
+        """Load entries from disk, starting empty if the file is missing, corrupt or for another target"""
+        if not self.state_file.exists():
+            return
+
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable sync state {self.state_file}: {e}")
+            return
+
+        if payload.get("target") != self.target:
+            print(f"Warning: Sync state {self.state_file} belongs to {payload.get('target')}, starting fresh")
+            return
+        self.documents = payload.get("documents", {})
+
+    def save(self):
+        """Write the state to disk atomically"""
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": 1, "target": self.target, "documents": self.documents}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return self.documents.get(document_id)
+
+    def record(self, document_id: str, fingerprint: str, fields: Dict[str, str], rev: Optional[str]):
+        """Remember the synced content and the revision it was written as"""
+        self.documents[document_id] = {
+            "fingerprint": fingerprint,
+            "fields": fields,
+            "rev": rev,
+            "synced_at": time.time()
+        }
+
+    def forget(self, document_id: str):
+        self.documents.pop(document_id, None)
+
+@dataclass
+class DeltaOperation:
+    """One planned change for a single document"""
+    kind: str  # "create" | "replace" | "patch" | "delete" | "unchanged"
+    document_id: str
+    reason: str = ""
+    document: Optional[Dict[str, Any]] = None
+    set_fields: Dict[str, Any] = field(default_factory=dict)
+    unset_fields: List[str] = field(default_factory=list)
+    if_revision_id: Optional[str] = None
+    fingerprint: Optional[str] = None
+    fields: Dict[str, str] = field(default_factory=dict)
+
+@dataclass
+class DeltaPlan:
+    """All planned operations, in source order followed by deletions"""
+    operations: List[DeltaOperation] = field(default_factory=list)
+
+    @property
+    def changes(self) -> List[DeltaOperation]:
+        """Operations that need a mutation"""
+        return [op for op in self.operations if op.kind != "unchanged"]
+
+    def counts(self) -> Dict[str, int]:
+        counts = {"create": 0, "replace": 0, "patch": 0, "delete": 0, "unchanged": 0}
+        for op in self.operations:
+            counts[op.kind] += 1
+        return counts
+
+@dataclass
+class DeltaResult:
+    """Outcome of applying a plan"""
+    applied: Dict[str, List[str]] = field(default_factory=lambda: {
+        "create": [], "replace": [], "patch": [], "delete": []
+    })
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    conflicts_replaced: int = 0
+    transactions: int = 0
+
+def plan_delta(documents: Iterable[Dict[str, Any]], state: SyncState,
+               remote_revisions: Dict[str, str], source_ids: Optional[Iterable[str]] = None,
+               full: bool = False, prune: bool = True) -> DeltaPlan:
+    """
+    Compare prepared documents with the sync state and remote revisions.
+
+    Args:
+        documents: Final documents to sync
+        state: Fingerprints from the previous sync
+        remote_revisions: Current `_rev` of every existing document (tracked ones included)
+        source_ids: Every document ID present in the source, including listings
+            that failed to prepare this run, so they are never mistaken for deletions
+        full: Rewrite every document (createOrReplace) but still record fingerprints
+        prune: Delete tracked documents that are no longer in the source
+    """
+    plan = DeltaPlan()
+    seen = set(source_ids or ())
+
+    for document in documents:
+        document_id = document["_id"]
+        seen.add(document_id)
+        fingerprint, fields = fingerprint_document(document)
+        entry = state.get(document_id)
+        remote_rev = remote_revisions.get(document_id)
+
+        op = DeltaOperation(kind="unchanged", document_id=document_id, document=document,
+                            fingerprint=fingerprint, fields=fields)
+
+        if remote_rev is None:
+            op.kind, op.reason = "create", "new" if entry is None else "missing remotely"
+        elif full:
+            op.kind, op.reason = "replace", "full sync"
+        elif entry is None:
+            op.kind, op.reason = "replace", "untracked"
+        elif entry.get("rev") != remote_rev:
+            op.kind, op.reason = "replace", "edited remotely"
+        elif entry.get("fingerprint") != fingerprint:
+            old_fields = entry.get("fields", {})
+            changed = [name for name, digest in fields.items() if old_fields.get(name) != digest]
+            if "_type" in changed:
+                op.kind, op.reason = "replace", "type changed"
+            else:
+                op.kind = "patch"
+                op.set_fields = {name: document[name] for name in changed}
+                op.unset_fields = sorted(name for name in old_fields if name not in fields)
+                op.reason = f"set {len(op.set_fields)}, unset {len(op.unset_fields)} field(s)"
+                op.if_revision_id = remote_rev
+
+        plan.operations.append(op)
+
+    if prune:
+        for document_id in list(state.documents):
+            if document_id in seen:
+                continue
+            if document_id in remote_revisions:
+                plan.operations.append(DeltaOperation(kind="delete", document_id=document_id,
+                                                      reason="removed from source"))
+            else:
+                # Already gone remotely; nothing to send
+                state.forget(document_id)
+
+    return plan
+
+def _queue(batch, op: DeltaOperation):
+    if op.kind == "create":
+        batch.create(op.document, key=op.document_id)
+    elif op.kind == "replace":
+        batch.create_or_replace(op.document, key=op.document_id)
+    elif op.kind == "patch":
+        batch.patch(op.document_id, op.set_fields, op.unset_fields,
+                    key=op.document_id, if_revision_id=op.if_revision_id)
+    elif op.kind == "delete":
+        batch.delete(op.document_id, key=op.document_id)
+
+def _is_conflict(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return response is not None and getattr(response, "status_code", None) == 409
+
+def apply_delta(client, plan: DeltaPlan, state: SyncState, max_mutations: int = 100,
+                max_bytes: int = 2 * 1024 * 1024) -> DeltaResult:
+    """
+    Commit a plan in batched transactions and update the sync state.
+
+    Patches rejected because the document changed since it was looked up
+    (409 on `ifRevisionID`) are retried once as createOrReplace. If the API
+    fails outright, what was committed so far is saved before re-raising.
+    """
+    result = DeltaResult()
+    operations = {op.document_id: op for op in plan.changes}
+    committed: Dict[str, Dict[str, Any]] = {}
+
+    try:
+        with client.batch(max_mutations=max_mutations, max_bytes=max_bytes) as batch:
+            committed = batch.results
+            for op in operations.values():
+                _queue(batch, op)
+        result.transactions += batch.transactions_committed
+        committed = dict(batch.results)
+        errors = dict(batch.errors)
+
+        conflicts = [document_id for document_id, error in errors.items()
+                     if operations[document_id].kind == "patch" and _is_conflict(error)]
+        if conflicts:
+            retry = client.batch(max_mutations=max_mutations, max_bytes=max_bytes)
+            try:
+                with retry:
+                    for document_id in conflicts:
+                        retry.create_or_replace(operations[document_id].document, key=document_id)
+                        del errors[document_id]
+            finally:
+                # Replacements committed before a failure still count
+                committed.update(retry.results)
+            result.transactions += retry.transactions_committed
+            result.conflicts_replaced = len(retry.results)
+            errors.update(retry.errors)
+    except Exception:
+        # Keep track of what reached Sanity before the API failed outright
+        _record_committed(committed, operations, state, result)
+        state.save()
+        raise
+
+    _record_committed(committed, operations, state, result)
+
+    result.errors = errors
+    state.save()
+    return result
+
+def _record_committed(committed: Dict[str, Dict[str, Any]], operations: Dict[str, DeltaOperation],
+                      state: SyncState, result: DeltaResult):
+    for document_id, outcome in committed.items():
+        op = operations[document_id]
+        result.applied[op.kind].append(document_id)
+        if op.kind == "delete":
+            state.forget(document_id)
+        else:
+            # A mutated document's new _rev is the ID of the transaction that wrote it
+            state.record(document_id, op.fingerprint, op.fields, outcome.get("transactionId"))
@@ -0,0 +1,210 @@
+"""
+Derivative Cache
+Sustainable Digital Nomads Directory - Processed Image Cache
+
+Content-addressed on-disk cache of processed images. Entries are keyed by
+the SHA-256 of the source bytes plus a digest of the processing settings,
+so an unchanged source processed with the same settings is served from
+disk without decoding or encoding anything. The cache is bounded in size
+and evicts least-recently-used entries.
+
+Each entry is three files in a two-character fan-out directory:
+`<key>.data` (processed image), `<key>.thumb` (thumbnail, optional) and
+`<key>.json` (everything else; its mtime marks the last use).
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from migration_config import OUTPUT_DIR
+
+DEFAULT_CACHE_DIR = OUTPUT_DIR / "derivative_cache"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump when the processing code changes its output for the same settings
+CACHE_FORMAT_VERSION = 1
+
+ENTRY_SUFFIXES = (".data", ".thumb", ".json")
+
+# Each process re-scans the shared directory after writing this fraction of
+# max_bytes, so growth from other processes is noticed and evicted
+RESCAN_FRACTION = 16
+
+def config_digest(config: Any) -> str:
+    """Stable digest of a settings dataclass (every field, plus the cache format version)"""
+    fields = dataclasses.asdict(config) if dataclasses.is_dataclass(config) else dict(config)
+    payload = json.dumps([CACHE_FORMAT_VERSION, fields], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def derivative_key(source_sha256: str, settings_digest: str) -> str:
+    return hashlib.sha256(f"{source_sha256}:{settings_digest}".encode("ascii")).hexdigest()
+
+class DerivativeCache:
+    """
+    Size-bounded, LRU, content-addressed store of processed image bytes.
+
+    Safe to share between threads. Several processes may use the same
+    directory: writes are atomic renames, each process tolerates entries
+    another one evicted, and each re-scans the directory before evicting
+    and after writing max_bytes / RESCAN_FRACTION, so N processes keep it
+    within about max_bytes * (1 + N / RESCAN_FRACTION). Instances pickle as
+    their settings only, so they can be handed to ProcessPoolExecutor
+    workers.
+    """
+
+    def __init__(self, cache_dir: Path = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+        self._lock = threading.Lock()
+        # key -> [bytes on disk, last used]; built on first use
+        self._index: Optional[Dict[str, list]] = None
+        self._total_bytes = 0
+        # Bytes this instance wrote since its last directory scan
+        self._written_since_scan = 0
+
+    def __getstate__(self):
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["cache_dir"], state["max_bytes"])
+
+    def _paths(self, key: str) -> Tuple[Path, Path, Path]:
+        directory = self.cache_dir / key[:2]
+        return tuple(directory / f"{key}{suffix}" for suffix in ENTRY_SUFFIXES)
+
+    def _load_index(self):
+        """Scan the cache directory for entry sizes and last-use times"""
+        index: Dict[str, list] = {}
+        if self.cache_dir.exists():
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    key, suffix = os.path.splitext(entry.name)
+                    if suffix not in ENTRY_SUFFIXES:
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    record = index.setdefault(key, [0, 0.0])
+                    record[0] += stat.st_size
+                    if suffix == ".json":
+                        record[1] = stat.st_mtime
+        self._index = index
+        self._total_bytes = sum(record[0] for record in index.values())
+        self._written_since_scan = 0
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Optional[bytes], Dict[str, Any]]]:
+        """
+        Look up a derivative.
+
+        Returns:
+            (processed bytes, thumbnail bytes or None, info dict), or None on a miss
+        """
+        data_path, thumb_path, info_path = self._paths(key)
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            data = data_path.read_bytes()
+            thumbnail = thumb_path.read_bytes() if info.get("has_thumbnail") else None
+        except (OSError, ValueError):
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        if len(data) != info.get("file_size"):
+            # Torn entry (e.g. evicted by another process mid-read)
+            with self._lock:
+                self.stats["misses"] += 1
+            return None
+
+        now = time.time()
+        try:
+            os.utime(info_path, (now, now))
+        except OSError:
+            pass
+        with self._lock:
+            self.stats["hits"] += 1
+            if self._index is not None and key in self._index:
+                self._index[key][1] = now
+        return data, thumbnail, info
+
+    def put(self, key: str, data: bytes, thumbnail: Optional[bytes], info: Dict[str, Any]):
+        """Store a derivative, then evict least-recently-used entries over `max_bytes`"""
+        data_path, thumb_path, info_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+
+        info = dict(info, file_size=len(data), has_thumbnail=thumbnail is not None)
+        size = len(data) + (len(thumbnail) if thumbnail is not None else 0)
+
+        # Payload first and the info file last, so a readable .json means a complete entry
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        writes = [(data_path, data)]
+        if thumbnail is not None:
+            writes.append((thumb_path, thumbnail))
+        writes.append((info_path, json.dumps(info).encode("utf-8")))
+        for path, payload in writes:
+            tmp_path = path.with_name(path.name + suffix)
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, path)
+        size += len(writes[-1][1])
+
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            else:
+                previous = self._index.get(key)
+                self._total_bytes += size - (previous[0] if previous else 0)
+                self._index[key] = [size, time.time()]
+                self._written_since_scan += size
+                # Other processes sharing the directory wrote and evicted
+                # entries this view doesn't know about: re-scan before evicting
+                # and every max_bytes / RESCAN_FRACTION written
+                if (self._total_bytes > self.max_bytes
+                        or self._written_since_scan * RESCAN_FRACTION >= self.max_bytes):
+                    self._load_index()
+            self.stats["stored"] += 1
+            victims = self._select_victims(keep=key)
+
+        for victim in victims:
+            self._remove(victim)
+
+    def _select_victims(self, keep: str):
+        """Pop least-recently-used keys until the cache fits (caller holds the lock)"""
+        if self._total_bytes <= self.max_bytes:
+            return []
+        victims = []
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            del self._index[key]
+            self._total_bytes -= size
+            victims.append(key)
+        self.stats["evicted"] += len(victims)
+        return victims
+
+    def _remove(self, key: str):
+        # Info file first so readers stop seeing the entry before its payload goes
+        data_path, thumb_path, info_path = self._paths(key)
+        for path in (info_path, data_path, thumb_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            return self._total_bytes
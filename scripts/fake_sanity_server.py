@@ -0,0 +1,596 @@
+"""
+Fake Sanity API Server
+Sustainable Digital Nomads Directory - Offline Sanity API Testing
+
+In-process stand-in for the Sanity HTTP API (mutate, doc, query and image
+asset endpoints) backed by in-memory datasets. Latency, random errors and
+429 throttling are configurable, so migration throughput, batching and
+retry behaviour can be benchmarked and regression-tested without network
+access.
+
+Usage:
+    python fake_sanity_server.py serve --port 3333
+    python fake_sanity_server.py benchmark --documents 500 --uploads 50 --latency 0.02
+
+Point a client at it with `api_host`, e.g.
+    SanityClient(project_id, dataset, token, api_version, api_host=server.url)
+or run the real migration against it with SANITY_API_HOST=http://127.0.0.1:3333.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.append(str(Path(__file__).parent))
+from sanity_rate_limit import TokenBucket
+
+# /v{apiVersion}/data/{mutate|doc|query}/{dataset}[/{rest}] and /v{apiVersion}/assets/images/{dataset}
+ROUTE_PATTERN = re.compile(r"^/v[^/]+/(data/mutate|data/doc|data/query|assets/images)/([^/]+)(?:/(.*))?$")
+
+ASSET_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+
+class FakeSanityError(Exception):
+    """Error answered to the client with the given HTTP status"""
+    def __init__(self, status: int, description: str, error_type: str = "mutationError"):
+        super().__init__(description)
+        self.status = status
+        self.description = description
+        self.error_type = error_type
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _new_revision() -> str:
+    return uuid.uuid4().hex[:22]
+
+# --- Minimal GROQ ---
+# Supports what the migration scripts need:
+#   *[_type == "listing"], *[_id in $ids], *[a == 1 && b != "x"]{_id, _rev}
+QUERY_PATTERN = re.compile(r"^\s*\*\s*(?:\[(?P<filter>.*)\])?\s*(?:\{(?P<projection>[^{}]*)\})?\s*$", re.S)
+CLAUSE_PATTERN = re.compile(r"^\s*(?P<field>[A-Za-z_][\w.]*)\s*(?P<op>==|!=|\bin\b)\s*(?P<value>.+?)\s*$", re.S)
+
+def _parse_value(token: str, params: Dict[str, Any]) -> Any:
+    """Resolve a literal or $param in a filter clause"""
+    token = token.strip()
+    if token.startswith("$"):
+        name = token[1:]
+        if name not in params:
+            raise FakeSanityError(400, f"param ${name} referenced, but not provided", "queryParseError")
+        return params[name]
+    try:
+        return json.loads(token)
+    except ValueError:
+        raise FakeSanityError(400, f"unsupported value in query: {token}", "queryParseError")
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+def compile_query(query: str, params: Dict[str, Any]) -> Tuple[Callable[[Dict[str, Any]], bool], Optional[List[str]]]:
+    """
+    Compile a GROQ subset query into a document predicate and projection.
+
+    Raises:
+        FakeSanityError: 400 for anything outside the supported subset
+    """
+    match = QUERY_PATTERN.match(query)
+    if not match:
+        raise FakeSanityError(400, f"unsupported query: {query}", "queryParseError")
+
+    clauses = []
+    if match.group("filter") and match.group("filter").strip():
+        for raw_clause in match.group("filter").split("&&"):
+            clause = CLAUSE_PATTERN.match(raw_clause)
+            if not clause:
+                raise FakeSanityError(400, f"unsupported filter: {raw_clause.strip()}", "queryParseError")
+            clauses.append((clause.group("field"), clause.group("op"),
+                            _parse_value(clause.group("value"), params)))
+
+    def predicate(document: Dict[str, Any]) -> bool:
+        for field, op, value in clauses:
+            actual = _get_path(document, field)
+            if op == "==" and actual != value:
+                return False
+            if op == "!=" and actual == value:
+                return False
+            if op == "in" and actual not in (value or []):
+                return False
+        return True
+
+    projection = None
+    if match.group("projection") is not None:
+        projection = [name.strip() for name in match.group("projection").split(",") if name.strip()]
+    return predicate, projection
+
+class FakeSanityServer:
+    """
+    Threaded fake Sanity API listening on localhost.
+
+    Fault injection is applied to every request before routing, in order:
+    queued `fail_next()` statuses, the server-side `rate_limit` (requests per
+    second, answered with 429), random `throttle_rate` 429s and random
+    `error_rate` failures with `error_status`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token: Optional[str] = None,
+                 latency: float = 0.0, latency_jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 throttle_rate: float = 0.0, rate_limit: Optional[float] = None,
+                 retry_after: float = 1.0, max_mutations_per_transaction: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.token = token
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.max_mutations_per_transaction = max_mutations_per_transaction
+        self.rate_bucket = TokenBucket(rate_limit) if rate_limit else None
+
+        self.datasets: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.stats = Counter()
+        self.transactions: List[Dict[str, Any]] = []
+
+        self._random = random.Random(seed)
+        self._forced_statuses: deque = deque()
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), FakeSanityRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Origin to pass as `api_host`"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'FakeSanityServer':
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-sanity", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Shut the server down and wait for the serving thread"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'FakeSanityServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        """Answer the next `count` requests with `status` (deterministic fault injection)"""
+        with self._lock:
+            self._forced_statuses.extend([status] * count)
+
+    def documents(self, dataset: str) -> Dict[str, Dict[str, Any]]:
+        """The live document store of a dataset"""
+        with self._lock:
+            return self.datasets.setdefault(dataset, {})
+
+    # --- Request handling ---
+
+    def injected_fault(self) -> Optional[int]:
+        """Status code to answer instead of handling the request, if any"""
+        with self._lock:
+            if self._forced_statuses:
+                status = self._forced_statuses.popleft()
+            elif self.rate_bucket is not None and self.rate_bucket.reserve() > 0:
+                # Refund the token: a rejected request does not consume budget
+                self.rate_bucket.reserve(-1)
+                status = 429
+            elif self.throttle_rate and self._random.random() < self.throttle_rate:
+                status = 429
+            elif self.error_rate and self._random.random() < self.error_rate:
+                status = self.error_status
+            else:
+                return None
+            self.stats["throttled" if status == 429 else "injected_errors"] += 1
+            return status
+
+    def request_delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+        return self.latency + jitter
+
+    def mutate(self, dataset: str, body: Dict[str, Any], return_documents: bool) -> Dict[str, Any]:
+        """Apply a transaction atomically: all mutations succeed or none are applied"""
+        mutations = body.get("mutations")
+        if not isinstance(mutations, list):
+            raise FakeSanityError(400, "mutations must be an array", "validationError")
+        if self.max_mutations_per_transaction and len(mutations) > self.max_mutations_per_transaction:
+            raise FakeSanityError(413, f"transaction exceeds {self.max_mutations_per_transaction} mutations",
+                                  "validationError")
+
+        with self._lock:
+            store = self.datasets.setdefault(dataset, {})
+            staged = dict(store)
+            results = []
+            changed = []
+            timestamp = _now_iso()
+            revision = _new_revision()
+
+            for mutation in mutations:
+                if not isinstance(mutation, dict) or len(mutation) != 1:
+                    raise FakeSanityError(400, f"invalid mutation: {mutation}", "validationError")
+                (kind, spec), = mutation.items()
+                result_id, operation, document = self._apply(staged, kind, spec, timestamp, revision)
+                results.append({"id": result_id, "operation": operation})
+                if document is not None:
+                    changed.append(document)
+
+            store.clear()
+            store.update(staged)
+            self.stats["transactions"] += 1
+            self.stats["mutations"] += len(mutations)
+            transaction_id = revision
+            self.transactions.append({"transactionId": transaction_id, "mutations": len(mutations)})
+
+        response = {"transactionId": transaction_id, "results": results}
+        if return_documents:
+            response["documents"] = copy.deepcopy(changed)
+        return response
+
+    def _apply(self, staged: Dict[str, Dict[str, Any]], kind: str, spec: Dict[str, Any],
+               timestamp: str, revision: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        if kind in ("create", "createOrReplace", "createIfNotExists"):
+            document = copy.deepcopy(spec)
+            document_id = document.get("_id") or uuid.uuid4().hex
+            if "_type" not in document:
+                raise FakeSanityError(400, f"document {document_id} is missing _type", "validationError")
+            existing = staged.get(document_id)
+            if existing is not None:
+                if kind == "create":
+                    raise FakeSanityError(409, f'Document by ID "{document_id}" already exists')
+                if kind == "createIfNotExists":
+                    return document_id, "none", None
+            document.update({
+                "_id": document_id,
+                "_rev": revision,
+                "_createdAt": existing["_createdAt"] if existing else timestamp,
+                "_updatedAt": timestamp,
+            })
+            staged[document_id] = document
+            return document_id, "update" if existing else "create", document
+
+        if kind == "patch":
+            document_id = spec.get("id")
+            existing = staged.get(document_id)
+            if existing is None:
+                raise FakeSanityError(404, f'Document "{document_id}" not found')
+            if spec.get("ifRevisionID") and spec["ifRevisionID"] != existing["_rev"]:
+                raise FakeSanityError(409, f'Document "{document_id}" has unexpected revision ID '
+                                           f'("{existing["_rev"]}"), expected "{spec["ifRevisionID"]}"')
+            document = copy.deepcopy(existing)
+            for path, value in (spec.get("setIfMissing") or {}).items():
+                if _get_path(document, path) is None:
+                    _set_path(document, path, value)
+            for path, value in (spec.get("set") or {}).items():
+                _set_path(document, path, value)
+            for path in spec.get("unset") or []:
+                _unset_path(document, path)
+            document["_rev"] = revision
+            document["_updatedAt"] = timestamp
+            staged[document_id] = document
+            return document_id, "update", document
+
+        if kind == "delete":
+            document_id = spec.get("id")
+            staged.pop(document_id, None)
+            return document_id, "delete", None
+
+        raise FakeSanityError(400, f"unsupported mutation type: {kind}", "validationError")
+
+    def get_documents(self, dataset: str, ids: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            store = self.datasets.get(dataset, {})
+            documents = [copy.deepcopy(store[i]) for i in ids if i in store]
+        omitted = [{"id": i, "reason": "existence"} for i in ids if i not in {d["_id"] for d in documents}]
+        return {"documents": documents, "omitted": omitted}
+
+    def query(self, dataset: str, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        predicate, projection = compile_query(query, params)
+        with self._lock:
+            matches = [doc for doc in self.datasets.get(dataset, {}).values() if predicate(doc)]
+            if projection is not None:
+                result = [{field: _get_path(doc, field) for field in projection} for doc in matches]
+            else:
+                result = copy.deepcopy(matches)
+        return {"query": query, "result": result, "ms": int((time.perf_counter() - start) * 1000)}
+
+    def upload_asset(self, dataset: str, data: bytes, content_type: str,
+                     filename: Optional[str]) -> Dict[str, Any]:
+        """Store an image asset document; identical bytes map to the same asset like the real API"""
+        sha1 = hashlib.sha1(data).hexdigest()
+        extension = ASSET_EXTENSIONS.get(content_type, "bin")
+        # Real asset IDs embed the pixel dimensions; the fake does not decode images
+        asset_id = f"image-{sha1}-0x0-{extension}"
+        timestamp = _now_iso()
+
+        with self._lock:
+            store = self.datasets.setdefault(dataset, {})
+            document = store.get(asset_id)
+            if document is None:
+                document = {
+                    "_id": asset_id,
+                    "_type": "sanity.imageAsset",
+                    "_rev": _new_revision(),
+                    "_createdAt": timestamp,
+                    "_updatedAt": timestamp,
+                    "assetId": sha1,
+                    "sha1hash": sha1,
+                    "extension": extension,
+                    "mimeType": content_type,
+                    "originalFilename": filename,
+                    "size": len(data),
+                    "url": f"https://cdn.sanity.io/images/fake/{dataset}/{sha1}-0x0.{extension}",
+                }
+                store[asset_id] = document
+            self.stats["assets_uploaded"] += 1
+            self.stats["asset_bytes"] += len(data)
+            return {"document": copy.deepcopy(document)}
+
+def _set_path(document: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = copy.deepcopy(value)
+
+def _unset_path(document: Dict[str, Any], path: str):
+    parts = path.split(".")
+    target = document
+    for part in parts[:-1]:
+        target = target.get(part)
+        if not isinstance(target, dict):
+            return
+    target.pop(parts[-1], None)
+
+class FakeSanityRequestHandler(BaseHTTPRequestHandler):
+    """Routes HTTP requests to the owning FakeSanityServer"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; without TCP_NODELAY each
+    # keep-alive response stalls ~40ms on delayed ACKs and skews benchmarks
+    disable_nagle_algorithm = True
+
+    @property
+    def fake(self) -> FakeSanityServer:
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        # Always drain the body so keep-alive connections stay usable after errors
+        body = self._read_body()
+        split = urlsplit(self.path)
+        route = ROUTE_PATTERN.match(split.path)
+        endpoint = route.group(1) if route else "unknown"
+        self.fake.stats[f"requests:{endpoint}"] += 1
+
+        delay = self.fake.request_delay()
+        if delay:
+            time.sleep(delay)
+
+        try:
+            if self.fake.token and self.headers.get("Authorization") != f"Bearer {self.fake.token}":
+                raise FakeSanityError(401, "Unauthorized - Session not found", "unauthorized")
+
+            status = self.fake.injected_fault()
+            if status is not None:
+                raise FakeSanityError(status, "injected fault", "injectedError")
+
+            if route is None:
+                raise FakeSanityError(404, f"no route for {split.path}", "notFound")
+
+            dataset = route.group(2)
+            query = {key: values[-1] for key, values in parse_qs(split.query).items()}
+            self._send_json(200, self._dispatch(method, endpoint, dataset, route.group(3), query, body))
+        except FakeSanityError as e:
+            headers = {"Retry-After": f"{self.fake.retry_after:g}"} if e.status == 429 else {}
+            self._send_json(e.status, {"error": {"description": e.description, "type": e.error_type}}, headers)
+
+    def _dispatch(self, method: str, endpoint: str, dataset: str, rest: Optional[str],
+                  query: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        if endpoint == "data/mutate" and method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise FakeSanityError(400, "request body is not valid JSON", "validationError")
+            return self.fake.mutate(dataset, payload, query.get("returnDocuments") == "true")
+
+        if endpoint == "data/doc" and method == "GET" and rest:
+            ids = [unquote(document_id) for document_id in rest.split(",") if document_id]
+            return self.fake.get_documents(dataset, ids)
+
+        if endpoint == "data/query" and method == "GET":
+            if "query" not in query:
+                raise FakeSanityError(400, "missing query parameter", "queryParseError")
+            params = {}
+            for key, value in query.items():
+                if key.startswith("$"):
+                    try:
+                        params[key[1:]] = json.loads(value)
+                    except ValueError:
+                        raise FakeSanityError(400, f"param {key} is not valid JSON", "queryParseError")
+            return self.fake.query(dataset, query["query"], params)
+
+        if endpoint == "assets/images" and method == "POST":
+            content_type = self.headers.get("Content-Type", "application/octet-stream")
+            return self.fake.upload_asset(dataset, body, content_type, query.get("filename"))
+
+        raise FakeSanityError(405, f"{method} not allowed on {endpoint}", "methodNotAllowed")
+
+    def _read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+# --- Benchmark ---
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """Drive the real SanityClient against a fake server and report throughput"""
+    from migrate_listings_to_sanity import SanityClient, SanityAPIError
+    from sanity_rate_limit import SanityRateLimiter
+
+    server = FakeSanityServer(
+        latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, rate_limit=args.server_rate_limit,
+        retry_after=args.retry_after, seed=args.seed
+    )
+    results: Dict[str, Any] = {}
+
+    with server:
+        client = SanityClient(
+            project_id="fake", dataset="benchmark", token="fake-token", api_version="2025-05-24",
+            api_host=server.url, pool_maxsize=max(10, args.workers),
+            rate_limiter=SanityRateLimiter.from_config() if args.client_rate_limit else None
+        )
+        document_ids = [f"listing-{i}" for i in range(args.documents)]
+
+        start = time.perf_counter()
+        existing = client.get_many(document_ids)
+        results["lookup_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with client.batch(max_mutations=args.batch_size) as batch:
+            for i, document_id in enumerate(document_ids):
+                document = {"_id": document_id, "_type": "listing", "name": f"Listing {i}", "index": i}
+                if document_id in existing:
+                    batch.create_or_replace(document, key=document_id)
+                else:
+                    batch.create(document, key=document_id)
+        results["mutation_seconds"] = time.perf_counter() - start
+        results["documents_committed"] = len(batch.results)
+        results["documents_failed"] = len(batch.errors)
+        results["transactions"] = batch.transactions_committed
+
+        payload = random.Random(args.seed).randbytes(args.upload_size)
+
+        def upload(i: int) -> bool:
+            try:
+                client.assets_upload(payload + i.to_bytes(4, "big"), "image/jpeg", f"bench-{i}.jpg")
+                return True
+            except SanityAPIError:
+                return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            uploaded = sum(executor.map(upload, range(args.uploads)))
+        results["upload_seconds"] = time.perf_counter() - start
+        results["assets_uploaded"] = uploaded
+
+        results["listings_in_dataset"] = len(client.query('*[_type == "listing"]{_id}'))
+        results["server_stats"] = dict(server.stats)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Sanity API server for offline testing")
+    parser.add_argument("mode", choices=["serve", "benchmark"])
+    parser.add_argument("--port", type=int, default=3333, help="serve: port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="base latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 503 per request")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="probability of a 429 per request")
+    parser.add_argument("--server-rate-limit", type=float, default=None, help="requests/second before 429s")
+    parser.add_argument("--retry-after", type=float, default=0.0, help="Retry-After sent with 429s")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--upload-size", type=int, default=256 * 1024)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--client-rate-limit", action="store_true", help="enable SanityRateLimiter")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        server = FakeSanityServer(
+            port=args.port, latency=args.latency, latency_jitter=args.jitter, error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate, rate_limit=args.server_rate_limit,
+            retry_after=args.retry_after, seed=args.seed
+        )
+        print(f"Fake Sanity API listening on {server.url} (Ctrl+C to stop)")
+        try:
+            server.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.httpd.server_close()
+        return
+
+    results = run_benchmark(args)
+    print("=== Fake Sanity Benchmark ===")
+    print(f"Existence lookup: {results['lookup_seconds']:.3f}s")
+    print(f"Mutations: {results['documents_committed']} committed, {results['documents_failed']} failed "
+          f"in {results['transactions']} transactions, {results['mutation_seconds']:.3f}s "
+          f"({results['documents_committed'] / max(results['mutation_seconds'], 1e-9):.0f} docs/s)")
+    print(f"Uploads: {results['assets_uploaded']}/{args.uploads} in {results['upload_seconds']:.3f}s "
+          f"({results['assets_uploaded'] / max(results['upload_seconds'], 1e-9):.1f} assets/s)")
+    print(f"Listings visible to query: {results['listings_in_dataset']}")
+    print(f"Server stats: {results['server_stats']}")
+
+if __name__ == "__main__":
+    main()
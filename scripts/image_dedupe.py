@@ -0,0 +1,331 @@
+"""
+Image Dedupe
+Sustainable Digital Nomads Directory - Near-Duplicate Gallery Images
+
+Finds listing images that are the same photo at a different size or
+compression. Every image gets a 64-bit difference hash (dHash) of a 9x8
+grayscale thumbnail, which survives resizing and re-encoding. The hashes
+go into a BK-tree, so finding every image within `threshold` bits of a
+given one touches a small part of the library instead of all of it.
+
+Images in a group are collapsed onto the largest copy (most pixels, then
+most bytes), within one listing's gallery and across listings.
+
+Usage:
+    python image_dedupe.py [--threshold 6] [--collapse] [--output deduped_listings.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from PIL import Image
+
+sys.path.append(str(Path(__file__).parent))
+from migration_config import OUTPUT_DIR, PROJECT_ROOT
+
+MERGED_LISTINGS_PATH = PROJECT_ROOT / "listings" / "merged_listings.json"
+DEFAULT_HASH_CACHE_FILE = OUTPUT_DIR / "image_hashes.json"
+DEFAULT_OUTPUT_FILE = OUTPUT_DIR / "deduped_listings.json"
+
+HASH_SIZE = 8
+# Differing bits (out of 64) still treated as the same photo
+DEFAULT_THRESHOLD = 6
+
+T = TypeVar("T")
+
+def dhash(source: Any, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale image"""
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    try:
+        # JPEGs decode at 1/8 scale when the hash is all we need
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        pixels = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS).tobytes()
+    finally:
+        if image is not source:
+            image.close()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class BKTree(Generic[T]):
+    """
+    Burkhard-Keller tree over hashes under Hamming distance.
+
+    A radius-r query only descends into children whose edge distance is
+    within r of the query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        # node: [hash, items, {distance: child node}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: T):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, T]]:
+        """(distance, item) for every stored item within `radius` bits of `value`"""
+        matches = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                matches.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return matches
+
+@dataclass
+class ImageFingerprint:
+    path: Path
+    hash: int
+    pixels: int
+    file_size: int
+
+@dataclass
+class DuplicateGroup:
+    """Near-identical images; `keep` is the copy the others collapse onto"""
+    keep: Path
+    duplicates: List[Path] = field(default_factory=list)
+    max_distance: int = 0
+
+class HashCache:
+    """Fingerprints keyed by path, reused while the file's size and mtime are unchanged"""
+
+    def __init__(self, cache_file: Optional[Path] = DEFAULT_HASH_CACHE_FILE):
+        self.cache_file = cache_file
+        self.entries: Dict[str, list] = {}
+        if cache_file is not None and cache_file.exists():
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, path: Path) -> ImageFingerprint:
+        stat = path.stat()
+        key = str(path)
+        entry = self.entries.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            self.hits += 1
+            return ImageFingerprint(path, int(entry[2], 16), entry[3], stat.st_size)
+
+        self.misses += 1
+        with Image.open(path) as image:
+            pixels = image.width * image.height
+            value = dhash(image)
+        self.entries[key] = [stat.st_size, stat.st_mtime_ns, f"{value:016x}", pixels]
+        return ImageFingerprint(path, value, pixels, stat.st_size)
+
+    def save(self):
+        if self.cache_file is None:
+            return
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.cache_file)
+
+def find_near_duplicates(paths: Iterable[Path], threshold: int = DEFAULT_THRESHOLD,
+                         hash_cache: Optional[HashCache] = None) -> Tuple[List[DuplicateGroup], List[Path]]:
+    """
+    Group near-identical images.
+
+    Returns:
+        (groups with at least one duplicate, paths that could not be read)
+    """
+    hash_cache = hash_cache or HashCache(None)
+    tree: BKTree[int] = BKTree()
+    fingerprints: List[ImageFingerprint] = []
+    unreadable: List[Path] = []
+    parent: List[int] = []
+
+    def root(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    seen = set()
+    for path in paths:
+        if path in seen:
+            continue
+        seen.add(path)
+        try:
+            fingerprint = hash_cache.fingerprint(path)
+        except Exception:
+            unreadable.append(path)
+            continue
+
+        index = len(fingerprints)
+        fingerprints.append(fingerprint)
+        parent.append(index)
+        # Link to every earlier image in range before inserting this one
+        for _, other in tree.search(fingerprint.hash, threshold):
+            a, b = root(index), root(other)
+            if a != b:
+                parent[a] = b
+        tree.add(fingerprint.hash, index)
+
+    members: Dict[int, List[int]] = {}
+    for index in range(len(fingerprints)):
+        members.setdefault(root(index), []).append(index)
+
+    # Linked images can chain (A~B~C with A and C far apart), so split each
+    # set: the best image keeps everything within threshold of it, and the
+    # rest is grouped again around its own best image
+    groups = []
+    for indexes in members.values():
+        while len(indexes) > 1:
+            best = max(indexes, key=lambda i: (fingerprints[i].pixels, fingerprints[i].file_size))
+            distances = {i: hamming(fingerprints[i].hash, fingerprints[best].hash) for i in indexes if i != best}
+            close = [i for i in indexes if i in distances and distances[i] <= threshold]
+            if close:
+                groups.append(DuplicateGroup(
+                    keep=fingerprints[best].path,
+                    duplicates=[fingerprints[i].path for i in close],
+                    max_distance=max(distances[i] for i in close)
+                ))
+            grouped = set(close)
+            indexes = [i for i in indexes if i != best and i not in grouped]
+    return groups, unreadable
+
+def canonical_paths(groups: Iterable[DuplicateGroup]) -> Dict[Path, Path]:
+    """Duplicate path -> the path it collapses onto"""
+    return {duplicate: group.keep for group in groups for duplicate in group.duplicates}
+
+def collapse_paths(paths: Iterable[Path], threshold: int = DEFAULT_THRESHOLD,
+                   hash_cache: Optional[HashCache] = None) -> Tuple[List[Path], List[DuplicateGroup]]:
+    """`paths` with near-duplicates replaced by their kept copy (order kept, each path once)"""
+    paths = list(paths)
+    groups, _ = find_near_duplicates(paths, threshold, hash_cache)
+    mapping = canonical_paths(groups)
+    unique = list(dict.fromkeys(mapping.get(path, path) for path in paths))
+    return unique, groups
+
+def dedupe_listings(listings: List[Dict[str, Any]], resolve: Callable[[str], Optional[Path]],
+                    threshold: int = DEFAULT_THRESHOLD, collapse: bool = False,
+                    hash_cache: Optional[HashCache] = None) -> Dict[str, Any]:
+    """
+    Find near-duplicate images referenced by `listings`.
+
+    With `collapse`, image references are rewritten in place to the kept
+    copy's reference and repeated gallery entries are dropped.
+
+    Returns:
+        A report with the duplicate groups and the listings that use them
+    """
+    references: Dict[Path, str] = {}
+    users: Dict[Path, List[str]] = {}
+    for listing in listings:
+        refs = [listing.get("primary_image_url")] + list(listing.get("gallery_image_urls") or [])
+        for ref in refs:
+            if not ref or not isinstance(ref, str):
+                continue
+            path = resolve(ref)
+            if path is None:
+                continue
+            references.setdefault(path, ref)
+            users.setdefault(path, []).append(str(listing.get("id")))
+
+    groups, unreadable = find_near_duplicates(references, threshold, hash_cache)
+    mapping = canonical_paths(groups)
+
+    if collapse:
+        replacement = {references[duplicate]: references[keep] for duplicate, keep in mapping.items()}
+        for listing in listings:
+            primary = listing.get("primary_image_url")
+            if primary in replacement:
+                listing["primary_image_url"] = replacement[primary]
+            gallery = listing.get("gallery_image_urls")
+            if isinstance(gallery, list):
+                listing["gallery_image_urls"] = list(dict.fromkeys(replacement.get(ref, ref) for ref in gallery))
+
+    return {
+        "threshold": threshold,
+        "images": len(references),
+        "duplicate_images": len(mapping),
+        "collapsed": collapse,
+        "groups": [
+            {
+                "keep": references[group.keep],
+                "duplicates": [references[path] for path in group.duplicates],
+                "max_distance": group.max_distance,
+                "listings": sorted({listing_id for path in [group.keep, *group.duplicates]
+                                    for listing_id in users[path]})
+            }
+            for group in groups
+        ],
+        "unreadable": [references[path] for path in unreadable]
+    }
+
+def main():
+    from migrate_listings_to_sanity import find_image_path
+
+    parser = argparse.ArgumentParser(description="Report (and optionally collapse) near-duplicate listing images")
+    parser.add_argument("--listings", type=Path, default=MERGED_LISTINGS_PATH, help="listings JSON file")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_THRESHOLD,
+                        help="max differing hash bits (of 64) for a near-duplicate")
+    parser.add_argument("--collapse", action="store_true",
+                        help="write listings with duplicates pointed at the kept image")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT_FILE,
+                        help="where --collapse writes the listings (the input is never modified)")
+    args = parser.parse_args()
+
+    with open(args.listings, 'r', encoding='utf-8') as f:
+        listings = json.load(f)
+
+    hash_cache = HashCache()
+    report = dedupe_listings(listings, find_image_path, args.threshold, args.collapse, hash_cache)
+    hash_cache.save()
+
+    for group in report["groups"]:
+        print(f"🔁 {group['keep']} (distance <= {group['max_distance']}, listings: {', '.join(group['listings'])})")
+        for duplicate in group["duplicates"]:
+            print(f"    duplicate: {duplicate}")
+    for ref in report["unreadable"]:
+        print(f"⚠️  Could not read {ref}")
+    print(f"\n{report['duplicate_images']} near-duplicate(s) among {report['images']} images "
+          f"in {len(report['groups'])} group(s) (hashed {hash_cache.misses}, cached {hash_cache.hits})")
+
+    if args.collapse:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(listings, f, indent=2, ensure_ascii=False)
+        print(f"✅ Collapsed listings written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Image Index
+Sustainable Digital Nomads Directory - Local Image Resolution
+
+One-shot scan of the local image directories into an in-memory index, so
+resolving listing image references is a dict lookup instead of a series of
+stat calls per reference. Search order matches find_image_path:
+
+1. sanity_image_staging/optimized/ (by file stem, as .webp)
+2. sanity_image_staging/images/ (by relative path)
+3. app-next-directory/public/ (by relative path)
+
+The index can be saved as a JSON snapshot and refreshed from it later; only
+directories whose mtime changed since the snapshot are listed again.
+Lookups are case-insensitive on roots whose filesystem is, and symlinked
+directories are followed, matching the stat-based checks it replaces.
+"""
+
+import json
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from migration_config import OUTPUT_DIR, PROJECT_ROOT
+
+DEFAULT_SNAPSHOT_FILE = OUTPUT_DIR / "image_index.json"
+
+IMAGE_STAGING_PATH = PROJECT_ROOT / "sanity_image_staging"
+PUBLIC_IMAGES_PATH = PROJECT_ROOT / "app-next-directory" / "public"
+
+OPTIMIZED_SUFFIX = ".webp"
+
+# Bumped when the directory listing format changes (v2: symlinked subdirs)
+SNAPSHOT_VERSION = 2
+
+@dataclass(frozen=True)
+class SearchRoot:
+    """
+    A directory searched for images.
+
+    `by_stem` roots only hold their top-level `<stem>.webp` files and are
+    matched on the reference's file stem; other roots are scanned
+    recursively and matched on the full relative path.
+    """
+    name: str
+    path: Path
+    by_stem: bool = False
+
+@dataclass(frozen=True)
+class ImageEntry:
+    """A resolved image file"""
+    path: Path
+    size: int
+    mtime: float
+
+def search_roots(staging_path: Path = IMAGE_STAGING_PATH,
+                 public_path: Path = PUBLIC_IMAGES_PATH) -> Tuple[SearchRoot, ...]:
+    """The search roots in priority order"""
+    return (
+        SearchRoot("optimized", Path(staging_path) / "optimized", by_stem=True),
+        SearchRoot("staging", Path(staging_path) / "images"),
+        SearchRoot("public", Path(public_path)),
+    )
+
+def is_case_insensitive(directory: Path) -> bool:
+    """Whether the filesystem holding `directory` ignores case in file names"""
+    directory = Path(directory)
+    swapped = directory.name.swapcase()
+    if swapped != directory.name:
+        try:
+            return os.path.samefile(directory, directory.with_name(swapped))
+        except OSError:
+            if directory.exists():
+                return False
+    # Missing root or a name without letters: assume the platform default
+    return sys.platform in ("win32", "darwin")
+
+def _stem(name: str) -> str:
+    """File name without its last suffix, with the same rules as PurePath.stem"""
+    dot = name.rfind('.')
+    return name[:dot] if 0 < dot < len(name) - 1 else name
+
+class ImageIndex:
+    """
+    In-memory index of image files under a set of search roots.
+
+    Directory listings are kept as `{mtime_ns, files: {name: [size, mtime]},
+    subdirs}` keyed by absolute path; the per-root lookup tables are derived
+    from them. Files edited in place do not change their directory's mtime,
+    so `refresh()` keeps their recorded size/mtime; use `build()` for a full
+    rescan.
+
+    `case_insensitive` forces case folding of lookup keys on or off; by
+    default it is detected per root.
+    """
+
+    def __init__(self, roots: Iterable[SearchRoot] = None, case_insensitive: Optional[bool] = None):
+        self.roots: Tuple[SearchRoot, ...] = tuple(roots if roots is not None else search_roots())
+        self.case_insensitive = case_insensitive
+        self.directories: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"scanned": 0, "reused": 0}
+        self._lookups: List[Dict[str, ImageEntry]] = [{} for _ in self.roots]
+        self._folded: List[bool] = [False for _ in self.roots]
+
+    def build(self) -> 'ImageIndex':
+        """Scan every root from scratch"""
+        self.directories = {}
+        return self.refresh()
+
+    def refresh(self) -> 'ImageIndex':
+        """List directories that are new or changed since the last scan; reuse the rest"""
+        previous = self.directories
+        self.directories = {}
+        for root in self.roots:
+            self._walk(root.path, previous, recursive=not root.by_stem, visited=set())
+        self._rebuild_lookups()
+        return self
+
+    def _walk(self, directory: Path, previous: Dict[str, Dict[str, Any]], recursive: bool,
+              visited: set):
+        key = str(directory)
+        try:
+            stat = os.stat(directory)
+        except OSError:
+            return
+        # Symlinked directories are followed; never enter the same one twice
+        inode = (stat.st_dev, stat.st_ino)
+        if inode in visited:
+            return
+        visited.add(inode)
+        mtime_ns = stat.st_mtime_ns
+
+        listing = previous.get(key)
+        if listing is not None and listing["mtime_ns"] == mtime_ns:
+            self.stats["reused"] += 1
+        else:
+            listing = self._scan(directory, mtime_ns)
+            if listing is None:
+                return
+        self.directories[key] = listing
+
+        if recursive:
+            for name in listing["subdirs"]:
+                self._walk(directory / name, previous, recursive, visited)
+
+    def _scan(self, directory: Path, mtime_ns: int) -> Optional[Dict[str, Any]]:
+        files: Dict[str, List[float]] = {}
+        subdirs: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.name)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[entry.name] = [stat.st_size, stat.st_mtime]
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"Warning: Could not scan image directory {directory}: {e}")
+            return None
+
+        self.stats["scanned"] += 1
+        return {"mtime_ns": mtime_ns, "files": files, "subdirs": sorted(subdirs)}
+
+    def _rebuild_lookups(self):
+        self._lookups = []
+        self._folded = []
+        for root in self.roots:
+            folded = self.case_insensitive
+            if folded is None:
+                folded = is_case_insensitive(root.path)
+            fold = str.casefold if folded else str
+            self._folded.append(folded)
+            lookup: Dict[str, ImageEntry] = {}
+            root_key = str(root.path)
+            for key, listing in self.directories.items():
+                directory = Path(key)
+                if root.by_stem:
+                    if key != root_key:
+                        continue
+                    for name, (size, mtime) in listing["files"].items():
+                        if name.endswith(OPTIMIZED_SUFFIX):
+                            stem = fold(name[:-len(OPTIMIZED_SUFFIX)])
+                            lookup[stem] = ImageEntry(directory / name, size, mtime)
+                    continue
+
+                if key != root_key and not key.startswith(root_key + os.sep):
+                    continue
+                relative_dir = directory.relative_to(root.path).as_posix()
+                prefix = "" if relative_dir == "." else relative_dir + "/"
+                for name, (size, mtime) in listing["files"].items():
+                    lookup[fold(prefix + name)] = ImageEntry(directory / name, size, mtime)
+            self._lookups.append(lookup)
+
+    def lookup(self, relative_path: str) -> Optional[ImageEntry]:
+        """
+        Resolve an image reference to the first matching file in priority order.
+
+        Returns None for external URLs and references that are not indexed.
+        """
+        if relative_path.startswith(('http://', 'https://')):
+            return None
+
+        clean_path = relative_path.lstrip('/')
+        if '//' in clean_path or '/.' in clean_path or clean_path.startswith('.') or clean_path.endswith('/'):
+            # Unusual spelling: normalise like pathlib would before looking it up
+            pure = PurePosixPath(clean_path)
+            if '..' in pure.parts:
+                # Escapes the root; not representable in the index
+                return self._probe(clean_path, pure.stem)
+            relative_key, stem = pure.as_posix(), pure.stem
+        else:
+            relative_key = clean_path
+            stem = _stem(clean_path.rpartition('/')[2])
+
+        for root, lookup, folded in zip(self.roots, self._lookups, self._folded):
+            key = stem if root.by_stem else relative_key
+            entry = lookup.get(key.casefold() if folded else key)
+            if entry is not None:
+                return entry
+        return None
+
+    def resolve(self, relative_path: str) -> Optional[Path]:
+        """Like `lookup()`, returning only the path"""
+        entry = self.lookup(relative_path)
+        return entry.path if entry is not None else None
+
+    def _probe(self, clean_path: str, stem: str) -> Optional[ImageEntry]:
+        for root in self.roots:
+            candidate = root.path / (f"{stem}{OPTIMIZED_SUFFIX}" if root.by_stem else clean_path)
+            try:
+                stat = candidate.stat()
+            except OSError:
+                continue
+            return ImageEntry(candidate, stat.st_size, stat.st_mtime)
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(lookup) for lookup in self._lookups)
+
+    def save(self, snapshot_file: Path = DEFAULT_SNAPSHOT_FILE):
+        """Write the directory listings to a JSON snapshot atomically"""
+        snapshot_file = Path(snapshot_file)
+        snapshot_file.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": SNAPSHOT_VERSION,
+            "roots": [[root.name, str(root.path), root.by_stem] for root in self.roots],
+            "directories": self.directories
+        }
+        tmp_file = snapshot_file.with_suffix(snapshot_file.suffix + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_file, snapshot_file)
+
+    @classmethod
+    def from_snapshot(cls, snapshot_file: Path = DEFAULT_SNAPSHOT_FILE,
+                      roots: Iterable[SearchRoot] = None) -> 'ImageIndex':
+        """
+        Load a snapshot and refresh it against the filesystem.
+
+        A missing, unreadable, outdated or differently-rooted snapshot falls
+        back to a full scan.
+        """
+        index = cls(roots)
+        snapshot_file = Path(snapshot_file)
+        if snapshot_file.exists():
+            try:
+                with open(snapshot_file, 'r', encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable image index {snapshot_file}: {e}")
+            else:
+                expected = [[root.name, str(root.path), root.by_stem] for root in index.roots]
+                if payload.get("version") == SNAPSHOT_VERSION and payload.get("roots") == expected:
+                    index.directories = payload.get("directories", {})
+        return index.refresh()
+
+_default_index: Optional[ImageIndex] = None
+
+def get_image_index() -> ImageIndex:
+    """Shared index over the default search roots, built on first use"""
+    global _default_index
+    if _default_index is None:
+        _default_index = ImageIndex().build()
+    return _default_index
+
+def set_image_index(index: ImageIndex):
+    """Make `index` the shared index (e.g. one loaded from a snapshot)"""
+    global _default_index
+    _default_index = index
@@ -9,11 +9,15 @@ and batch upload capabilities for the Sanity CMS migration.
 import asyncio
 import aiohttp
 import aiofiles
-import io
 import hashlib
+import itertools
 import mimetypes
+import os
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Union
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple, Any, Union
 from PIL import Image, ImageOps, ExifTags
 from datetime import datetime, timezone
 import logging
@@ -21,9 +25,13 @@ from dataclasses import dataclass
 import json
 
 from migration_recovery import (
-    MigrationLogger, MigrationErrorType, MigrationStatus,
-    create_migration_error, retry_on_error
+    CircuitBreaker, MigrationLogger, MigrationErrorType, MigrationStatus, RetryPolicy,
+    classify_error, create_migration_error, is_recoverable_error
 )
+from asset_cache import AssetUploadCache, hash_file
+from derivative_cache import DerivativeCache, config_digest, derivative_key
+from image_dedupe import collapse_paths
+from rendition_engine import OutputFormat, RenditionEngine, draft_for_boxes
 
 @dataclass
 class ImageProcessingConfig:
@@ -43,6 +51,8 @@ class ImageProcessingConfig:
     strip_metadata: bool = True
     convert_to_rgb: bool = True
     progressive_jpeg: bool = True
+    # Run a full Image.verify() pass during validation (otherwise header only)
+    strict_validation: bool = False
 
     # File size limits (in bytes)
     max_file_size: int = 10 * 1024 * 1024  # 10MB
@@ -68,43 +78,75 @@ class ProcessedImage:
 class ImageProcessor:
     """Advanced image processing with optimization and validation"""
 
-    def __init__(self, config: ImageProcessingConfig = None):
+    def __init__(self, config: ImageProcessingConfig = None,
+                 derivative_cache: Optional[DerivativeCache] = None):
         self.config = config or ImageProcessingConfig()
+        self.derivative_cache = derivative_cache
         self.logger = logging.getLogger(__name__)
 
     def validate_image(self, image_path: Path) -> Tuple[bool, Optional[str]]:
         """Validate image file before processing"""
 
-        if not image_path.exists():
-            return False, "File does not exist"
+        img, error_msg = self._open_validated(image_path, self.config)
+        if img is None:
+            return False, error_msg
+        img.close()
+        return True, None
 
-        if image_path.stat().st_size == 0:
-            return False, "File is empty"
+    def _open_validated(self, image_path: Path,
+                        config: ImageProcessingConfig) -> Tuple[Optional[Image.Image], Optional[str]]:
+        """
+        Validate from a single stat and the image header, returning the open image.
 
-        if image_path.stat().st_size > self.config.max_file_size:
-            return False, f"File too large: {image_path.stat().st_size} bytes"
+        Only the header is parsed, so the returned image is not decoded yet
+        and can still be drafted. With `strict_validation` the whole file is
+        run through Image.verify() first, which needs its own open.
 
-        if image_path.stat().st_size < self.config.min_file_size:
-            return False, f"File too small: {image_path.stat().st_size} bytes"
+        Returns:
+            (open image, None) if valid, otherwise (None, error message)
+        """
+        try:
+            file_size = image_path.stat().st_size
+        except FileNotFoundError:
+            return None, "File does not exist"
+        except OSError as e:
+            return None, f"Image validation failed: {str(e)}"
+
+        if file_size == 0:
+            return None, "File is empty"
+
+        if file_size > config.max_file_size:
+            return None, f"File too large: {file_size} bytes"
+
+        if file_size < config.min_file_size:
+            return None, f"File too small: {file_size} bytes"
 
+        img = None
         try:
-            with Image.open(image_path) as img:
-                # Check format
-                if img.format not in self.config.supported_formats:
-                    return False, f"Unsupported format: {img.format}"
+            if config.strict_validation:
+                # Verify image integrity; a verified image cannot be decoded, so reopen below
+                with Image.open(image_path) as verified:
+                    verified.verify()
 
-                # Check dimensions
-                width, height = img.size
-                if width == 0 or height == 0:
-                    return False, "Invalid dimensions"
+            img = Image.open(image_path)
 
-                # Verify image integrity
-                img.verify()
+            # Check format
+            if img.format not in config.supported_formats:
+                img.close()
+                return None, f"Unsupported format: {img.format}"
 
-            return True, None
+            # Check dimensions
+            width, height = img.size
+            if width == 0 or height == 0:
+                img.close()
+                return None, "Invalid dimensions"
+
+            return img, None
 
         except Exception as e:
-            return False, f"Image validation failed: {str(e)}"
+            if img is not None:
+                img.close()
+            return None, f"Image validation failed: {str(e)}"
 
     def process_image(self, image_path: Path,
                      custom_config: Optional[ImageProcessingConfig] = None) -> ProcessedImage:
@@ -112,19 +154,41 @@ class ImageProcessor:
 
         config = custom_config or self.config
 
-        # Validate image first
-        is_valid, error_msg = self.validate_image(image_path)
-        if not is_valid:
+        # Same source bytes processed with the same settings before: no Pillow work at all
+        cache_key = None
+        if self.derivative_cache is not None:
+            try:
+                cache_key = derivative_key(hash_file(image_path), config_digest(config))
+            except OSError:
+                pass  # Reported by validation below
+            else:
+                cached = self._load_cached(image_path, cache_key)
+                if cached is not None:
+                    return cached
+
+        # Validate image first, keeping the opened (header-only) image for processing
+        opened, error_msg = self._open_validated(image_path, config)
+        if opened is None:
             raise ValueError(f"Image validation failed: {error_msg}")
 
         try:
-            with Image.open(image_path) as img:
+            with opened as img:
                 # Store original dimensions
                 original_size = img.size
 
+                sizes = {"processed": (config.max_width, config.max_height)}
+                if config.thumbnail_size:
+                    sizes["thumbnail"] = config.thumbnail_size
+
+                # Let the JPEG decoder scale large sources down before anything is decoded
+                full_size = draft_for_boxes(img, sizes.values(), exif_oriented=config.auto_orient)
+                decoded_size = img.size
+
                 # Auto-orient based on EXIF data
                 if config.auto_orient:
                     img = ImageOps.exif_transpose(img)
+                    if img.size != decoded_size:
+                        full_size = full_size[::-1]
 
                 # Convert to RGB if needed
                 if config.convert_to_rgb and img.mode in ('RGBA', 'P', 'LA'):
@@ -135,22 +199,17 @@ class ImageProcessor:
                     rgb_img.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
                     img = rgb_img
 
-                # Resize if necessary
-                if img.size[0] > config.max_width or img.size[1] > config.max_height:
-                    img.thumbnail((config.max_width, config.max_height), Image.Resampling.LANCZOS)
-
-                # Prepare save options
-                save_options = self._get_save_options(config)
-
-                # Save processed image to bytes
-                output_buffer = io.BytesIO()
-                img.save(output_buffer, format=config.output_format, **save_options)
-                processed_data = output_buffer.getvalue()
+                # Resize, thumbnail and encode in one cascade: the thumbnail
+                # is derived from the resized image, not the original
+                output_format = OutputFormat(config.output_format.lower(), config.output_format,
+                                             self._get_save_options(config))
+                renditions = RenditionEngine(sizes, [output_format], flatten_alpha=False).render(img, full_size)
 
-                # Generate thumbnail
+                processed = renditions["processed"][output_format.extension]
+                processed_data = processed.data
                 thumbnail_data = None
-                if config.thumbnail_size:
-                    thumbnail_data = self._create_thumbnail(img, config.thumbnail_size, config)
+                if "thumbnail" in renditions:
+                    thumbnail_data = renditions["thumbnail"][output_format.extension].data
 
                 # Calculate checksum
                 checksum = hashlib.sha256(processed_data).hexdigest()
@@ -163,7 +222,7 @@ class ImageProcessor:
                 # Collect metadata
                 metadata = {
                     "original_size": original_size,
-                    "processed_size": img.size,
+                    "processed_size": processed.dimensions,
                     "original_format": img.format,
                     "processing_timestamp": datetime.now(timezone.utc).isoformat(),
                     "config_used": {
@@ -173,22 +232,57 @@ class ImageProcessor:
                     }
                 }
 
-                return ProcessedImage(
+                result = ProcessedImage(
                     original_path=image_path,
                     processed_data=processed_data,
                     format=config.output_format,
                     mime_type=mime_type,
-                    dimensions=img.size,
+                    dimensions=processed.dimensions,
                     file_size=len(processed_data),
                     checksum=checksum,
                     thumbnail_data=thumbnail_data,
                     metadata=metadata
                 )
 
+                if cache_key is not None:
+                    self.derivative_cache.put(cache_key, processed_data, thumbnail_data, {
+                        "format": result.format,
+                        "mime_type": result.mime_type,
+                        "dimensions": result.dimensions,
+                        "checksum": checksum,
+                        "metadata": metadata
+                    })
+
+                return result
+
         except Exception as e:
-            self.logger.error(f"Image processing failed for {image_path}: {str(e)}")
+            self.logger.error("Image processing failed for %s: %s", image_path, e)
             raise
 
+    def _load_cached(self, image_path: Path, cache_key: str) -> Optional[ProcessedImage]:
+        """Rebuild a ProcessedImage from the derivative cache"""
+        cached = self.derivative_cache.get(cache_key)
+        if cached is None:
+            return None
+
+        data, thumbnail_data, info = cached
+        metadata = info["metadata"]
+        for field_name in ("original_size", "processed_size"):
+            metadata[field_name] = tuple(metadata[field_name])
+        metadata["from_cache"] = True
+
+        return ProcessedImage(
+            original_path=image_path,
+            processed_data=data,
+            format=info["format"],
+            mime_type=info["mime_type"],
+            dimensions=tuple(info["dimensions"]),
+            file_size=len(data),
+            checksum=info["checksum"],
+            thumbnail_data=thumbnail_data,
+            metadata=metadata
+        )
+
     def _get_save_options(self, config: ImageProcessingConfig) -> Dict[str, Any]:
         """Get format-specific save options"""
 
@@ -211,32 +305,87 @@ class ImageProcessor:
         else:
             return {}
 
-    def _create_thumbnail(self, img: Image.Image, size: Tuple[int, int],
-                         config: ImageProcessingConfig) -> bytes:
-        """Create thumbnail from processed image"""
-
-        # Create copy for thumbnail
-        thumb = img.copy()
-        thumb.thumbnail(size, Image.Resampling.LANCZOS)
-
-        # Save thumbnail
-        thumb_buffer = io.BytesIO()
-        save_options = self._get_save_options(config)
-        thumb.save(thumb_buffer, format=config.output_format, **save_options)
-
-        return thumb_buffer.getvalue()
+# Where BatchImageProcessor runs ImageProcessor.process_image
+THREAD_EXECUTOR = "thread"
+PROCESS_EXECUTOR = "process"
+
+# Pool workers hand encoded images back through files here (RAM-backed where available)
+SPOOL_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+# One ImageProcessor per pool worker, created by the pool initializer
+_worker_processor: Optional[ImageProcessor] = None
+
+def _init_process_worker(config: ImageProcessingConfig,
+                         derivative_cache: Optional[DerivativeCache]):
+    global _worker_processor
+    _worker_processor = ImageProcessor(config, derivative_cache)
+
+def _process_image_in_worker(image_path: Path, data_path: Path, thumbnail_path: Path) -> ProcessedImage:
+    """
+    Process one image inside a pool worker.
+
+    The encoded image and thumbnail are written to `data_path` and
+    `thumbnail_path` rather than pickled back through the result pipe; the
+    returned ProcessedImage only carries metadata until `_load_spooled()`.
+    """
+    processed = _worker_processor.process_image(image_path)
+
+    with open(data_path, 'wb') as f:
+        f.write(processed.processed_data)
+    processed.processed_data = b""
+
+    if processed.thumbnail_data is not None:
+        with open(thumbnail_path, 'wb') as f:
+            f.write(processed.thumbnail_data)
+        processed.thumbnail_data = b""
+
+    return processed
+
+def _load_spooled(processed: ProcessedImage, data_path: Path, thumbnail_path: Path,
+                  keep_data_file: bool) -> ProcessedImage:
+    """Read a worker's spooled output back into the ProcessedImage"""
+    processed.processed_data = data_path.read_bytes()
+    if not keep_data_file:
+        data_path.unlink()
+    if processed.thumbnail_data is not None:
+        processed.thumbnail_data = thumbnail_path.read_bytes()
+        thumbnail_path.unlink()
+    return processed
 
 class BatchImageProcessor:
-    """Batch processing of images with progress tracking and error recovery"""
+    """
+    Batch processing of images with progress tracking and error recovery
+
+    With `executor="process"`, images are processed in a ProcessPoolExecutor
+    (one worker per core by default) instead of the event loop's default
+    thread pool, since Pillow holds the GIL through much of resizing and
+    encoding. Call `close()` when done to shut the pool down.
+    """
 
     def __init__(self, migration_logger: MigrationLogger,
                  processing_config: ImageProcessingConfig = None,
-                 max_concurrent: int = 4):
+                 max_concurrent: int = 4,
+                 executor: str = THREAD_EXECUTOR,
+                 max_workers: Optional[int] = None,
+                 derivative_cache: Optional[DerivativeCache] = None):
+        if executor not in (THREAD_EXECUTOR, PROCESS_EXECUTOR):
+            raise ValueError(f"Unknown image executor: {executor}")
+
         self.migration_logger = migration_logger
-        self.processor = ImageProcessor(processing_config)
+        self.processor = ImageProcessor(processing_config, derivative_cache)
+        self.executor = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+        # Keep every worker busy: the in-flight limit is at least the pool size
+        if executor == PROCESS_EXECUTOR:
+            max_concurrent = max(max_concurrent, self.max_workers)
         self.max_concurrent = max_concurrent
         self.semaphore = asyncio.Semaphore(max_concurrent)
 
+        self._pool: Optional[Executor] = None
+        self._spool_dir: Optional[Path] = None
+        self._spool_ids = itertools.count()
+
         self.stats = {
             "total_images": 0,
             "processed": 0,
@@ -246,43 +395,127 @@ class BatchImageProcessor:
             "total_size_after": 0
         }
 
+    def _get_pool(self) -> Executor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_process_worker,
+                initargs=(self.processor.config, self.processor.derivative_cache)
+            )
+            self._spool_dir = Path(tempfile.mkdtemp(prefix="image_spool_", dir=SPOOL_ROOT))
+        return self._pool
+
+    def close(self):
+        """Shut down the process pool (if any) and remove its spool directory"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._spool_dir is not None:
+            shutil.rmtree(self._spool_dir, ignore_errors=True)
+            self._spool_dir = None
+
+    async def _run_processor(self, image_path: Path, output_path: Optional[Path]) -> ProcessedImage:
+        """Run process_image on the configured executor"""
+        loop = asyncio.get_event_loop()
+
+        if self.executor == THREAD_EXECUTOR:
+            return await loop.run_in_executor(None, self.processor.process_image, image_path)
+
+        pool = self._get_pool()
+        spool_name = f"{next(self._spool_ids)}_{image_path.stem}"
+        # With an output directory the worker writes the final file directly
+        data_path = output_path or self._spool_dir / f"{spool_name}.data"
+        thumbnail_path = self._spool_dir / f"{spool_name}.thumb"
+
+        processed = await loop.run_in_executor(
+            pool, _process_image_in_worker, image_path, data_path, thumbnail_path
+        )
+        return await loop.run_in_executor(
+            None, _load_spooled, processed, data_path, thumbnail_path, output_path is not None
+        )
+
     async def process_images_batch(self, image_paths: List[Path],
                                   output_dir: Optional[Path] = None) -> List[ProcessedImage]:
-        """Process multiple images concurrently"""
-
-        self.stats["total_images"] = len(image_paths)
-        self.migration_logger.logger.info(f"Starting batch processing of {len(image_paths)} images")
+        """Process multiple images concurrently (results in input order)"""
+
+        results = [item async for item in self._iter_indexed(image_paths, output_dir)]
+        results.sort(key=lambda item: item[0])
+        return [processed for _, processed in results]
+
+    async def iter_processed_images(self, image_paths: Iterable[Path],
+                                    output_dir: Optional[Path] = None,
+                                    window: Optional[int] = None) -> AsyncIterator[ProcessedImage]:
+        """
+        Yield processed images as they finish, in completion order.
+
+        At most `window` images (default: `max_concurrent`) are in flight or
+        waiting to be consumed; the next path is only taken from
+        `image_paths` once the consumer has pulled a result, so memory is
+        bounded by the window rather than by the batch size. Failed images
+        are logged and counted but not yielded.
+        """
+        async for _, processed in self._iter_indexed(image_paths, output_dir, window):
+            yield processed
+
+    async def _iter_indexed(self, image_paths: Iterable[Path], output_dir: Optional[Path],
+                            window: Optional[int] = None) -> AsyncIterator[Tuple[int, ProcessedImage]]:
+        """Bounded-window core of the batch APIs, yielding (input index, image)"""
+
+        window = max(1, window or self.max_concurrent)
+        if isinstance(image_paths, list):
+            self.migration_logger.logger.info("Starting batch processing of %d images", len(image_paths))
+        else:
+            self.migration_logger.logger.info("Starting streaming image processing")
 
         # Create output directory if specified
         if output_dir:
             output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Process images concurrently
-        tasks = [
-            self._process_single_image(image_path, output_dir)
-            for image_path in image_paths
-        ]
-
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Separate successful results from exceptions
-        processed_images = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                self.migration_logger.logger.error(
-                    f"Failed to process {image_paths[i]}: {str(result)}"
-                )
-                self.stats["failed"] += 1
-            elif result:
-                processed_images.append(result)
-                self.stats["processed"] += 1
-            else:
-                self.stats["skipped"] += 1
+        paths = enumerate(image_paths)
+        pending: Dict[asyncio.Task, Tuple[int, Path]] = {}
 
-        # Log final statistics
-        self._log_batch_statistics()
+        def submit() -> bool:
+            for index, image_path in paths:
+                self.stats["total_images"] += 1
+                task = asyncio.ensure_future(self._process_single_image(image_path, output_dir))
+                pending[task] = (index, image_path)
+                return True
+            return False
 
-        return processed_images
+        try:
+            while len(pending) < window and submit():
+                pass
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, image_path = pending.pop(task)
+                    if task.exception() is not None:
+                        self.migration_logger.logger.error(
+                            f"Failed to process {image_path}: {str(task.exception())}"
+                        )
+                        self.stats["failed"] += 1
+                        continue
+
+                    processed = task.result()
+                    if not processed:
+                        self.stats["skipped"] += 1
+                        continue
+
+                    self.stats["processed"] += 1
+                    # Suspends here until the consumer asks for more
+                    yield index, processed
+
+                # Refill the window only after the finished results were consumed
+                while len(pending) < window and submit():
+                    pass
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            # Log final statistics
+            self._log_batch_statistics()
 
     async def _process_single_image(self, image_path: Path,
                                    output_dir: Optional[Path]) -> Optional[ProcessedImage]:
@@ -298,14 +531,13 @@ class BatchImageProcessor:
                     data={"path": str(image_path), "name": image_path.name}
                 )
 
+                output_path = output_dir / f"{image_path.stem}_processed.jpg" if output_dir else None
+
                 # Process image
-                processed = await asyncio.get_event_loop().run_in_executor(
-                    None, self.processor.process_image, image_path
-                )
+                processed = await self._run_processor(image_path, output_path)
 
-                # Save to output directory if specified
-                if output_dir:
-                    output_path = output_dir / f"{image_path.stem}_processed.jpg"
+                # Save to output directory if specified (process workers already wrote it)
+                if output_path and self.executor == THREAD_EXECUTOR:
                     async with aiofiles.open(output_path, 'wb') as f:
                         await f.write(processed.processed_data)
 
@@ -358,106 +590,147 @@ class SanityImageUploader:
     """Async image uploader with retry logic and progress tracking"""
 
     def __init__(self, sanity_client, migration_logger: MigrationLogger,
-                 max_concurrent_uploads: int = 3):
+                 max_concurrent_uploads: int = 3,
+                 asset_cache: Optional[AssetUploadCache] = None):
         self.sanity_client = sanity_client
         self.migration_logger = migration_logger
         self.max_concurrent = max_concurrent_uploads
         self.semaphore = asyncio.Semaphore(max_concurrent_uploads)
+        self.asset_cache = asset_cache
 
         self.upload_stats = {
             "total_uploads": 0,
             "successful_uploads": 0,
             "failed_uploads": 0,
+            "cached_uploads": 0,
             "bytes_uploaded": 0
         }
 
-    @retry_on_error(max_attempts=3, backoff_factor=2.0)
+    # Shared by every uploader: once Sanity keeps failing, stop sending uploads
+    circuit_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0, name="sanity-assets")
+    retry_policy = RetryPolicy(max_attempts=3, backoff_factor=2.0, circuit_breaker=circuit_breaker)
+
     async def upload_image(self, processed_image: ProcessedImage,
                           filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Upload processed image to Sanity with retry logic"""
 
-        async with self.semaphore:
-            try:
-                item_id = f"upload_{processed_image.checksum[:8]}"
-                self.migration_logger.add_item(
-                    item_id=item_id,
-                    item_type="upload",
-                    data={
-                        "original_path": str(processed_image.original_path),
-                        "file_size": processed_image.file_size,
-                        "checksum": processed_image.checksum
-                    }
+        item_id = f"upload_{processed_image.checksum[:8]}"
+        self.migration_logger.add_item(
+            item_id=item_id,
+            item_type="upload",
+            data={
+                "original_path": str(processed_image.original_path),
+                "file_size": processed_image.file_size,
+                "checksum": processed_image.checksum
+            }
+        )
+
+        # Prepare filename
+        if not filename:
+            filename = f"{processed_image.original_path.stem}_processed.{processed_image.format.lower()}"
+
+        def record_retry(e: Exception, attempt: int, delay: float):
+            # Attempts that will be retried are not failures yet
+            self.migration_logger.update_item_status(item_id, MigrationStatus.RETRY)
+            self.migration_logger.logger.warning(
+                "Upload attempt %d for %s failed, retrying in %.1fs: %s", attempt, filename, delay, e
+            )
+
+        try:
+            # Identical bytes were uploaded before: reuse that asset
+            cached_asset_id = None
+            if self.asset_cache is not None:
+                cached_asset_id = self.asset_cache.get(processed_image.checksum)
+
+            if cached_asset_id:
+                asset_response = {"_id": cached_asset_id}
+            else:
+                asset_response = await self.retry_policy.call_async(
+                    self._send_image, processed_image, filename, on_retry=record_retry
                 )
 
-                # Prepare filename
-                if not filename:
-                    filename = f"{processed_image.original_path.stem}_processed.{processed_image.format.lower()}"
+        except Exception as e:
+            self.upload_stats["failed_uploads"] += 1
+
+            # Create structured error
+            error_type = classify_error(e)
+            error = create_migration_error(
+                error_type=error_type,
+                message=f"Image upload failed: {str(e)}",
+                context={
+                    "filename": filename,
+                    "file_size": processed_image.file_size,
+                    "checksum": processed_image.checksum
+                },
+                exception=e,
+                is_recoverable=is_recoverable_error(error_type)
+            )
+
+            # Update migration status
+            self.migration_logger.update_item_status(item_id, MigrationStatus.FAILED, error)
+
+            self.migration_logger.logger.error("Failed to upload %s: %s", filename, e)
+            raise
+
+        # Update statistics
+        self.upload_stats["successful_uploads"] += 1
+        if cached_asset_id:
+            self.upload_stats["cached_uploads"] += 1
+        else:
+            self.upload_stats["bytes_uploaded"] += processed_image.file_size
+            if self.asset_cache is not None:
+                self.asset_cache.put(processed_image.checksum, asset_response['_id'], filename)
+
+        # Update migration status
+        self.migration_logger.update_item_status(item_id, MigrationStatus.SUCCESS)
+
+        self.migration_logger.logger.info("Successfully uploaded %s (ID: %s)", filename, asset_response['_id'])
+
+        return {
+            "_type": "image",
+            "asset": {
+                "_type": "reference",
+                "_ref": asset_response['_id']
+            },
+            "metadata": {
+                "dimensions": {
+                    "width": processed_image.dimensions[0],
+                    "height": processed_image.dimensions[1]
+                },
+                "checksum": processed_image.checksum,
+                "original_filename": processed_image.original_path.name
+            }
+        }
 
-                # Upload to Sanity
+    async def _send_image(self, processed_image: ProcessedImage, filename: str) -> Dict[str, Any]:
+        """One upload attempt; retries wait outside the concurrency limit"""
+        async with self.semaphore:
+            # Upload to Sanity; async clients are awaited directly,
+            # blocking clients are pushed to the default executor
+            if asyncio.iscoroutinefunction(self.sanity_client.assets_upload):
+                asset_response = await self.sanity_client.assets_upload(
+                    memoryview(processed_image.processed_data),
+                    processed_image.mime_type,
+                    filename
+                )
+            else:
                 asset_response = await asyncio.get_event_loop().run_in_executor(
                     None,
                     self.sanity_client.assets_upload,
-                    processed_image.processed_data,
+                    memoryview(processed_image.processed_data),
                     processed_image.mime_type,
                     filename
                 )
 
-                if asset_response and '_id' in asset_response:
-                    # Update statistics
-                    self.upload_stats["successful_uploads"] += 1
-                    self.upload_stats["bytes_uploaded"] += processed_image.file_size
-
-                    # Update migration status
-                    self.migration_logger.update_item_status(item_id, MigrationStatus.SUCCESS)
-
-                    self.migration_logger.logger.info(
-                        f"Successfully uploaded {filename} (ID: {asset_response['_id']})"
-                    )
-
-                    return {
-                        "_type": "image",
-                        "asset": {
-                            "_type": "reference",
-                            "_ref": asset_response['_id']
-                        },
-                        "metadata": {
-                            "dimensions": {
-                                "width": processed_image.dimensions[0],
-                                "height": processed_image.dimensions[1]
-                            },
-                            "checksum": processed_image.checksum,
-                            "original_filename": processed_image.original_path.name
-                        }
-                    }
-                else:
-                    raise Exception("Invalid response from Sanity asset upload")
-
-            except Exception as e:
-                self.upload_stats["failed_uploads"] += 1
-
-                # Create structured error
-                error = create_migration_error(
-                    error_type=MigrationErrorType.SANITY_API_ERROR,
-                    message=f"Image upload failed: {str(e)}",
-                    context={
-                        "filename": filename,
-                        "file_size": processed_image.file_size,
-                        "checksum": processed_image.checksum
-                    },
-                    exception=e
-                )
-
-                # Update migration status
-                self.migration_logger.update_item_status(item_id, MigrationStatus.FAILED, error)
-
-                self.migration_logger.logger.error(f"Failed to upload {filename}: {str(e)}")
-                raise
+        if not asset_response or '_id' not in asset_response:
+            raise Exception("Invalid response from Sanity asset upload")
+        return asset_response
 
     async def upload_images_batch(self, processed_images: List[ProcessedImage]) -> List[Dict[str, Any]]:
         """Upload multiple processed images concurrently"""
 
         self.upload_stats["total_uploads"] = len(processed_images)
-        self.migration_logger.logger.info(f"Starting batch upload of {len(processed_images)} images")
+        self.migration_logger.logger.info("Starting batch upload of %d images", len(processed_images))
 
         # Upload images concurrently
         tasks = [
@@ -480,11 +753,145 @@ class SanityImageUploader:
             f"Batch upload completed: "
             f"{self.upload_stats['successful_uploads']} successful, "
             f"{self.upload_stats['failed_uploads']} failed, "
+            f"{self.upload_stats['cached_uploads']} reused from cache, "
             f"{self.upload_stats['bytes_uploaded']} bytes uploaded"
         )
 
+        if self.asset_cache is not None:
+            self.asset_cache.save()
+
         return successful_uploads
 
+@dataclass
+class StageMetrics:
+    """Throughput counters for one pipeline stage"""
+    name: str
+    items: int = 0
+    failed: int = 0
+    bytes: int = 0
+    # Time spent waiting on the queue: blocked on a full queue (process)
+    # or idle on an empty one (upload)
+    wait_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.name}: {self.items} ok, {self.failed} failed, "
+            f"{self.bytes} bytes in {self.elapsed:.2f}s "
+            f"({self.items_per_second:.1f} images/s, {self.wait_seconds:.2f}s waiting on queue)"
+        )
+
+class ImageUploadPipeline:
+    """
+    Two-stage process -> upload pipeline connected by a bounded queue.
+
+    Processing runs through BatchImageProcessor.iter_processed_images() and
+    each finished image is queued for one of `uploader.max_concurrent`
+    upload workers, so uploads start as soon as the first image is ready
+    and wall time approaches the slower stage instead of the sum of both.
+    A full queue blocks the processing stage, which bounds the number of
+    encoded images held in memory.
+    """
+
+    def __init__(self, batch_processor: BatchImageProcessor,
+                 uploader: SanityImageUploader,
+                 queue_size: Optional[int] = None):
+        self.batch_processor = batch_processor
+        self.uploader = uploader
+        self.queue_size = queue_size or 2 * uploader.max_concurrent
+
+        self.process_metrics = StageMetrics("process")
+        self.upload_metrics = StageMetrics("upload")
+
+    async def run(self, image_paths: Iterable[Path]) -> List[Dict[str, Any]]:
+        """Process and upload `image_paths`, returning the uploaded image references"""
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        uploaded: List[Dict[str, Any]] = []
+        upload_workers = self.uploader.max_concurrent
+
+        producer = asyncio.ensure_future(self._process_stage(image_paths, queue))
+        consumers = [
+            asyncio.ensure_future(self._upload_stage(queue, uploaded))
+            for _ in range(upload_workers)
+        ]
+
+        try:
+            await producer
+            # One end-of-stream marker per upload worker
+            for _ in consumers:
+                await queue.put(None)
+            await asyncio.gather(*consumers)
+        finally:
+            for task in (producer, *consumers):
+                task.cancel()
+            if self.uploader.asset_cache is not None:
+                self.uploader.asset_cache.save()
+
+        self.log_metrics()
+        return uploaded
+
+    async def _process_stage(self, image_paths: Iterable[Path], queue: asyncio.Queue):
+        metrics = self.process_metrics
+        loop = asyncio.get_event_loop()
+        metrics.started_at = loop.time()
+        try:
+            async for processed in self.batch_processor.iter_processed_images(image_paths):
+                metrics.items += 1
+                metrics.bytes += processed.file_size
+
+                put_started = loop.time()
+                await queue.put(processed)
+                metrics.wait_seconds += loop.time() - put_started
+        finally:
+            metrics.finished_at = loop.time()
+            stats = self.batch_processor.stats
+            metrics.failed = stats["failed"] + stats["skipped"]
+
+    async def _upload_stage(self, queue: asyncio.Queue, uploaded: List[Dict[str, Any]]):
+        metrics = self.upload_metrics
+        loop = asyncio.get_event_loop()
+        if metrics.started_at is None:
+            metrics.started_at = loop.time()
+
+        while True:
+            get_started = loop.time()
+            processed = await queue.get()
+            metrics.wait_seconds += loop.time() - get_started
+            if processed is None:
+                break
+
+            self.uploader.upload_stats["total_uploads"] += 1
+            try:
+                result = await self.uploader.upload_image(processed)
+            except Exception:
+                # Already logged and recorded by upload_image
+                metrics.failed += 1
+                continue
+            finally:
+                metrics.finished_at = loop.time()
+
+            if result:
+                metrics.items += 1
+                metrics.bytes += processed.file_size
+                uploaded.append(result)
+
+    def log_metrics(self):
+        logger = self.batch_processor.migration_logger.logger
+        logger.info("Pipeline stage %s", self.process_metrics.summary())
+        logger.info("Pipeline stage %s", self.upload_metrics.summary())
+
 def create_processing_config(quality_preset: str = "standard") -> ImageProcessingConfig:
     """Create image processing configuration based on quality preset"""
 
@@ -517,26 +924,55 @@ def create_processing_config(quality_preset: str = "standard") -> ImageProcessin
 async def process_and_upload_images(image_paths: List[Path],
                                   sanity_client,
                                   migration_logger: MigrationLogger,
-                                  quality_preset: str = "standard") -> List[Dict[str, Any]]:
-    """Complete pipeline: process and upload images"""
+                                  quality_preset: str = "standard",
+                                  asset_cache: Optional[AssetUploadCache] = None,
+                                  executor: str = THREAD_EXECUTOR,
+                                  derivative_cache: Optional[DerivativeCache] = None,
+                                  max_concurrent_processing: int = 4,
+                                  max_concurrent_uploads: int = 3,
+                                  queue_size: Optional[int] = None,
+                                  dedupe_threshold: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Complete pipeline: process and upload images, overlapping the two stages.
+
+    With `dedupe_threshold`, near-duplicate images (perceptual hashes within
+    that many bits) are collapsed onto their largest copy before processing.
+    """
 
     # Create processing configuration
     config = create_processing_config(quality_preset)
 
-    # Initialize processors
-    batch_processor = BatchImageProcessor(migration_logger, config)
-    uploader = SanityImageUploader(sanity_client, migration_logger)
-
-    # Process images
-    processed_images = await batch_processor.process_images_batch(image_paths)
+    # Skip processing and uploading the same photo more than once
+    if dedupe_threshold is not None:
+        image_paths, duplicate_groups = await asyncio.get_event_loop().run_in_executor(
+            None, collapse_paths, image_paths, dedupe_threshold
+        )
+        for group in duplicate_groups:
+            migration_logger.logger.info(
+                f"Near-duplicates of {group.keep.name} skipped: "
+                f"{', '.join(path.name for path in group.duplicates)}"
+            )
 
-    if not processed_images:
+    # Initialize processors
+    batch_processor = BatchImageProcessor(migration_logger, config,
+                                          max_concurrent=max_concurrent_processing,
+                                          executor=executor,
+                                          derivative_cache=derivative_cache)
+    uploader = SanityImageUploader(sanity_client, migration_logger,
+                                   max_concurrent_uploads=max_concurrent_uploads,
+                                   asset_cache=asset_cache)
+
+    # Process and upload concurrently: each image is uploaded as soon as it is processed
+    pipeline = ImageUploadPipeline(batch_processor, uploader, queue_size=queue_size)
+    try:
+        uploaded_assets = await pipeline.run(image_paths)
+    finally:
+        batch_processor.close()
+
+    if not pipeline.process_metrics.items:
         migration_logger.logger.warning("No images were successfully processed")
         return []
 
-    # Upload processed images
-    uploaded_assets = await uploader.upload_images_batch(processed_images)
-
     migration_logger.logger.info(
         f"Pipeline completed: {len(uploaded_assets)} images successfully uploaded"
     )
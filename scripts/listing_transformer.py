@@ -0,0 +1,483 @@
+"""
+Listing Transformer
+Sustainable Digital Nomads Directory - Listing to Sanity Document Mapping
+
+Compiles a declarative field mapping (see LISTING_FIELD_MAPPING and
+CSV_LISTING_FIELD_MAPPING in migration_config) once into a list of
+per-field steps, then applies it without re-reading the mapping.
+Every migration entry point builds its listing documents through this
+module, so the mapping only has to be changed in one place.
+"""
+
+import copy
+import re
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from migration_config import (
+    CSV_FIELD_MAPPING,
+    CSV_LISTING_FIELD_MAPPING,
+    LISTING_FIELD_MAPPING,
+    SANITY_SCHEMA_MAPPING,
+)
+
+# Placeholder for "the document ID" in mapping defaults
+DOC_ID = "$id"
+
+_SANITY_ID_PATTERN = re.compile(r'[#?/\s\.]+')
+
+def slugify_for_sanity_id(text_id):
+    """
+    Sanitizes a string to be a valid Sanity document ID.
+    Replaces problematic characters, ensures it doesn't start/end with invalid chars.
+    """
+    if not text_id:
+        return None
+    # Replace common problematic characters with a hyphen
+    s = _SANITY_ID_PATTERN.sub('-', str(text_id).lower())
+    # Remove any leading/trailing hyphens that might result
+    s = s.strip('-')
+    # Ensure it's not empty after stripping
+    return s if s else None
+
+def to_sanity_id(text_id) -> Optional[str]:
+    """Slugify a value into a Sanity document ID"""
+    doc_id = slugify_for_sanity_id(text_id)
+    # Ensure ID doesn't start with a dot, which is invalid in Sanity
+    if doc_id and doc_id.startswith('.'):
+        doc_id = "id-" + doc_id.lstrip('.')
+    return doc_id
+
+# --- Field transforms ---
+# Each takes the source value and returns the document value. ValueError /
+# TypeError is reported as a warning and the field is left out.
+
+def _lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+def _strip(value):
+    return value.strip() if isinstance(value, str) else value
+
+def _to_float(value):
+    return None if value is None else float(value)
+
+def _string_list(value):
+    return [item for item in value or [] if item and isinstance(item, str)]
+
+def _http_urls(value):
+    return [url for url in value or [] if url and isinstance(url, str) and url.startswith("http")]
+
+def _split_list(value):
+    if not value or not isinstance(value, str):
+        return []
+    separator = CSV_FIELD_MAPPING["separator"]
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+def _kebab(value):
+    return str(value).replace('_', '-').lower()
+
+def _slug(value):
+    return {"_type": "slug", "current": value}
+
+def _geopoint(value):
+    if not isinstance(value, dict) or value.get("latitude") is None or value.get("longitude") is None:
+        return None
+    point = {
+        "_type": "geopoint",
+        "lat": float(value["latitude"]),
+        "lng": float(value["longitude"])
+    }
+    if value.get("altitude") is not None:
+        point["alt"] = float(value["altitude"])
+    return point
+
+def _utc_now(value):
+    return datetime.now(timezone.utc).isoformat()
+
+TRANSFORMS: Dict[str, Callable[[Any], Any]] = {
+    "lower": _lower,
+    "strip": _strip,
+    "float": _to_float,
+    "string_list": _string_list,
+    "http_urls": _http_urls,
+    "split_list": _split_list,
+    "kebab": _kebab,
+    "slug": _slug,
+    "geopoint": _geopoint,
+    "sanity_id": to_sanity_id,
+    "utc_now": _utc_now,
+}
+
+# One record being transformed: (record, doc_id, doc, warnings)
+Row = Tuple[Dict[str, Any], str, Dict[str, Any], List[str]]
+
+# A compiled field: step(rows) sets its target in every row's doc. Steps run
+# a field at a time over a batch of rows, so the per-record cost is a loop
+# iteration rather than a function call per field.
+FieldStep = Callable[[List[Row]], None]
+
+TransformSpec = Union[None, str, Callable[[Any], Any], Sequence[Union[str, Callable[[Any], Any]]]]
+
+def _compile_transform(spec: TransformSpec) -> Optional[Callable[[Any], Any]]:
+    """Resolve transform names and fold a list of transforms into one callable"""
+    if spec is None:
+        return None
+    if isinstance(spec, str) or callable(spec):
+        spec = [spec]
+
+    functions = []
+    for item in spec:
+        if callable(item):
+            functions.append(item)
+        elif item in TRANSFORMS:
+            functions.append(TRANSFORMS[item])
+        else:
+            raise ValueError(f"Unknown field transform: {item}")
+
+    if len(functions) == 1:
+        return functions[0]
+
+    def chained(value):
+        for function in functions:
+            value = function(value)
+        return value
+    return chained
+
+def _is_plain_copy(field: Dict[str, Any]) -> bool:
+    return ("value" not in field and field.get("source") is not None and field.get("default") != DOC_ID
+            and field.get("transform") is None and not field.get("omit_empty", False))
+
+def _is_immutable(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+def _deepcopy_step(target: str, value: Any) -> FieldStep:
+    """A mutable constant, copied per document (immutable ones live in the template)"""
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            doc[target] = copy.deepcopy(value)
+    return step
+
+def _get_transform_step(target: str, source: str, default: Any, transform: Callable[[Any], Any],
+                        omit_empty: bool, warning: str) -> FieldStep:
+    """record.get(source, default) through a transform"""
+    if omit_empty:
+        def step(rows):
+            for record, doc_id, doc, warnings in rows:
+                value = record.get(source, default)
+                # Missing optional sources skip the transform call entirely
+                if value is None:
+                    continue
+                try:
+                    value = transform(value)
+                except (ValueError, TypeError) as e:
+                    warnings.append(warning + str(record.get('name')) + ': ' + str(e))
+                    continue
+                if value is not None:
+                    doc[target] = value
+    else:
+        def step(rows):
+            for record, doc_id, doc, warnings in rows:
+                try:
+                    doc[target] = transform(record.get(source, default))
+                except (ValueError, TypeError) as e:
+                    warnings.append(warning + str(record.get('name')) + ': ' + str(e))
+    return step
+
+def _getter_transform_step(target: str, getter: Callable[[Dict[str, Any], str], Any],
+                           transform: Optional[Callable[[Any], Any]], omit_empty: bool,
+                           warning: str) -> FieldStep:
+    """A value derived from the document ID or a default, optionally transformed"""
+    if transform is None:
+        def step(rows):
+            for record, doc_id, doc, warnings in rows:
+                value = getter(record, doc_id)
+                if not omit_empty or value is not None:
+                    doc[target] = value
+        return step
+
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            try:
+                value = transform(getter(record, doc_id))
+            except (ValueError, TypeError) as e:
+                warnings.append(warning + str(record.get('name')) + ': ' + str(e))
+                continue
+            if not omit_empty or value is not None:
+                doc[target] = value
+    return step
+
+# Steps for the hot built-in transforms with the transform body written out,
+# saving a call per record; none of these can raise. Each factory takes
+# (target, source, default) and reads record.get(source, default), or
+# record.get(source, doc_id) when default is DOC_ID. The list filters use a
+# plain loop: on 3.11 a comprehension is itself a function call per record.
+
+def _fused_slug(target, source, default):
+    if default == DOC_ID:
+        def step(rows):
+            for record, doc_id, doc, warnings in rows:
+                doc[target] = {"_type": "slug", "current": record.get(source, doc_id)}
+    else:
+        def step(rows):
+            for record, doc_id, doc, warnings in rows:
+                doc[target] = {"_type": "slug", "current": record.get(source, default)}
+    return step
+
+def _fused_lower(target, source, default):
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            value = record.get(source, default)
+            doc[target] = value.lower() if isinstance(value, str) else value
+    return step
+
+def _fused_string_list(target, source, default):
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            doc[target] = items = []
+            for item in record.get(source, default) or ():
+                if item and isinstance(item, str):
+                    items.append(item)
+    return step
+
+def _fused_http_urls(target, source, default):
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            doc[target] = urls = []
+            for url in record.get(source, default) or ():
+                if url and isinstance(url, str) and url.startswith("http"):
+                    urls.append(url)
+    return step
+
+FUSED_STEPS: Dict[str, Callable[[str, str, Any], FieldStep]] = {
+    "slug": _fused_slug,
+    "lower": _fused_lower,
+    "string_list": _fused_string_list,
+    "http_urls": _fused_http_urls,
+}
+
+# Records per batch in transform_all(): small enough that a batch's documents
+# are still in cache when the next field step walks them again
+BATCH_SIZE = 1024
+
+# The same for omit_empty fields whose transform can fail: a None source or
+# result leaves the field out, ValueError / TypeError becomes a warning.
+# Factories take (target, source, default, warning).
+
+def _fused_optional_float(target, source, default, warning):
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            value = record.get(source, default)
+            if value is None:
+                continue
+            try:
+                doc[target] = float(value)
+            except (ValueError, TypeError) as e:
+                warnings.append(warning + str(record.get('name')) + ': ' + str(e))
+    return step
+
+def _fused_optional_geopoint(target, source, default, warning):
+    def step(rows):
+        for record, doc_id, doc, warnings in rows:
+            value = record.get(source, default)
+            if not isinstance(value, dict) or value.get("latitude") is None or value.get("longitude") is None:
+                continue
+            try:
+                point = {"_type": "geopoint", "lat": float(value["latitude"]), "lng": float(value["longitude"])}
+                if value.get("altitude") is not None:
+                    point["alt"] = float(value["altitude"])
+            except (ValueError, TypeError) as e:
+                warnings.append(warning + str(record.get('name')) + ': ' + str(e))
+                continue
+            doc[target] = point
+    return step
+
+FUSED_OPTIONAL_STEPS: Dict[str, Callable[[str, str, Any, str], FieldStep]] = {
+    "float": _fused_optional_float,
+    "geopoint": _fused_optional_geopoint,
+}
+
+class ListingTransformer:
+    """
+    Turns raw listing records into Sanity documents using a compiled field mapping.
+
+    The mapping is compiled once: plain `source -> target` fields become a
+    tuple of copy pairs, immutable constants go into a template every
+    document is copied from, and every other field becomes a step closure
+    specialised for its shape (get-with-transform, ID/default getter with
+    transform, or one of FUSED_STEPS / FUSED_OPTIONAL_STEPS), so no mapping lookups or per-field
+    branching happen per record. `transform_all()` copies the plain fields
+    record by record, then runs each step over batches of `batch_size` rows.
+    `transform()` returns `(document, warnings)`; the document is None when
+    no ID can be derived.
+    """
+
+    def __init__(self, mapping: Dict[str, Any] = LISTING_FIELD_MAPPING,
+                 document_type: str = SANITY_SCHEMA_MAPPING["document_type"],
+                 batch_size: int = BATCH_SIZE):
+        self.document_type = document_type
+        self.batch_size = batch_size
+        self.id_sources = tuple(mapping["id_sources"])
+        self.id_transform = _compile_transform(mapping.get("id_transform"))
+        self.id_default = mapping.get("id_default")
+        self.required_fields = tuple(
+            field for field in SANITY_SCHEMA_MAPPING["required_fields"] if field not in ("_id", "_type")
+        )
+
+        # A default-only field with nothing applied to it is just a constant
+        fields = [
+            {"target": field["target"], "value": field.get("default")}
+            if (field.get("source") is None and "value" not in field and field.get("default") != DOC_ID
+                and field.get("transform") is None and not field.get("omit_empty", False))
+            else field
+            for field in mapping["fields"]
+        ]
+        copies = [field for field in fields if _is_plain_copy(field)]
+        # (target, source) pairs, and (target, source, default) for copies with a default
+        self.copy_pairs = tuple(
+            (field["target"], field["source"]) for field in copies if field.get("default") is None
+        )
+        self.copy_defaults = tuple(
+            (field["target"], field["source"], field["default"]) for field in copies
+            if field.get("default") is not None
+        )
+
+        # Every document starts as a copy of the template, which holds a slot
+        # for each field that is always set (in mapping order) so the dict
+        # never grows per record, and the values of immutable constants
+        self.template = {'_id': None, '_type': document_type}
+        steps = []
+        for field in fields:
+            if self._always_sets(field):
+                self.template[field["target"]] = None
+            if "value" in field and _is_immutable(field["value"]):
+                self.template[field["target"]] = field["value"]
+            elif not _is_plain_copy(field):
+                steps.append(self._compile_field(field))
+        self.steps = tuple(steps)
+
+    @staticmethod
+    def _always_sets(field: Dict[str, Any]) -> bool:
+        """Whether the field is set for every record (it can't be omitted or fail)"""
+        if "value" in field or _is_plain_copy(field):
+            return True
+        if field.get("omit_empty", False) or field.get("source") is None:
+            return False
+        transform_spec = field.get("transform")
+        return (isinstance(transform_spec, str) and transform_spec in FUSED_STEPS
+                and (field.get("default") != DOC_ID or transform_spec == "slug"))
+
+    @staticmethod
+    def _compile_field(field: Dict[str, Any]) -> FieldStep:
+        """Specialise one non-copy field mapping entry into a step closure"""
+        target = field["target"]
+        if "value" in field:
+            return _deepcopy_step(target, field["value"])
+
+        source = field.get("source")
+        default = field.get("default")
+        transform_spec = field.get("transform")
+        omit_empty = bool(field.get("omit_empty", False))
+
+        fused = FUSED_STEPS.get(transform_spec) if isinstance(transform_spec, str) else None
+        if (fused is not None and source is not None and not omit_empty
+                and (default != DOC_ID or transform_spec == "slug")):
+            return fused(target, source, default)
+
+        warning = f"  Warning: Could not parse {source or target} for "
+        fused = FUSED_OPTIONAL_STEPS.get(transform_spec) if isinstance(transform_spec, str) else None
+        if fused is not None and source is not None and omit_empty and default != DOC_ID:
+            return fused(target, source, default, warning)
+
+        transform = _compile_transform(transform_spec)
+
+        if source is not None and default != DOC_ID:
+            if transform is None:
+                # Only omit_empty plain fields get here
+                return _getter_transform_step(target, lambda record, doc_id: record.get(source, default),
+                                              None, True, warning)
+            return _get_transform_step(target, source, default, transform, omit_empty, warning)
+
+        if source is not None:
+            getter = lambda record, doc_id: record.get(source, doc_id)
+        elif default == DOC_ID:
+            getter = lambda record, doc_id: doc_id
+        else:
+            getter = lambda record, doc_id: default
+        return _getter_transform_step(target, getter, transform, omit_empty, warning)
+
+    def transform(self, record: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """Build the Sanity document for one record"""
+        return self.transform_all((record,))[0]
+
+    def document_id(self, record: Dict[str, Any]) -> Optional[str]:
+        """Derive the document ID from the first non-empty ID source"""
+        value = None
+        for source in self.id_sources:
+            value = record.get(source)
+            if value:
+                break
+        if self.id_transform is not None:
+            value = self.id_transform(value)
+        return value or self.id_default
+
+    def transform_all(self, records: Iterable[Dict[str, Any]]) -> List[Tuple[Optional[Dict[str, Any]], List[str]]]:
+        """Build documents for a whole array of records, in order"""
+        id_sources = self.id_sources
+        id_transform = self.id_transform
+        id_default = self.id_default
+        template = self.template
+        copy_pairs = self.copy_pairs
+        copy_defaults = self.copy_defaults
+        batch_size = self.batch_size
+
+        results = []
+        rows = []
+        for record in records:
+            if len(rows) == batch_size:
+                self._finish(rows)
+                rows = []
+            # document_id(), written out to save a call per record
+            get = record.get
+            doc_id = None
+            for source in id_sources:
+                doc_id = get(source)
+                if doc_id:
+                    break
+            if id_transform is not None:
+                doc_id = id_transform(doc_id)
+            doc_id = doc_id or id_default
+            if not doc_id:
+                results.append((None, ['  Skipping listing due to missing ID/slug/name: ' + str(get('name', 'N/A'))]))
+                continue
+
+            doc = template.copy()
+            doc['_id'] = doc_id
+            for target, source in copy_pairs:
+                doc[target] = get(source)
+            for target, source, default in copy_defaults:
+                doc[target] = get(source, default)
+            warnings = []
+            results.append((doc, warnings))
+            rows.append((record, doc_id, doc, warnings))
+        self._finish(rows)
+        return results
+
+    def _finish(self, rows: List[Row]) -> None:
+        """Run the field steps and required-field checks over one batch of rows"""
+        for step in self.steps:
+            step(rows)
+
+        for field in self.required_fields:
+            for record, doc_id, doc, warnings in rows:
+                if not doc.get(field):
+                    warnings.append(f"  Warning: Required field '{field}' is empty for document {doc_id}")
+
+# Shared transformers for the two listing sources
+LISTING_TRANSFORMER = ListingTransformer(LISTING_FIELD_MAPPING)
+CSV_LISTING_TRANSFORMER = ListingTransformer(CSV_LISTING_FIELD_MAPPING)
+
+def get_listing_doc_id(listing: Dict[str, Any]) -> Optional[str]:
+    """
+    Derive the Sanity document ID for a listing from its slug, id or name
+    """
+    return LISTING_TRANSFORMER.document_id(listing)
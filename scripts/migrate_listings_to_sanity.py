@@ -1,14 +1,26 @@
+import itertools
 import json
+import mmap
 import os
-import re
+import sys
 import requests
+import threading
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from urllib.parse import quote
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union, Any
 from requests.adapters import HTTPAdapter
-from urllib3.util import Retry
 from dotenv import load_dotenv
 
+from asset_cache import AssetUploadCache, hash_file
+from delta_sync import SyncState, apply_delta, plan_delta
+from image_index import IMAGE_STAGING_PATH, PUBLIC_IMAGES_PATH, ImageIndex, get_image_index, set_image_index
+from listing_transformer import LISTING_TRANSFORMER, get_listing_doc_id, slugify_for_sanity_id
+from migration_config import MIGRATION_CONFIG
+from sanity_rate_limit import ASSET, MUTATION, QUERY, RequestSlot, SanityRateLimiter, ThrottleAwareRetry
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -34,9 +46,12 @@ class SanityTransaction:
         self.mutations.append({"createOrReplace": document})
         return self
 
-    def patch(self, document_id: str, set_patch: Optional[Dict] = None, unset: Optional[List[str]] = None) -> 'SanityTransaction':
-        """Add a patch mutation to the transaction"""
+    def patch(self, document_id: str, set_patch: Optional[Dict] = None, unset: Optional[List[str]] = None,
+              if_revision_id: Optional[str] = None) -> 'SanityTransaction':
+        """Add a patch mutation to the transaction, optionally only if the document is still at `if_revision_id`"""
         patch = {"id": document_id}
+        if if_revision_id:
+            patch["ifRevisionID"] = if_revision_id
         if set_patch:
             patch["set"] = set_patch
         if unset:
@@ -53,33 +68,244 @@ class SanityTransaction:
         """Commit the transaction"""
         return self.client.commit_transaction(self.mutations, return_docs)
 
+# Responses that reject specific mutations (validation, revision conflict,
+# oversized payload), worth re-committing a failed chunk one by one for
+ISOLATED_FAILURE_STATUSES = (400, 409, 413)
+
+class SanityBatch:
+    """
+    Groups many mutations into size- and count-bounded transactions.
+
+    Each mutation is tagged with a caller-supplied key (e.g. the listing index).
+    Pending mutations are committed as soon as either bound is reached, and the
+    per-mutation results of every commit are mapped back to their keys in
+    `results` (successes) and `errors` (failures). Other API errors (throttling,
+    server or connection failures) are recorded for the chunk's keys and
+    re-raised.
+    """
+
+    def __init__(self, client, max_mutations: int = 100, max_bytes: int = 2 * 1024 * 1024,
+                 return_docs: bool = False, isolate_failures: bool = True):
+        self.client = client
+        self.max_mutations = max_mutations
+        self.max_bytes = max_bytes
+        self.return_docs = return_docs
+        self.isolate_failures = isolate_failures
+
+        self._pending: List[Tuple[Any, Dict[str, Any]]] = []
+        self._pending_bytes = 0
+        # Default keys count up past every key already queued, explicit or not
+        self._auto_keys = itertools.count()
+        self._used_keys: set = set()
+
+        self.results: Dict[Any, Dict[str, Any]] = {}
+        self.errors: Dict[Any, SanityAPIError] = {}
+        self.transactions_committed = 0
+
+    def __enter__(self) -> 'SanityBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def create(self, document: Dict[str, Any], key: Any = None) -> 'SanityBatch':
+        """Queue a create mutation"""
+        return self.add({"create": document}, key)
+
+    def create_or_replace(self, document: Dict[str, Any], key: Any = None) -> 'SanityBatch':
+        """Queue a createOrReplace mutation"""
+        return self.add({"createOrReplace": document}, key)
+
+    def patch(self, document_id: str, set_patch: Optional[Dict] = None, unset: Optional[List[str]] = None,
+              key: Any = None, if_revision_id: Optional[str] = None) -> 'SanityBatch':
+        """Queue a patch mutation, optionally only if the document is still at `if_revision_id`"""
+        transaction = SanityTransaction(self.client).patch(document_id, set_patch, unset, if_revision_id)
+        return self.add(transaction.mutations[0], key)
+
+    def delete(self, document_id: str, key: Any = None) -> 'SanityBatch':
+        """Queue a delete mutation"""
+        return self.add({"delete": {"id": document_id}}, key)
+
+    def add(self, mutation: Dict[str, Any], key: Any = None) -> 'SanityBatch':
+        """Queue a raw mutation, committing the pending batch first if it would overflow"""
+        if key is None:
+            key = next(self._auto_keys)
+            while key in self._used_keys:
+                key = next(self._auto_keys)
+        self._used_keys.add(key)
+
+        size = len(json.dumps(mutation, default=str))
+        if self._pending and (len(self._pending) >= self.max_mutations or
+                              self._pending_bytes + size > self.max_bytes):
+            self.flush()
+
+        self._pending.append((key, mutation))
+        self._pending_bytes += size
+        return self
+
+    def flush(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Commit all pending mutations and return (key, result) pairs for this commit"""
+        if not self._pending:
+            return []
+
+        chunk = self._pending
+        self._pending = []
+        self._pending_bytes = 0
+
+        return self._commit_chunk(chunk)
+
+    def _commit_chunk(self, chunk: List[Tuple[Any, Dict[str, Any]]]) -> List[Tuple[Any, Dict[str, Any]]]:
+        """Commit one transaction and map its results back to the mutation keys"""
+        try:
+            response = self.client.commit_transaction([mutation for _, mutation in chunk], self.return_docs)
+        except SanityAPIError as e:
+            rejected = e.response is not None and e.response.status_code in ISOLATED_FAILURE_STATUSES
+
+            # A transaction is atomic, so one bad document fails the whole chunk.
+            # Re-commit mutations one by one to pin the failure on the right keys.
+            if rejected and self.isolate_failures and len(chunk) > 1:
+                committed = []
+                for entry in chunk:
+                    committed.extend(self._commit_chunk([entry]))
+                return committed
+
+            for key, _ in chunk:
+                self.errors[key] = e
+            if not rejected:
+                # Throttling, outages and connection errors affect every
+                # mutation alike; splitting the chunk would only add requests
+                raise
+            return []
+
+        self.transactions_committed += 1
+        transaction_id = response.get("transactionId")
+        results = response.get("results", [])
+
+        committed = []
+        for index, (key, _) in enumerate(chunk):
+            result = dict(results[index]) if index < len(results) else {}
+            result["transactionId"] = transaction_id
+            self.results[key] = result
+            committed.append((key, result))
+        return committed
+
+# Anything assets_upload can send: in-memory bytes/buffers, an open binary file, or a path
+UploadSource = Union[bytes, bytearray, memoryview, BinaryIO, str, Path]
+
+class BufferReader:
+    """
+    Read-only, seekable file-like view over a buffer (memoryview, mmap, bytearray).
+
+    Lets requests stream a buffer in chunks with a known Content-Length,
+    slicing the underlying memory instead of copying it up front.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return len(self._view) - self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        chunk = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return chunk
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def close(self):
+        """Release the view so the underlying buffer (e.g. an mmap) can be closed"""
+        self._view.release()
+
+@contextmanager
+def open_upload_body(source: UploadSource) -> Iterator[Union[bytes, BinaryIO, BufferReader]]:
+    """
+    Turn an upload source into a request body that is streamed, not buffered.
+
+    Paths are memory-mapped so the file is paged in as it is sent, buffers are
+    wrapped in a zero-copy BufferReader, and open files are passed through.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                # Empty files cannot be memory-mapped
+                yield f
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                reader = BufferReader(mapped)
+                try:
+                    yield reader
+                finally:
+                    reader.close()
+    elif isinstance(source, (memoryview, bytearray)):
+        reader = BufferReader(source)
+        try:
+            yield reader
+        finally:
+            reader.close()
+    else:
+        yield source
+
 class SanityClient:
-    def __init__(self, project_id: str, dataset: str, token: str, api_version: str, use_cdn: bool = False):
+    def __init__(self, project_id: str, dataset: str, token: str, api_version: str, use_cdn: bool = False,
+                 pool_maxsize: int = 10, rate_limiter: Optional[SanityRateLimiter] = None,
+                 api_host: Optional[str] = None):
         self.project_id = project_id
         self.dataset = dataset
         self.token = token
         self.api_version = api_version
-        self.base_url = f"https://{project_id}.api.sanity.io/v{api_version}/data"
-        self.cdn_url = f"https://{project_id}.apicdn.sanity.io/v{api_version}/data" if use_cdn else None
+        # api_host overrides the API origin, e.g. to target fake_sanity_server offline
+        self.api_host = (api_host or f"https://{project_id}.api.sanity.io").rstrip("/")
+        self.base_url = f"{self.api_host}/v{api_version}/data"
+        self.cdn_url = f"https://{project_id}.apicdn.sanity.io/v{api_version}/data" if use_cdn and not api_host else None
         self.headers = {
             "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         }
+        # Shared request budgets and adaptive concurrency; None disables client-side limiting
+        self.rate_limiter = rate_limiter
 
         # Configure retry strategy
-        retry_strategy = Retry(
+        retry_strategy = ThrottleAwareRetry(
             total=3,  # number of retries
             backoff_factor=1,  # wait 1, 2, 4 seconds between retries
-            status_forcelist=[408, 429, 500, 502, 503, 504]  # HTTP status codes to retry on
+            status_forcelist=[408, 429, 500, 502, 503, 504],  # HTTP status codes to retry on
+            rate_limiter=rate_limiter  # 429s retried here still shrink concurrency
         )
         self.session = requests.Session()
-        self.session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
+        # pool_maxsize bounds the keep-alive connections reused by concurrent worker threads
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update(self.headers)
 
-    def _make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+    def _limited(self, category: str):
+        """Rate-limit context for one request of the given category"""
+        if self.rate_limiter is None:
+            return nullcontext(RequestSlot())
+        return self.rate_limiter.limit(category)
+
+    def _make_request(self, method: str, url: str, category: str = QUERY, **kwargs) -> Dict[str, Any]:
         """Make a request with retry logic and error handling"""
         try:
-            response = self.session.request(method, url, **kwargs)
+            with self._limited(category) as slot:
+                response = self.session.request(method, url, **kwargs)
+                slot.ok = response.status_code < 500
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RetryError as e:
@@ -96,11 +322,16 @@ class SanityClient:
         """Start a new transaction"""
         return SanityTransaction(self)
 
+    def batch(self, max_mutations: int = 100, max_bytes: int = 2 * 1024 * 1024,
+              return_docs: bool = False) -> SanityBatch:
+        """Start a batch that commits mutations in bounded multi-document transactions"""
+        return SanityBatch(self, max_mutations=max_mutations, max_bytes=max_bytes, return_docs=return_docs)
+
     def commit_transaction(self, mutations: List[Dict[str, Any]], return_docs: bool = False) -> Dict[str, Any]:
         """Commit a transaction with mutations"""
         url = f"{self.base_url}/mutate/{self.dataset}"
         params = {"returnDocuments": "true"} if return_docs else {}
-        return self._make_request("POST", url, json={"mutations": mutations}, params=params)
+        return self._make_request("POST", url, category=MUTATION, json={"mutations": mutations}, params=params)
 
     def create(self, document: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new document"""
@@ -122,9 +353,65 @@ class SanityClient:
         except SanityAPIError as e:
             if e.response and e.response.status_code == 404:
                 return None
-            raise    def assets_upload(self, file_content: bytes, content_type: str = "image/jpeg", filename: Optional[str] = None) -> Dict[str, Any]:
-        """Upload an asset (image)"""
-        url = f"https://{self.project_id}.api.sanity.io/v{self.api_version}/assets/images/{self.dataset}"
+            raise
+
+    def get_many(self, document_ids: List[str], chunk_size: int = 100,
+                 max_url_length: int = 6000) -> Dict[str, str]:
+        """
+        Look up many documents at once using the multi-id doc endpoint.
+
+        IDs are requested in chunks bounded by count and URL length, so a
+        whole run costs one round trip per chunk instead of one per document.
+
+        Returns:
+            Mapping of document ID -> current revision for every ID that exists
+        """
+        base = f"{self.cdn_url or self.base_url}/doc/{self.dataset}/"
+        revisions: Dict[str, str] = {}
+
+        chunk: List[str] = []
+        chunk_length = len(base)
+        for document_id in dict.fromkeys(filter(None, document_ids)):
+            encoded_id = quote(document_id, safe='')
+            if chunk and (len(chunk) >= chunk_size or chunk_length + len(encoded_id) + 1 > max_url_length):
+                revisions.update(self._get_chunk(base, chunk))
+                chunk, chunk_length = [], len(base)
+            chunk.append(encoded_id)
+            chunk_length += len(encoded_id) + 1
+
+        if chunk:
+            revisions.update(self._get_chunk(base, chunk))
+        return revisions
+
+    def _get_chunk(self, base: str, encoded_ids: List[str]) -> Dict[str, str]:
+        """Fetch one chunk of documents and map their IDs to revisions"""
+        result = self._make_request("GET", base + ",".join(encoded_ids))
+        return {
+            doc["_id"]: doc.get("_rev")
+            for doc in result.get("documents", [])
+            if doc and "_id" in doc
+        }
+
+    def query(self, groq: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Run a GROQ query and return its result"""
+        url = f"{self.cdn_url or self.base_url}/query/{self.dataset}"
+        query_params = {"query": groq}
+        for name, value in (params or {}).items():
+            query_params[f"${name}"] = json.dumps(value)
+        return self._make_request("GET", url, params=query_params).get("result")
+
+    def assets_upload(self, file_content: UploadSource, content_type: str = "image/jpeg", filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload an asset (image)
+
+        `file_content` may be bytes, a memoryview/bytearray, an open binary file
+        or a path; paths and buffers are streamed in chunks rather than read
+        into memory first.
+
+        Returns:
+            The created asset document (with `_id`)
+        """
+        url = f"{self.api_host}/v{self.api_version}/assets/images/{self.dataset}"
         headers = self.headers.copy()
         headers["Content-Type"] = content_type
 
@@ -133,16 +420,17 @@ class SanityClient:
             params["filename"] = filename
 
         try:
-            response = self.session.post(
-                url,
-                data=file_content,
-                headers=headers,
-                params=params
-            )
+            with open_upload_body(file_content) as body, self._limited(ASSET):
+                response = self.session.post(
+                    url,
+                    data=body,
+                    headers=headers,
+                    params=params
+                )
             response.raise_for_status()
+            # The API wraps the asset in {"document": {...}}
             result = response.json()
-            print(f"    Raw API response: {result}")  # Debug: show actual response
-            return result
+            return result.get("document", result)
         except requests.exceptions.RequestException as e:
             if hasattr(e, 'response') and e.response is not None:
                 print(f"    Error response status: {e.response.status_code}")
@@ -157,6 +445,9 @@ class SanityClient:
 SANITY_PROJECT_ID = "sc70w3cr"
 SANITY_DATASET = "production"
 SANITY_API_VERSION = "2025-05-22" # Current date for latest API version
+# Mutations are committed in multi-document transactions bounded by count and payload size
+MUTATION_BATCH_SIZE = 100
+MUTATION_BATCH_MAX_BYTES = 2 * 1024 * 1024
 # Token will be read from environment variable SANITY_API_TOKEN
 
 # --- Paths ---
@@ -165,10 +456,9 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 MERGED_LISTINGS_PATH = PROJECT_ROOT / "listings" / "merged_listings.json"
 
 # IMAGE HANDLING (Updated 2025-05-27):
-# Primary image location for manually curated and optimized images
-IMAGE_STAGING_PATH = PROJECT_ROOT / "sanity_image_staging"
-# Fallback location for any remaining development images
-PUBLIC_IMAGES_PATH = PROJECT_ROOT / "app-next-directory" / "public"
+# IMAGE_STAGING_PATH is the primary location for manually curated and
+# optimized images, PUBLIC_IMAGES_PATH the fallback for any remaining
+# development images (both defined in image_index)
 
 def find_image_path(relative_path: str) -> Optional[Path]:
     """
@@ -187,30 +477,8 @@ def find_image_path(relative_path: str) -> Optional[Path]:
     Returns:
         Path object if image is found, None otherwise
     """
-    # Skip external URLs
-    if relative_path.startswith(('http://', 'https://')):
-        return None
-
-    # Clean the path
-    clean_path = relative_path.lstrip('/')
-
-    # Try optimized images first (WebP format)
-    base_name = Path(clean_path).stem
-    optimized_webp = IMAGE_STAGING_PATH / "optimized" / f"{base_name}.webp"
-    if optimized_webp.exists():
-        return optimized_webp
-
-    # Try staging images (original format)
-    staging_path = IMAGE_STAGING_PATH / "images" / clean_path
-    if staging_path.exists():
-        return staging_path
-
-    # Try fallback location (app-next-directory/public)
-    fallback_path = PUBLIC_IMAGES_PATH / clean_path
-    if fallback_path.exists():
-        return fallback_path
-
-    return None
+    # Resolved against a one-shot scan of the three roots instead of stat calls per reference
+    return get_image_index().resolve(relative_path)
 
 def get_content_type(file_path: Path) -> str:
     """
@@ -225,27 +493,90 @@ def get_content_type(file_path: Path) -> str:
     }
     return content_types.get(file_path.suffix.lower(), 'image/jpeg')
 
-def slugify_for_sanity_id(text_id):
+# Uploads in progress by content digest, so image workers never upload
+# the same bytes twice while the first upload is still running
+_inflight_uploads: Dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+def upload_image_asset(client, image_path: Path,
+                       asset_cache: Optional[AssetUploadCache] = None,
+                       log: Callable[[str], None] = print) -> Optional[Dict[str, Any]]:
     """
-    Sanitizes a string to be a valid Sanity document ID.
-    Replaces problematic characters, ensures it doesn't start/end with invalid chars.
+    Upload a local image, reusing the asset from an earlier upload of identical bytes.
+
+    The file is hashed and uploaded straight from disk, never held in memory whole.
+    Concurrent calls for identical bytes wait for the first upload instead of
+    repeating it.
+
+    Returns:
+        The asset upload response, or {"_id": ...} when served from the cache
     """
-    if not text_id:
-        return None
-    # Replace common problematic characters with a hyphen
-    s = re.sub(r'[#?/\s\.]+', '-', str(text_id).lower())
-    # Remove any leading/trailing hyphens that might result
-    s = s.strip('-')
-    # Ensure it's not empty after stripping
-    return s if s else None
-
-def test_migration(client, num_listings=2):
+    if asset_cache is None:
+        return client.assets_upload(
+            image_path,
+            content_type=get_content_type(image_path),
+            filename=image_path.name
+        )
+
+    digest = hash_file(image_path)
+    with _inflight_lock:
+        cached_asset_id = asset_cache.get(digest)
+        inflight = _inflight_uploads.get(digest)
+        if not cached_asset_id and inflight is None:
+            _inflight_uploads[digest] = upload = Future()
+
+    if cached_asset_id:
+        log(f"    Reusing previously uploaded asset for {image_path.name}")
+        return {"_id": cached_asset_id}
+
+    if inflight is not None:
+        log(f"    Waiting for identical image already being uploaded: {image_path.name}")
+        image_asset = inflight.result()
+        return {"_id": image_asset["_id"]} if image_asset and '_id' in image_asset else image_asset
+
+    try:
+        image_asset = client.assets_upload(
+            image_path,
+            content_type=get_content_type(image_path),
+            filename=image_path.name
+        )
+        if image_asset and '_id' in image_asset:
+            try:
+                asset_cache.put(digest, image_asset['_id'], image_path.name)
+            except OSError as e:
+                # The upload itself succeeded; only the cache write failed
+                log(f"    Warning: Could not save asset cache: {e}")
+        upload.set_result(image_asset)
+        return image_asset
+    except BaseException as e:
+        upload.set_exception(e)
+        raise
+    finally:
+        # Later callers find the asset in the cache
+        with _inflight_lock:
+            _inflight_uploads.pop(digest, None)
+
+def fetch_existing_revisions(client, listings: List[Dict[str, Any]],
+                             extra_ids: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Look up which listings already exist in Sanity with one bulk request per chunk
+
+    `extra_ids` are looked up too, e.g. previously synced documents that may
+    have been removed from the listings file.
+    """
+    doc_ids = [get_listing_doc_id(listing) for listing in listings] + list(extra_ids or [])
+    existing = client.get_many([doc_id for doc_id in doc_ids if doc_id])
+    print(f"Found {len(existing)} existing documents out of {len(listings)} listings")
+    return existing
+
+def test_migration(client, num_listings=2, asset_cache=None):
     """
     Test the migration with a small subset of listings
 
     Args:
         client: SanityClient instance
         num_listings: Number of listings to test with (default: 2)
+        asset_cache: Optional AssetUploadCache shared with the full migration
     """
     print(f"\n=== Testing migration with {num_listings} listings ===\n")
 
@@ -262,6 +593,11 @@ def test_migration(client, num_listings=2):
         test_listings = listings_data[:num_listings]
         print(f"Selected {len(test_listings)} listings for testing")
 
+        existing_revisions = fetch_existing_revisions(client, test_listings)
+
+        if asset_cache is None:
+            asset_cache = AssetUploadCache()
+
         # Try to process each test listing
         created_count = 0
         updated_count = 0
@@ -270,61 +606,14 @@ def test_migration(client, num_listings=2):
         for index, listing in enumerate(test_listings):
             print(f"\nProcessing test listing {index + 1}/{len(test_listings)}: {listing.get('name', 'N/A')}")
 
-            doc_id_base = listing.get('slug') or listing.get('id') or listing.get('name')
-            doc_id = slugify_for_sanity_id(doc_id_base)
+            sanity_doc, warnings = LISTING_TRANSFORMER.transform(listing)
+            for line in warnings:
+                print(line)
 
-            if not doc_id:
-                print(f"  Skipping listing due to missing ID/slug/name: {listing.get('name', 'N/A')}")
+            if sanity_doc is None:
                 failed_count += 1
                 continue
 
-            # Ensure ID doesn't start with a dot, which is invalid in Sanity
-            if doc_id.startswith('.'):
-                doc_id = "id-" + doc_id.lstrip('.')
-
-
-            sanity_doc = {
-                "_id": doc_id,
-                "_type": "listing",
-                "name": listing.get("name"),
-                "slug": {"_type": "slug", "current": listing.get("slug", doc_id)}, # Use existing slug or generated doc_id
-                "descriptionShort": listing.get("description_short"),
-                "descriptionLong": listing.get("description_long"),
-                "address": listing.get("address_string"),
-                "city": listing.get("city"),
-                "country": listing.get("country"),
-                "postalCode": listing.get("postal_code"),
-                "category": listing.get("category"),
-                "website": listing.get("website_url"),
-                "phone": listing.get("phone_number"),
-                "status": listing.get("status", "active").lower(), # Default to active
-                "sourceUrls": [url for url in listing.get("source_urls", []) if url and isinstance(url, str) and url.startswith("http")],
-                "digitalNomadFeatures": [feat for feat in listing.get("digital_nomad_features", []) if feat and isinstance(feat, str)],
-                "ecoFocusTags": [tag for tag in listing.get("eco_focus_tags", []) if tag and isinstance(tag, str)],
-            }
-
-            coords = listing.get("coordinates")
-            if coords and isinstance(coords, dict) and \
-               coords.get("latitude") is not None and coords.get("longitude") is not None:
-                try:
-                    sanity_doc["location"] = {
-                        "_type": "geopoint",
-                        "lat": float(coords["latitude"]),
-                        "lng": float(coords["longitude"])
-                    }
-                    if coords.get("altitude") is not None:
-                         sanity_doc["location"]["alt"] = float(coords["altitude"])
-                except (ValueError, TypeError) as e:
-                    print(f"  Warning: Could not parse coordinates for {listing.get('name')}: {e}")
-
-
-            s_rating = listing.get("sustainability_rating")
-            if s_rating is not None:
-                try:
-                    sanity_doc["sustainabilityRating"] = float(s_rating)
-                except (ValueError, TypeError):
-                    print(f"  Warning: Invalid sustainability_rating for {listing.get('name')}: {s_rating}")
-
             # Image handling
             # TEMPORARY IMAGE HANDLING (2025-05-22):
             # This section uses a dual-location strategy until manual image curation is complete
@@ -337,25 +626,19 @@ def test_migration(client, num_listings=2):
                 if image_path:
                     try:
                         print(f"  Uploading main image: {image_path.name}...")
-                        with open(image_path, 'rb') as img_file:
-                            content_type = get_content_type(image_path)
-                            image_asset = client.assets_upload(
-                                img_file.read(),
-                                content_type=content_type,
-                                filename=image_path.name
-                            )
-
-                            if image_asset and '_id' in image_asset:
-                                sanity_doc["mainImage"] = {
-                                    "_type": "image",
-                                    "asset": {
-                                        "_type": "reference",
-                                        "_ref": image_asset['_id']
-                                    }
+                        image_asset = upload_image_asset(client, image_path, asset_cache)
+
+                        if image_asset and '_id' in image_asset:
+                            sanity_doc["mainImage"] = {
+                                "_type": "image",
+                                "asset": {
+                                    "_type": "reference",
+                                    "_ref": image_asset['_id']
                                 }
-                                print(f"    Successfully uploaded main image: {image_asset['_id']}")
-                            else:
-                                print(f"    Error: Invalid response from image upload")
+                            }
+                            print(f"    Successfully uploaded main image: {image_asset['_id']}")
+                        else:
+                            print(f"    Error: Invalid response from image upload")
 
                     except SanityAPIError as e:
                         print(f"  Error uploading main image {image_path.name}: {e}")
@@ -377,25 +660,19 @@ def test_migration(client, num_listings=2):
                     if image_path:
                         try:
                             print(f"  Uploading gallery image: {image_path.name}...")
-                            with open(image_path, 'rb') as img_file:
-                                content_type = get_content_type(image_path)
-                                gallery_asset = client.assets_upload(
-                                    img_file.read(),
-                                    content_type=content_type,
-                                    filename=image_path.name
-                                )
-
-                                if gallery_asset and '_id' in gallery_asset:
-                                    sanity_gallery.append({
-                                        "_type": "image",
-                                        "asset": {
-                                            "_type": "reference",
-                                            "_ref": gallery_asset['_id']
-                                        }
-                                    })
-                                    print(f"    Successfully uploaded gallery image: {gallery_asset['_id']}")
-                                else:
-                                    print(f"    Error: Invalid response from gallery image upload")
+                            gallery_asset = upload_image_asset(client, image_path, asset_cache)
+
+                            if gallery_asset and '_id' in gallery_asset:
+                                sanity_gallery.append({
+                                    "_type": "image",
+                                    "asset": {
+                                        "_type": "reference",
+                                        "_ref": gallery_asset['_id']
+                                    }
+                                })
+                                print(f"    Successfully uploaded gallery image: {gallery_asset['_id']}")
+                            else:
+                                print(f"    Error: Invalid response from gallery image upload")
 
                         except SanityAPIError as e:
                             print(f"  Error uploading gallery image {image_path.name}: {e}")
@@ -415,15 +692,7 @@ def test_migration(client, num_listings=2):
                 # Using transactions for better error handling and atomicity
                 transaction = client.transaction()
 
-                # Check if document exists
-                existing_doc = None
-                try:
-                    existing_doc = client.get_by_id(final_sanity_doc["_id"])
-                except SanityAPIError as e:
-                    if not (e.response and e.response.status_code == 404):
-                        raise
-
-                if existing_doc:
+                if final_sanity_doc["_id"] in existing_revisions:
                     print(f"  Document with ID '{final_sanity_doc['_id']}' already exists. Updating.")
                     transaction.create_or_replace(final_sanity_doc)
                     result = transaction.commit(return_docs=True)
@@ -442,6 +711,8 @@ def test_migration(client, num_listings=2):
                 print(f"  Error creating/updating document for {final_sanity_doc.get('name', 'N/A')} (ID: {final_sanity_doc.get('_id')}): {e}")
                 failed_count += 1
 
+        asset_cache.save()
+
         print("\n=== Test Migration Summary ===")
         print(f"Test listings processed: {len(test_listings)}")
         print(f"Successfully created: {created_count}")
@@ -454,6 +725,104 @@ def test_migration(client, num_listings=2):
         print(f"Error during test migration: {e}")
         return False
 
+def upload_image_reference(client, image_path: Path, asset_cache: Optional[AssetUploadCache],
+                           label: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Upload one image and build its Sanity image reference.
+
+    Runs on a worker thread, so messages are returned for the caller to print in order.
+
+    Returns:
+        (image reference or None, log lines)
+    """
+    log_lines = [f"  Uploading {label}: {image_path.name}..."]
+    try:
+        image_asset = upload_image_asset(client, image_path, asset_cache, log=log_lines.append)
+
+        if image_asset and '_id' in image_asset:
+            log_lines.append(f"    Successfully uploaded {label}: {image_asset['_id']}")
+            return {
+                "_type": "image",
+                "asset": {
+                    "_type": "reference",
+                    "_ref": image_asset['_id']
+                }
+            }, log_lines
+
+        log_lines.append(f"    Error: Invalid response from {label} upload")
+    except SanityAPIError as e:
+        log_lines.append(f"  Error uploading {label} {image_path.name}: {e}")
+    except Exception as e:
+        log_lines.append(f"  Unexpected error uploading {label} {image_path.name}: {e}")
+    return None, log_lines
+
+def prepare_listing_document(client, listing: Dict[str, Any], asset_cache: Optional[AssetUploadCache],
+                             image_executor: ThreadPoolExecutor,
+                             transformed: Optional[Tuple[Optional[Dict[str, Any]], List[str]]] = None
+                             ) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """
+    Build the Sanity document for one listing, uploading all of its images in parallel.
+
+    `transformed` is the listing's precomputed `LISTING_TRANSFORMER` result, if any.
+
+    Returns:
+        (final document or None if the listing must be skipped, log lines)
+    """
+    if transformed is None:
+        transformed = LISTING_TRANSFORMER.transform(listing)
+    sanity_doc, warnings = transformed
+    log_lines: List[str] = list(warnings)
+    if sanity_doc is None:
+        return None, log_lines
+
+    # Image handling
+    # TEMPORARY IMAGE HANDLING (2025-05-22):
+    # This section uses a dual-location strategy until manual image curation is complete
+    # TODO (2025-05-23): Simplify this to only use IMAGE_STAGING_PATH
+
+    main_image_relative_path = listing.get("primary_image_url")
+    gallery_image_relative_paths = listing.get("gallery_image_urls", [])
+    if not isinstance(gallery_image_relative_paths, list):
+        gallery_image_relative_paths = []
+
+    # Submit every distinct image once; the main image is often repeated in the gallery
+    uploads: Dict[Path, Any] = {}
+    slots = []  # (label, relative path, resolved path) in document order
+    for label, rel_path in [("main image", main_image_relative_path)] + \
+                           [("gallery image", p) for p in gallery_image_relative_paths]:
+        if not rel_path:
+            continue
+        image_path = find_image_path(rel_path)
+        if image_path and image_path not in uploads:
+            uploads[image_path] = image_executor.submit(upload_image_reference, client, image_path, asset_cache, label)
+        slots.append((label, rel_path, image_path))
+
+    sanity_gallery = []
+    reported = set()
+    for label, rel_path, image_path in slots:
+        if not image_path:
+            location_msg = "(checked both staging and public directories)" if not rel_path.startswith(('http://', 'https://')) else "(external URL - skipped)"
+            log_lines.append(f"  {label.capitalize()} not found {location_msg}: {rel_path}")
+            continue
+
+        image_ref, upload_log = uploads[image_path].result()
+        if image_path not in reported:
+            log_lines.extend(upload_log)
+            reported.add(image_path)
+
+        if image_ref is None:
+            continue
+        if label == "main image":
+            sanity_doc["mainImage"] = image_ref
+        else:
+            sanity_gallery.append(dict(image_ref))
+
+    if sanity_gallery:
+        sanity_doc["gallery"] = sanity_gallery
+
+    # Clean up None values from the document before sending
+    return {k: v for k, v in sanity_doc.items() if v is not None}, log_lines
+
 def init_sanity_client():
     """Initialize the Sanity client with credentials from environment"""
     api_token = os.environ.get("SANITY_TEST_TOKEN")
@@ -468,7 +837,10 @@ def init_sanity_client():
             dataset=SANITY_DATASET,
             token=api_token,
             api_version=SANITY_API_VERSION,
-            use_cdn=False
+            use_cdn=False,
+            pool_maxsize=max(10, MIGRATION_CONFIG["max_concurrent_uploads"] + 1),
+            rate_limiter=SanityRateLimiter.from_config(),
+            api_host=os.environ.get("SANITY_API_HOST")  # e.g. a local fake_sanity_server
         )
         print(f"Successfully initialized Sanity client for project '{SANITY_PROJECT_ID}', dataset '{SANITY_DATASET}'.")
         return client
@@ -476,9 +848,17 @@ def init_sanity_client():
         print(f"Error initializing Sanity client: {e}")
         return None
 
-def main():
-    print("Starting Sanity migration script...")
+def main(delta_sync: bool = False):
+    """
+    Migrate all listings to Sanity.
 
+    Args:
+        delta_sync: Only send listings whose content changed since the last
+            sync (patches where possible) and delete listings removed from the
+            source. Without it every listing is rewritten; either way the
+            sync state is refreshed for the next delta run.
+    """
+    print(f"Starting Sanity migration script ({'delta sync' if delta_sync else 'full sync'})...")
     client = init_sanity_client()
     if not client:
         return
@@ -495,190 +875,104 @@ def main():
         print(f"Error reading or parsing {MERGED_LISTINGS_PATH}: {e}")
         return
 
-    created_count = 0
-    updated_count = 0
     failed_count = 0
 
-    for index, listing in enumerate(listings_data):
-        print(f"\nProcessing listing {index + 1}/{len(listings_data)}: {listing.get('name', 'N/A')}")
+    sync_state = SyncState(target=f"{client.api_host}/{client.dataset}")
+    print(f"Sync state: {len(sync_state.documents)} tracked documents")
 
-        doc_id_base = listing.get('slug') or listing.get('id') or listing.get('name')
-        doc_id = slugify_for_sanity_id(doc_id_base)
+    try:
+        existing_revisions = fetch_existing_revisions(client, listings_data, extra_ids=list(sync_state.documents))
+    except SanityAPIError as e:
+        print(f"Error looking up existing documents: {e}")
+        return
 
-        if not doc_id:
-            print(f"  Skipping listing due to missing ID/slug/name: {listing.get('name', 'N/A')}")
-            failed_count +=1
-            continue
+    asset_cache = AssetUploadCache()
+    try:
+        evicted = asset_cache.verify_stale(client)
+        print(f"Asset cache: {len(asset_cache.entries)} entries ({evicted} stale entries evicted)")
+    except SanityAPIError as e:
+        print(f"Error verifying cached assets: {e}")
+        return
 
-        # Ensure ID doesn't start with a dot, which is invalid in Sanity
-        if doc_id.startswith('.'):
-            doc_id = "id-" + doc_id.lstrip('.')
-
-
-        sanity_doc = {
-            "_id": doc_id,
-            "_type": "listing",
-            "name": listing.get("name"),
-            "slug": {"_type": "slug", "current": listing.get("slug", doc_id)}, # Use existing slug or generated doc_id
-            "descriptionShort": listing.get("description_short"),
-            "descriptionLong": listing.get("description_long"),
-            "address": listing.get("address_string"),
-            "city": listing.get("city"),
-            "country": listing.get("country"),
-            "postalCode": listing.get("postal_code"),
-            "category": listing.get("category"),
-            "website": listing.get("website_url"),
-            "phone": listing.get("phone_number"),
-            "status": listing.get("status", "active").lower(), # Default to active
-            "sourceUrls": [url for url in listing.get("source_urls", []) if url and isinstance(url, str) and url.startswith("http")],
-            "digitalNomadFeatures": [feat for feat in listing.get("digital_nomad_features", []) if feat and isinstance(feat, str)],
-            "ecoFocusTags": [tag for tag in listing.get("eco_focus_tags", []) if tag and isinstance(tag, str)],
-        }
+    # Index local images once, reusing unchanged directories from the last run's snapshot
+    image_index = ImageIndex.from_snapshot()
+    image_index.save()
+    set_image_index(image_index)
+    print(f"Image index: {len(image_index)} files ({image_index.stats['scanned']} directories scanned, "
+          f"{image_index.stats['reused']} reused from snapshot)")
 
-        coords = listing.get("coordinates")
-        if coords and isinstance(coords, dict) and \
-           coords.get("latitude") is not None and coords.get("longitude") is not None:
-            try:
-                sanity_doc["location"] = {
-                    "_type": "geopoint",
-                    "lat": float(coords["latitude"]),
-                    "lng": float(coords["longitude"])
-                }
-                if coords.get("altitude") is not None:
-                     sanity_doc["location"]["alt"] = float(coords["altitude"])
-            except (ValueError, TypeError) as e:
-                print(f"  Warning: Could not parse coordinates for {listing.get('name')}: {e}")
+    prepared_documents: List[Dict[str, Any]] = []
+
+    # Listings are prepared concurrently, while their images upload on a
+    # separate pool, so at most `workers` uploads are in flight at once
+    workers = max(1, MIGRATION_CONFIG["max_concurrent_uploads"])
+    print(f"Preparing listings with {workers} concurrent workers")
+
+    # Field mapping is cheap and CPU-bound, so transform every listing up front
+    transformed = LISTING_TRANSFORMER.transform_all(listings_data)
 
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="listing") as listing_executor, \
+         ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image") as image_executor:
+        futures = [
+            listing_executor.submit(prepare_listing_document, client, listing, asset_cache,
+                                    image_executor, transformed[index])
+            for index, listing in enumerate(listings_data)
+        ]
+
+        # Consume results in input order so output, counters and batch order are deterministic
+        for index, future in enumerate(futures):
+            listing = listings_data[index]
+            print(f"\nProcessing listing {index + 1}/{len(listings_data)}: {listing.get('name', 'N/A')}")
 
-        s_rating = listing.get("sustainability_rating")
-        if s_rating is not None:
             try:
-                sanity_doc["sustainabilityRating"] = float(s_rating)
-            except (ValueError, TypeError):
-                print(f"  Warning: Invalid sustainability_rating for {listing.get('name')}: {s_rating}")
-
-        # Image handling
-        # TEMPORARY IMAGE HANDLING (2025-05-22):
-        # This section uses a dual-location strategy until manual image curation is complete
-        # TODO (2025-05-23): Simplify this to only use IMAGE_STAGING_PATH
-
-        # Main Image
-        main_image_relative_path = listing.get("primary_image_url")
-        if main_image_relative_path:
-            image_path = find_image_path(main_image_relative_path)
-            if image_path:
-                try:
-                    print(f"  Uploading main image: {image_path.name}...")
-                    with open(image_path, 'rb') as img_file:
-                        content_type = get_content_type(image_path)
-                        image_asset = client.assets_upload(
-                            img_file.read(),
-                            content_type=content_type,
-                            filename=image_path.name
-                        )
+                final_sanity_doc, log_lines = future.result()
+            except Exception as e:
+                print(f"  Unexpected error preparing listing {listing.get('name', 'N/A')}: {e}")
+                failed_count += 1
+                continue
 
-                        if image_asset and '_id' in image_asset:
-                            sanity_doc["mainImage"] = {
-                                "_type": "image",
-                                "asset": {
-                                    "_type": "reference",
-                                    "_ref": image_asset['_id']
-                                }
-                            }
-                            print(f"    Successfully uploaded main image: {image_asset['_id']}")
-                        else:
-                            print(f"    Error: Invalid response from image upload")
+            for line in log_lines:
+                print(line)
 
-                except SanityAPIError as e:
-                    print(f"  Error uploading main image {image_path.name}: {e}")
-                except Exception as e:
-                    print(f"  Unexpected error uploading main image {image_path.name}: {e}")
-            else:
-                location_msg = "(checked both staging and public directories)" if not main_image_relative_path.startswith(('http://', 'https://')) else "(external URL - skipped)"
-                print(f"  Main image not found {location_msg}: {main_image_relative_path}")
-
-        # Gallery Images
-        gallery_image_relative_paths = listing.get("gallery_image_urls", [])
-        if gallery_image_relative_paths and isinstance(gallery_image_relative_paths, list):
-            sanity_gallery = []
-            for rel_path in gallery_image_relative_paths:
-                if not rel_path:
-                    continue
-
-                image_path = find_image_path(rel_path)
-                if image_path:
-                    try:
-                        print(f"  Uploading gallery image: {image_path.name}...")
-                        with open(image_path, 'rb') as img_file:
-                            content_type = get_content_type(image_path)
-                            gallery_asset = client.assets_upload(
-                                img_file.read(),
-                                content_type=content_type,
-                                filename=image_path.name
-                            )
+            if final_sanity_doc is None:
+                failed_count += 1
+                continue
 
-                            if gallery_asset and '_id' in gallery_asset:
-                                sanity_gallery.append({
-                                    "_type": "image",
-                                    "asset": {
-                                        "_type": "reference",
-                                        "_ref": gallery_asset['_id']
-                                    }
-                                })
-                                print(f"    Successfully uploaded gallery image: {gallery_asset['_id']}")
-                            else:
-                                print(f"    Error: Invalid response from gallery image upload")
+            prepared_documents.append(final_sanity_doc)
 
-                    except SanityAPIError as e:
-                        print(f"  Error uploading gallery image {image_path.name}: {e}")
-                    except Exception as e:
-                        print(f"  Unexpected error uploading gallery image {image_path.name}: {e}")
-                else:
-                    location_msg = "(checked both staging and public directories)" if not rel_path.startswith(('http://', 'https://')) else "(external URL - skipped)"
-                    print(f"  Gallery image not found {location_msg}: {rel_path}")
+    asset_cache.save()
 
-            if sanity_gallery:
-                sanity_doc["gallery"] = sanity_gallery
+    # Listings that failed to prepare still count as present, so they are never deleted
+    source_ids = [document["_id"] for document, _ in transformed if document is not None]
+    plan = plan_delta(prepared_documents, sync_state, existing_revisions,
+                      source_ids=source_ids, full=not delta_sync, prune=delta_sync)
 
-        # Clean up None values from the document before sending
-        final_sanity_doc = {k: v for k, v in sanity_doc.items() if v is not None}
+    for op in plan.changes:
+        print(f"  {op.kind.capitalize()}: {op.document_id} ({op.reason})")
 
-        try:
-            # Using transactions for better error handling and atomicity
-            transaction = client.transaction()
+    result = apply_delta(client, plan, sync_state,
+                         max_mutations=MUTATION_BATCH_SIZE, max_bytes=MUTATION_BATCH_MAX_BYTES)
+    print(f"\nSent {len(plan.changes)} mutations in {result.transactions} transaction(s)")
 
-            # Check if document exists
-            existing_doc = None
-            try:
-                existing_doc = client.get_by_id(final_sanity_doc["_id"])
-            except SanityAPIError as e:
-                if not (e.response and e.response.status_code == 404):
-                    raise
-
-            if existing_doc:
-                print(f"  Document with ID '{final_sanity_doc['_id']}' already exists. Updating.")
-                transaction.create_or_replace(final_sanity_doc)
-                result = transaction.commit(return_docs=True)
-                doc_id = result.get('results', [{}])[0].get('id')
-                print(f"    Updated document: {doc_id}")
-                updated_count += 1
-            else:
-                print(f"  Creating new document with ID '{final_sanity_doc['_id']}'.")
-                transaction.create(final_sanity_doc)
-                result = transaction.commit(return_docs=True)
-                doc_id = result.get('results', [{}])[0].get('id')
-                print(f"    Created document: {doc_id}")
-                created_count += 1
-
-        except Exception as e:
-            print(f"  Error creating/updating document for {final_sanity_doc.get('name', 'N/A')} (ID: {final_sanity_doc.get('_id')}): {e}")
-            failed_count += 1
+    for document_id, error in result.errors.items():
+        print(f"  Error syncing document {document_id}: {error}")
+        failed_count += 1
 
+    counts = plan.counts()
     print("\n--- Migration Summary ---")
     print(f"Listings processed: {len(listings_data)}")
-    print(f"Successfully created: {created_count}")
-    print(f"Successfully updated/replaced: {updated_count}")
+    print(f"Successfully created: {len(result.applied['create'])}")
+    print(f"Successfully updated/replaced: {len(result.applied['replace'])}")
+    print(f"Successfully patched: {len(result.applied['patch'])}"
+          f" ({result.conflicts_replaced} replaced after revision conflicts)")
+    print(f"Deleted (removed from source): {len(result.applied['delete'])}")
+    print(f"Unchanged (skipped): {counts['unchanged']}")
     print(f"Failed: {failed_count}")
+    print(f"Asset cache hits (uploads skipped): {asset_cache.stats['hits']}")
+    if client.rate_limiter is not None:
+        concurrency = client.rate_limiter.concurrency
+        print(f"API throttling (429) responses: {concurrency.stats['throttled']}, "
+              f"final concurrency limit: {int(concurrency.limit)}")
     print("Sanity migration script finished.")
 
 if __name__ == "__main__":
@@ -695,7 +989,7 @@ if __name__ == "__main__":
         print("\nTest migration successful! Would you like to proceed with full migration? (y/N)")
         response = input().strip().lower()
         if response == 'y':
-            main()
+            main(delta_sync="--delta" in sys.argv[1:])
         else:
             print("Full migration cancelled.")
     else:
@@ -78,6 +78,21 @@ MIGRATION_CONFIG = {
     "create_rollback_plan": True
 }
 
+# Client-side Sanity API rate limiting
+RATE_LIMIT_CONFIG = {
+    # Request budgets per category (requests per second)
+    "mutations_per_second": 25,
+    "queries_per_second": 100,
+    "asset_uploads_per_second": 10,
+    "burst_seconds": 1.0,  # bucket capacity, in seconds of budget
+
+    # Adaptive (AIMD) concurrency
+    "initial_concurrency": 4,
+    "min_concurrency": 1,
+    "max_concurrency": 32,
+    "latency_target": 5.0  # seconds; slower responses shrink concurrency
+}
+
 # Logging configuration
 LOGGING_CONFIG = {
     "level": "INFO",
@@ -98,6 +113,51 @@ CSV_FIELD_MAPPING = {
     "separator": ";"  # For multi-value fields
 }
 
+# Listing -> Sanity document field mappings, compiled by listing_transformer.
+# Each field copies `source` (or a constant `value`) into `target`, falling back
+# to `default` ("$id" = the document ID) and applying the named `transform`s in
+# order. `omit_empty` drops the field instead of writing None.
+LISTING_FIELD_MAPPING = {
+    # merged_listings.json records
+    "id_sources": ["slug", "id", "name"],
+    "id_transform": "sanity_id",
+    "fields": [
+        {"target": "name", "source": "name"},
+        {"target": "slug", "source": "slug", "default": "$id", "transform": "slug"},
+        {"target": "descriptionShort", "source": "description_short"},
+        {"target": "descriptionLong", "source": "description_long"},
+        {"target": "address", "source": "address_string"},
+        {"target": "city", "source": "city"},
+        {"target": "country", "source": "country"},
+        {"target": "postalCode", "source": "postal_code"},
+        {"target": "category", "source": "category"},
+        {"target": "website", "source": "website_url"},
+        {"target": "phone", "source": "phone_number"},
+        {"target": "status", "source": "status", "default": "active", "transform": "lower"},
+        {"target": "sourceUrls", "source": "source_urls", "transform": "http_urls"},
+        {"target": "digitalNomadFeatures", "source": "digital_nomad_features", "transform": "string_list"},
+        {"target": "ecoFocusTags", "source": "eco_focus_tags", "transform": "string_list"},
+        {"target": "location", "source": "coordinates", "transform": "geopoint", "omit_empty": True},
+        {"target": "sustainabilityRating", "source": "sustainability_rating", "transform": "float", "omit_empty": True}
+    ]
+}
+
+CSV_LISTING_FIELD_MAPPING = {
+    # image_curation_helper.csv rows
+    "id_sources": [CSV_FIELD_MAPPING["id_field"]],
+    "id_transform": None,
+    # Rows without an ID are still migrated, as before the shared transformer
+    "id_default": "unknown",
+    "fields": [
+        {"target": "name", "source": CSV_FIELD_MAPPING["name_field"], "default": "", "transform": "strip"},
+        {"target": "slug", "default": "$id", "transform": ["kebab", "slug"]},
+        {"target": "sourceUrls", "source": CSV_FIELD_MAPPING["source_urls_field"], "transform": "split_list"},
+        {"target": "status", "value": "draft"},
+        {"target": "createdAt", "transform": "utc_now"},
+        {"target": "updatedAt", "transform": "utc_now"}
+    ]
+}
+
 # Sanity document schema mapping
 SANITY_SCHEMA_MAPPING = {
     "document_type": "listing",
@@ -109,6 +169,10 @@ SANITY_SCHEMA_MAPPING = {
     },
     "reference_fields": {
         "source_urls": "sourceUrls"
+    },
+    "field_mappings": {
+        "json": LISTING_FIELD_MAPPING,
+        "csv": CSV_LISTING_FIELD_MAPPING
     }
 }
 
@@ -141,6 +205,7 @@ def get_config() -> Dict[str, Any]:
         "sanity": SANITY_CONFIG,
         "images": IMAGE_CONFIG,
         "migration": MIGRATION_CONFIG,
+        "rate_limits": RATE_LIMIT_CONFIG,
         "logging": LOGGING_CONFIG,
         "csv_mapping": CSV_FIELD_MAPPING,
         "sanity_schema": SANITY_SCHEMA_MAPPING,
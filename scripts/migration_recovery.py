@@ -6,16 +6,25 @@ This module provides comprehensive error handling, recovery mechanisms,
 and detailed logging for the Sanity CMS migration process.
 """
 
+import asyncio
+import atexit
+import copy
 import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
 import time
 import traceback
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Callable, Union
+from typing import Dict, List, Optional, Any, Callable, Tuple, Union
 from dataclasses import dataclass, asdict
-from functools import wraps
+from functools import partial, wraps
 import pickle
 
 class MigrationErrorType(Enum):
@@ -62,10 +71,340 @@ class MigrationItem:
     attempts: int = 0
     success_at: Optional[str] = None
 
-class MigrationLogger:
-    """Enhanced logging system with structured output and recovery tracking"""
+# Journal events between compacted state snapshots
+SNAPSHOT_INTERVAL = 1000
+
+# The background state writer runs at least this often...
+STATE_FLUSH_INTERVAL = 0.2  # seconds
+# ...and as soon as this many item events are waiting
+STATE_FLUSH_ITEMS = 500
+
+# At most one routine per-item log line reaches the console per interval
+CONSOLE_SUMMARY_INTERVAL = 5.0  # seconds
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+def _enum_value(enum_cls, value: Any):
+    """Enum member from its value (or the `Class.NAME` form older state files contain)"""
+    if isinstance(value, enum_cls):
+        return value
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return enum_cls[str(value).rsplit(".", 1)[-1]]
+
+def error_from_dict(data: Dict[str, Any]) -> MigrationError:
+    return MigrationError(**dict(data, error_type=_enum_value(MigrationErrorType, data["error_type"])))
+
+def item_from_dict(data: Dict[str, Any]) -> MigrationItem:
+    return MigrationItem(**dict(
+        data,
+        status=_enum_value(MigrationStatus, data["status"]),
+        errors=[error_from_dict(error) for error in data.get("errors", [])]
+    ))
+
+class StateJournal:
+    """
+    Append-only NDJSON journal of migration item events plus a compacted snapshot.
+
+    Every event is one line in `<session>_journal.ndjson` with an increasing
+    `seq`. A snapshot (`<session>_state.json`) records the full state and
+    the last `seq` it includes, after which the journal is truncated; a
+    crash between the two only leaves events that replay skips.
+    """
+
+    def __init__(self, log_dir: Path, session_id: str):
+        self.log_dir = Path(log_dir)
+        self.session_id = session_id
+        self.journal_path = self.log_dir / f"{session_id}_journal.ndjson"
+        self.snapshot_path = self.log_dir / f"{session_id}_state.json"
+        self.seq = 0
+        self.events_since_snapshot = 0
+        self._file = None
+
+    def append(self, events: List[Dict[str, Any]]):
+        """Write a batch of events with a single write and flush"""
+        if self._file is None:
+            self._file = open(self.journal_path, 'a', encoding='utf-8')
+        lines = []
+        for event in events:
+            self.seq += 1
+            lines.append(json.dumps(dict(event, seq=self.seq), default=json_default))
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        self.events_since_snapshot += len(events)
+
+    def write_snapshot(self, state: Dict[str, Any]):
+        """Atomically replace the snapshot with `state`, then truncate the journal"""
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(state, journal_seq=self.seq), f, separators=(",", ":"), default=json_default)
+        os.replace(tmp_path, self.snapshot_path)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, 'w', encoding='utf-8')
+        self.events_since_snapshot = 0
+
+    def load(self):
+        """
+        Read the snapshot and the journal events after it.
+
+        Returns:
+            (snapshot dict or None, list of events)
+        """
+        snapshot = None
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        after = snapshot.get("journal_seq", 0) if snapshot else 0
+
+        events = []
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from a crash
+                    if event["seq"] > after:
+                        events.append(event)
+
+        self.seq = max([after] + [event["seq"] for event in events])
+        self.events_since_snapshot = len(events)
+        return snapshot, events
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class JournalStateStore:
+    """
+    Default migration state backend: items in memory, persisted by a StateJournal.
+
+    State backends share this interface; see migration_state_store.py for
+    the SQLite one. MigrationLogger calls `put_items`, `checkpoint_due`,
+    `capture` and `save` from its writer thread, and `capture` with its
+    state lock held so the captured items match the events written so far.
+    `get_item_status` is called for every status change and must not do I/O.
+    """
+
+    def __init__(self, log_dir: Path, snapshot_interval: int = SNAPSHOT_INTERVAL):
+        self.log_dir = Path(log_dir)
+        self.snapshot_interval = snapshot_interval
+        self.journal: Optional[StateJournal] = None
+        self.items: Dict[str, MigrationItem] = {}
+
+    def open(self, session_id: str):
+        self.close()
+        self.journal = StateJournal(self.log_dir, session_id)
+        self.items = {}
+
+    def exists(self, session_id: str) -> bool:
+        journal = StateJournal(self.log_dir, session_id)
+        return journal.snapshot_path.exists() or journal.journal_path.exists()
+
+    def get_item(self, item_id: str) -> Optional[MigrationItem]:
+        return self.items.get(item_id)
+
+    def get_item_status(self, item_id: str) -> Optional[MigrationItem]:
+        """The item to apply a status change to (items are all in memory)"""
+        return self.items.get(item_id)
+
+    def put_items(self, batch: List[Tuple[MigrationItem, Dict[str, Any]]]):
+        """Journal a batch of (item, event) pairs"""
+        for item, _ in batch:
+            self.items[item.item_id] = item
+        self.journal.append([event for _, event in batch])
+
+    def checkpoint_due(self, pending: int) -> bool:
+        # A snapshot costs O(items), so compact at most once per len(items)
+        # events to keep the amortized cost per update constant
+        return self.journal.events_since_snapshot + pending >= max(self.snapshot_interval, len(self.items))
+
+    def capture(self, unwritten: Dict[str, MigrationItem]) -> Dict[str, MigrationItem]:
+        """Point-in-time copies of every item (cheap; serialized later by `save`)"""
+        captured = {}
+        for items in (self.items, unwritten):
+            for item_id, item in items.items():
+                copied = copy.copy(item)
+                copied.errors = list(item.errors)
+                captured[item_id] = copied
+        return captured
+
+    def restore_item(self, item: MigrationItem):
+        """Put a replayed item back without journaling it again"""
+        self.items[item.item_id] = item
+
+    def find_items(self, statuses: Optional[List[MigrationStatus]] = None,
+                   item_type: Optional[str] = None,
+                   max_attempts: Optional[int] = None,
+                   recoverable_only: bool = False) -> List[MigrationItem]:
+        return [
+            item for item in self.items.values()
+            if (statuses is None or item.status in statuses)
+            and (item_type is None or item.item_type == item_type)
+            and (max_attempts is None or item.attempts < max_attempts)
+            and (not recoverable_only or not item.errors or item.errors[-1].is_recoverable)
+        ]
 
-    def __init__(self, log_dir: Path, migration_session_id: Optional[str] = None):
+    def save(self, state: Dict[str, Any], captured: Optional[Dict[str, MigrationItem]] = None):
+        """Write a compacted snapshot from `capture()` output (the journal covers everything else)"""
+        if captured is None:
+            return
+        # Convert dataclasses to dict for JSON serialization
+        serializable_state = dict(state, items={
+            item_id: asdict(item) for item_id, item in captured.items()
+        })
+        self.journal.write_snapshot(serializable_state)
+
+    def load(self, session_id: str):
+        """
+        Switch to `session_id` and read its snapshot.
+
+        Returns:
+            (state without items or None, journal events to replay)
+        """
+        self.open(session_id)
+        snapshot, events = self.journal.load()
+        if snapshot is None:
+            return None, events
+
+        snapshot.pop("journal_seq", None)
+        # Convert back to dataclass objects
+        self.items = {
+            item_id: item_from_dict(item_data)
+            for item_id, item_data in snapshot.pop("items").items()
+        }
+        return snapshot, events
+
+    def close(self):
+        if self.journal is not None:
+            self.journal.close()
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread.
+
+    The stock handler formats every record on the calling thread; this one
+    only renders tracebacks (whose frames may not outlive the call) and
+    enqueues the record with its msg/args untouched.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class ConsoleSummaryHandler(logging.StreamHandler):
+    """
+    Console handler that rate-limits routine per-item records.
+
+    INFO records logged with an `item_id` extra are shown at most
+    once per `interval` seconds; the rest are counted and reported as a
+    single summary line. Everything else is written as usual.
+    """
+
+    def __init__(self, stream=None, interval: float = CONSOLE_SUMMARY_INTERVAL):
+        super().__init__(stream)
+        self.interval = interval
+        self._suppressed = 0
+        self._window_start = 0.0
+
+    def emit(self, record: logging.LogRecord):
+        if getattr(record, "item_id", None) is None or record.levelno >= logging.WARNING:
+            super().emit(record)
+            return
+
+        if record.created - self._window_start < self.interval:
+            self._suppressed += 1
+            return
+
+        self._emit_summary()
+        self._window_start = record.created
+        super().emit(record)
+
+    def _emit_summary(self):
+        if self._suppressed:
+            self.stream.write(
+                f"... {self._suppressed} more item events{self.terminator}"
+            )
+            self._suppressed = 0
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self._emit_summary()
+        finally:
+            self.release()
+        super().flush()
+
+class NDJSONFormatter(logging.Formatter):
+    """One JSON object per record, including any `extra` fields"""
+
+    # Attributes every LogRecord has; anything else came from `extra`
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "func": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=json_default)
+
+class MigrationLogger:
+    """
+    Enhanced logging system with structured output and recovery tracking
+
+    Items live in a pluggable state store (`state_store`, default
+    JournalStateStore). Item changes are applied in memory and queued;
+    a background writer thread persists the queue in one batch every
+    `flush_interval` seconds or `flush_items` events, and checkpoints the
+    session when the store asks for it, so callers on the event loop never
+    wait for disk I/O. `flush()` persists everything synchronously and is
+    called by `finalize_session`. With `background_writes=False` every
+    change is written on the caller's thread.
+
+    `migration_state` holds the session-level state (statistics, errors
+    by type, timings); with the default store its "items" entry is the
+    store's in-memory item dict.
+
+    Log records go through a queue to a listener thread that formats and
+    writes them to `<session>.log` (from `log_level`), `<session>_errors.log`,
+    the console (routine per-item lines rate-limited to one per
+    `console_summary_interval` seconds) and, with `structured_log=True`,
+    `<session>_log.ndjson`.
+    """
+
+    def __init__(self, log_dir: Path, migration_session_id: Optional[str] = None,
+                 snapshot_interval: int = SNAPSHOT_INTERVAL,
+                 state_store=None,
+                 background_writes: bool = True,
+                 flush_interval: float = STATE_FLUSH_INTERVAL,
+                 flush_items: int = STATE_FLUSH_ITEMS,
+                 log_level: int = logging.DEBUG,
+                 console_summary_interval: float = CONSOLE_SUMMARY_INTERVAL,
+                 structured_log: bool = False):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
 
@@ -73,14 +412,43 @@ class MigrationLogger:
         self.session_start = datetime.now(timezone.utc)
 
         # Setup structured logging
-        self.setup_logging()
+        self.log_listener: Optional[logging.handlers.QueueListener] = None
+        self.setup_logging(log_level, console_summary_interval, structured_log)
+
+        self.state_store = state_store or JournalStateStore(self.log_dir, snapshot_interval)
+        self.state_store.open(self.session_id)
 
         # Migration state tracking
-        self.migration_state = {
+        self.migration_state = self._initial_state()
+        self._link_items()
+
+        # Guards migration_state and the write queue; held only for in-memory work
+        self._state_lock = threading.RLock()
+        # Serializes writer cycles (background thread, flush(), queries, load_state())
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple[MigrationItem, Dict[str, Any]]] = []
+        # Items with queued changes, by ID, until the store has them
+        self._unwritten: Dict[str, MigrationItem] = {}
+        self._checkpoint_requested = False
+
+        self.flush_interval = flush_interval
+        self.flush_items = flush_items
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        if background_writes:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name=f"state-writer-{self.session_id}", daemon=True
+            )
+            self._writer.start()
+            # Don't lose queued changes if the session is never finalized
+            atexit.register(self.flush)
+
+    def _initial_state(self) -> Dict[str, Any]:
+        return {
             "session_id": self.session_id,
             "started_at": self.session_start.isoformat(),
             "status": "in_progress",
-            "items": {},  # item_id -> MigrationItem
             "statistics": {
                 "total_items": 0,
                 "successful": 0,
@@ -96,14 +464,23 @@ class MigrationLogger:
             }
         }
 
-    def setup_logging(self):
-        """Configure structured logging"""
+    def _link_items(self):
+        """Expose an in-memory store's items as migration_state["items"]"""
+        if isinstance(self.state_store, JournalStateStore):
+            self.migration_state["items"] = self.state_store.items
+        else:
+            self.migration_state.pop("items", None)
+
+    def setup_logging(self, log_level: int = logging.DEBUG,
+                      console_summary_interval: float = CONSOLE_SUMMARY_INTERVAL,
+                      structured_log: bool = False):
+        """Configure structured logging through a background listener"""
         log_file = self.log_dir / f"{self.session_id}.log"
         error_log_file = self.log_dir / f"{self.session_id}_errors.log"
+        self._stop_logging()
 
         # Main logger
         self.logger = logging.getLogger(f"migration_{self.session_id}")
-        self.logger.setLevel(logging.DEBUG)
 
         # Remove existing handlers
         for handler in self.logger.handlers[:]:
@@ -111,74 +488,152 @@ class MigrationLogger:
 
         # File handler for all logs
         file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
+        file_handler.setLevel(log_level)
 
         # File handler for errors only
         error_handler = logging.FileHandler(error_log_file, encoding='utf-8')
         error_handler.setLevel(logging.ERROR)
 
         # Console handler
-        console_handler = logging.StreamHandler()
+        console_handler = ConsoleSummaryHandler(interval=console_summary_interval)
         console_handler.setLevel(logging.INFO)
 
         # Formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s'
-        )
+        formatter = logging.Formatter(LOG_FORMAT)
 
         file_handler.setFormatter(formatter)
         error_handler.setFormatter(formatter)
         console_handler.setFormatter(formatter)
 
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(error_handler)
-        self.logger.addHandler(console_handler)
+        handlers = [file_handler, error_handler, console_handler]
+
+        if structured_log:
+            ndjson_handler = logging.FileHandler(
+                self.log_dir / f"{self.session_id}_log.ndjson", encoding='utf-8'
+            )
+            ndjson_handler.setLevel(log_level)
+            ndjson_handler.setFormatter(NDJSONFormatter())
+            handlers.append(ndjson_handler)
+
+        # Records below every handler's level are dropped before a LogRecord
+        # is even created; the rest are formatted on the listener thread
+        self.logger.setLevel(min(handler.level for handler in handlers))
+        self.logger.addHandler(DeferredQueueHandler(queue.SimpleQueue()))
+        self.log_listener = logging.handlers.QueueListener(
+            self.logger.handlers[0].queue, *handlers, respect_handler_level=True
+        )
+        self.log_listener.start()
+        # Write out queued records if the session is never finalized
+        atexit.register(self._stop_logging)
 
-        self.logger.info(f"Migration session started: {self.session_id}")
+        self.logger.info("Migration session started: %s", self.session_id)
+
+    def _stop_logging(self):
+        """Drain the log queue and close the log files"""
+        if self.log_listener is None:
+            return
+        self.log_listener.stop()
+        for handler in self.log_listener.handlers:
+            handler.close()
+        self.log_listener = None
+        atexit.unregister(self._stop_logging)
 
     def add_item(self, item_id: str, item_type: str, data: Dict[str, Any]):
         """Add a new item to track in the migration"""
-        item = MigrationItem(
-            item_id=item_id,
-            item_type=item_type,
-            status=MigrationStatus.PENDING,
-            data=data,
-            errors=[],
-            created_at=datetime.now(timezone.utc).isoformat(),
-            updated_at=datetime.now(timezone.utc).isoformat()
-        )
-
-        self.migration_state["items"][item_id] = item
-        self.migration_state["statistics"]["total_items"] += 1
+        event = {
+            "op": "add",
+            "item_id": item_id,
+            "item_type": item_type,
+            "data": data,
+            "at": datetime.now(timezone.utc).isoformat()
+        }
+        with self._state_lock:
+            item, _ = self._apply_event(event)
+            self._record(item, event)
+        if self._writer is None:
+            self._write_pending()
 
-        self.logger.debug(f"Added {item_type} item for migration: {item_id}")
-        self.save_state()
+        self.logger.debug("Added %s item for migration: %s", item_type, item_id,
+                          extra={"item_id": item_id})
 
     def update_item_status(self, item_id: str, status: MigrationStatus,
                           error: Optional[MigrationError] = None):
         """Update the status of a migration item"""
-        if item_id not in self.migration_state["items"]:
-            self.logger.warning(f"Attempted to update unknown item: {item_id}")
+        event = {
+            "op": "status",
+            "item_id": item_id,
+            "status": status.value,
+            "error": asdict(error) if error else None,
+            "at": datetime.now(timezone.utc).isoformat()
+        }
+        with self._state_lock:
+            item, old_status = self._apply_event(event, error)
+            if item is not None:
+                event["old_status"] = old_status.value
+                self.update_performance_metrics()
+                self._record(item, event)
+        if self._writer is None:
+            self._write_pending()
+
+        if item is None:
+            self.logger.warning("Attempted to update unknown item: %s", item_id)
             return
 
-        item = self.migration_state["items"][item_id]
+        # Log the update
+        log_level = logging.INFO if status == MigrationStatus.SUCCESS else logging.WARNING
+        extra = {"item_id": item_id, "status": status.value}
+        self.logger.log(log_level, "Item %s status: %s -> %s",
+                        item_id, old_status.value, status.value, extra=extra)
+
+        if error:
+            self.logger.error("Error for item %s: %s", item_id, error.message,
+                              extra=dict(extra, error_type=error.error_type.value))
+
+    def _apply_event(self, event: Dict[str, Any], error: Optional[MigrationError] = None):
+        """
+        Apply one item event to the statistics and return the changed item
+        (live and on journal replay); the caller stores the item.
+
+        Returns:
+            (item or None if unknown, previous status for status events)
+        """
+        stats = self.migration_state["statistics"]
+
+        if event["op"] == "add":
+            stats["total_items"] += 1
+            item = MigrationItem(
+                item_id=event["item_id"],
+                item_type=event["item_type"],
+                status=MigrationStatus.PENDING,
+                data=event["data"],
+                errors=[],
+                created_at=event["at"],
+                updated_at=event["at"]
+            )
+            return item, None
+
+        item = self._lookup(event["item_id"])
+        if item is None:
+            return None, None
+
+        status = MigrationStatus(event["status"])
         old_status = item.status
         item.status = status
-        item.updated_at = datetime.now(timezone.utc).isoformat()
+        item.updated_at = event["at"]
         item.attempts += 1
 
-        if error:
+        if event.get("error"):
+            error = error or error_from_dict(event["error"])
             item.errors.append(error)
             error_type = error.error_type.value
             self.migration_state["errors_by_type"].setdefault(error_type, 0)
             self.migration_state["errors_by_type"][error_type] += 1
 
         # Update statistics
-        stats = self.migration_state["statistics"]
         if old_status != status:
             if status == MigrationStatus.SUCCESS:
                 stats["successful"] += 1
-                item.success_at = datetime.now(timezone.utc).isoformat()
+                item.success_at = event["at"]
             elif status == MigrationStatus.FAILED:
                 stats["failed"] += 1
             elif status == MigrationStatus.SKIPPED:
@@ -186,15 +641,95 @@ class MigrationLogger:
             elif status == MigrationStatus.RETRY:
                 stats["retried"] += 1
 
-        # Log the update
-        log_level = logging.INFO if status == MigrationStatus.SUCCESS else logging.WARNING
-        self.logger.log(log_level, f"Item {item_id} status: {old_status.value} -> {status.value}")
+        return item, old_status
+
+    def _lookup(self, item_id: str) -> Optional[MigrationItem]:
+        """The item a status change applies to: its queued copy, else the store's status record"""
+        item = self._unwritten.get(item_id)
+        return item if item is not None else self.state_store.get_item_status(item_id)
+
+    def _record(self, item: MigrationItem, event: Dict[str, Any]):
+        """Queue an applied event for the writer (caller holds the state lock)"""
+        self._pending.append((item, event))
+        self._unwritten[item.item_id] = item
+
+        if self._writer is not None and len(self._pending) >= self.flush_items:
+            self._wake.set()
+
+    def _writer_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._write_pending()
+
+    def _write_pending(self, checkpoint: bool = False):
+        with self._write_lock:
+            self._write_pending_locked(checkpoint)
+
+    def _write_pending_locked(self, checkpoint: bool = False):
+        """
+        One writer cycle (caller holds the write lock): persist the queued
+        events as a batch and, when due or requested, checkpoint the session.
+        """
+        # Swap out the queue and capture a consistent state under the state
+        # lock; all serialization and I/O happens after releasing it
+        with self._state_lock:
+            batch, self._pending = self._pending, []
+            checkpoint = checkpoint or self._checkpoint_requested
+            if not batch and not checkpoint:
+                return
+            self._checkpoint_requested = False
+            try:
+                if checkpoint or self.state_store.checkpoint_due(len(batch)):
+                    captured = self.state_store.capture(self._unwritten)
+                else:
+                    captured = None
+                state = copy.deepcopy(
+                    {key: value for key, value in self.migration_state.items() if key != "items"}
+                )
+            except Exception as e:
+                self._pending[:0] = batch
+                self.logger.error("Failed to capture migration state: %s", e)
+                return
 
-        if error:
-            self.logger.error(f"Error for item {item_id}: {error.message}")
+        try:
+            if batch:
+                self.state_store.put_items(batch)
+            self.state_store.save(state, captured)
+        except Exception as e:
+            # Requeue the batch ahead of newer events; its items stay in
+            # the overlay until a later cycle writes them
+            with self._state_lock:
+                self._pending[:0] = batch
+                self._checkpoint_requested = self._checkpoint_requested or checkpoint
+            self.logger.error("Failed to save migration state: %s", e)
+            return
 
-        self.update_performance_metrics()
-        self.save_state()
+        with self._state_lock:
+            # Items changed again since this batch stay in the overlay
+            queued = {item.item_id for item, _ in self._pending}
+            for item, _ in batch:
+                if item.item_id not in queued:
+                    self._unwritten.pop(item.item_id, None)
+
+    def flush(self):
+        """Persist every queued change and checkpoint the session, on the calling thread"""
+        self._write_pending(checkpoint=True)
+
+    def _stop_writer(self):
+        self._closed = True
+        if self._writer is not None:
+            self._wake.set()
+            self._writer.join()
+            self._writer = None
+            atexit.unregister(self.flush)
+
+    def close(self):
+        """Stop the writer thread after flushing everything it had queued, then the log listener"""
+        self._stop_writer()
+        self.flush()
+        self.state_store.close()
+        self._stop_logging()
 
     def update_performance_metrics(self):
         """Update performance metrics and ETA"""
@@ -215,101 +750,125 @@ class MigrationLogger:
                     timedelta(seconds=eta_seconds)
                 ).isoformat()
 
+    def get_item(self, item_id: str) -> Optional[MigrationItem]:
+        with self._state_lock:
+            item = self._unwritten.get(item_id)
+            if item is None:
+                return self.state_store.get_item(item_id)
+            if item.data is not None:
+                return item
+        # Only a status record is queued; write it so the store has the whole item
+        with self._write_lock:
+            self._write_pending_locked()
+            with self._state_lock:
+                queued = self._unwritten.get(item_id)
+                item = self.state_store.get_item(item_id)
+                if queued is None or item is None:
+                    return item
+                if queued.data is not None:
+                    return queued
+                # Still queued (the write failed or it changed again): apply
+                # the status fields and errors the store doesn't have yet
+                item.status = queued.status
+                item.updated_at = queued.updated_at
+                item.attempts = queued.attempts
+                item.success_at = queued.success_at
+                item.errors += [error for error in queued.errors if error not in item.errors]
+                return item
+
     def get_failed_items(self) -> List[MigrationItem]:
         """Get all items that failed migration"""
-        return [
-            item for item in self.migration_state["items"].values()
-            if item.status == MigrationStatus.FAILED
-        ]
+        return self._find_items([MigrationStatus.FAILED])
 
     def get_retryable_items(self, max_attempts: int = 3) -> List[MigrationItem]:
-        """Get items that can be retried"""
-        retryable = []
-        for item in self.migration_state["items"].values():
-            if (item.status in [MigrationStatus.FAILED, MigrationStatus.RETRY] and
-                item.attempts < max_attempts and
-                self._has_recoverable_errors(item)):
-                retryable.append(item)
-        return retryable
+        """Get items that can be retried (latest error, if any, is recoverable)"""
+        return self._find_items(
+            [MigrationStatus.FAILED, MigrationStatus.RETRY],
+            max_attempts=max_attempts,
+            recoverable_only=True
+        )
 
-    def _has_recoverable_errors(self, item: MigrationItem) -> bool:
-        """Check if an item has recoverable errors"""
-        if not item.errors:
-            return True
+    def get_items_by_type(self, item_type: str,
+                          statuses: Optional[List[MigrationStatus]] = None) -> List[MigrationItem]:
+        """Get items of one type ('listing', 'image', ...), optionally filtered by status"""
+        return self._find_items(statuses, item_type=item_type)
 
-        # Check if the latest error is recoverable
-        latest_error = item.errors[-1]
-        return latest_error.is_recoverable
+    def _find_items(self, *args, **kwargs) -> List[MigrationItem]:
+        # Queries read the store, so write queued changes first
+        with self._write_lock:
+            self._write_pending_locked()
+            with self._state_lock:
+                return self.state_store.find_items(*args, **kwargs)
 
     def save_state(self):
-        """Save current migration state to disk"""
-        state_file = self.log_dir / f"{self.session_id}_state.json"
-
-        # Convert dataclasses to dict for JSON serialization
-        serializable_state = self.migration_state.copy()
-        serializable_state["items"] = {
-            item_id: asdict(item) for item_id, item in self.migration_state["items"].items()
-        }
-
-        try:
-            with open(state_file, 'w', encoding='utf-8') as f:
-                json.dump(serializable_state, f, indent=2, default=str)
-        except Exception as e:
-            self.logger.error(f"Failed to save migration state: {e}")
+        """Ask the writer thread to checkpoint the session (flush() waits for it)"""
+        if self._writer is None:
+            self.flush()
+            return
+        with self._state_lock:
+            self._checkpoint_requested = True
+        self._wake.set()
 
     def load_state(self, session_id: str) -> bool:
-        """Load migration state from a previous session"""
-        state_file = self.log_dir / f"{session_id}_state.json"
-
-        if not state_file.exists():
-            self.logger.warning(f"No state file found for session: {session_id}")
+        """Load (resume) migration state from a previous session"""
+        if not self.state_store.exists(session_id):
+            self.logger.warning("No state file found for session: %s", session_id)
             return False
 
-        try:
-            with open(state_file, 'r', encoding='utf-8') as f:
-                loaded_state = json.load(f)
-
-            # Convert back to dataclass objects
-            loaded_state["items"] = {
-                item_id: MigrationItem(**item_data)
-                for item_id, item_data in loaded_state["items"].items()
-            }
+        # Persist this session's queued changes before switching
+        self.flush()
 
-            self.migration_state = loaded_state
-            self.session_id = session_id
-
-            self.logger.info(f"Loaded migration state for session: {session_id}")
+        try:
+            with self._write_lock, self._state_lock:
+                state, events = self.state_store.load(session_id)
+                self.session_id = session_id
+                self.migration_state = state if state is not None else self._initial_state()
+                self._link_items()
+
+                # Journal entries written after the last checkpoint
+                for event in events:
+                    item, _ = self._apply_event(event)
+                    if item is not None:
+                        self.state_store.restore_item(item)
+
+            self.logger.info(
+                "Loaded migration state for session: %s (%d items, %d journal events replayed)",
+                session_id, self.migration_state['statistics']['total_items'], len(events)
+            )
             return True
 
         except Exception as e:
-            self.logger.error(f"Failed to load migration state: {e}")
+            self.logger.error("Failed to load migration state: %s", e)
             return False
 
     def finalize_session(self, status: str = "completed"):
         """Finalize the migration session"""
-        self.migration_state["status"] = status
-        self.migration_state["completed_at"] = datetime.now(timezone.utc).isoformat()
+        with self._state_lock:
+            self.migration_state["status"] = status
+            self.migration_state["completed_at"] = datetime.now(timezone.utc).isoformat()
 
         stats = self.migration_state["statistics"]
         metrics = self.migration_state["performance_metrics"]
 
         total_time = time.time() - metrics["start_time"]
 
-        self.logger.info(f"Migration session completed: {self.session_id}")
-        self.logger.info(f"Total items: {stats['total_items']}")
-        self.logger.info(f"Successful: {stats['successful']}")
-        self.logger.info(f"Failed: {stats['failed']}")
-        self.logger.info(f"Skipped: {stats['skipped']}")
-        self.logger.info(f"Total time: {total_time:.2f} seconds")
+        self.logger.info("Migration session completed: %s", self.session_id)
+        self.logger.info("Total items: %d", stats['total_items'])
+        self.logger.info("Successful: %d", stats['successful'])
+        self.logger.info("Failed: %d", stats['failed'])
+        self.logger.info("Skipped: %d", stats['skipped'])
+        self.logger.info("Total time: %.2f seconds", total_time)
 
         if metrics["items_per_second"] > 0:
-            self.logger.info(f"Average speed: {metrics['items_per_second']:.2f} items/second")
-
-        self.save_state()
+            self.logger.info("Average speed: %.2f items/second", metrics['items_per_second'])
 
         # Generate summary report
+        self._stop_writer()
         self.generate_summary_report()
 
+        # Everything queued so far, plus a final checkpoint
+        self.close()
+
     def generate_summary_report(self):
         """Generate a human-readable summary report"""
         report_file = self.log_dir / f"{self.session_id}_summary.md"
@@ -352,31 +911,235 @@ class MigrationLogger:
                 if len(failed_items) > 10:
                     f.write(f"- ... and {len(failed_items) - 10} more\n")
 
-        self.logger.info(f"Summary report generated: {report_file}")
+        self.logger.info("Summary report generated: %s", report_file)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling through an open CircuitBreaker"""
+
+    def __init__(self, breaker: 'CircuitBreaker'):
+        super().__init__(
+            f"Circuit '{breaker.name}' is open after {breaker.failures} consecutive failures; "
+            f"retry in {breaker.retry_in():.1f}s"
+        )
+        self.breaker = breaker
+
+class CircuitBreaker:
+    """
+    Shared failure counter for one remote service.
+
+    After `failure_threshold` consecutive recoverable failures the circuit
+    opens and calls fail fast with CircuitOpenError. After `reset_timeout`
+    seconds one trial call is let through (half-open): success closes the
+    circuit, failure opens it again. Safe to share between threads and
+    event-loop tasks.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "default"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and self.retry_in() == 0:
+                self.state = self.HALF_OPEN
+                return
+            # Open, or half-open with the trial call still in flight
+            raise CircuitOpenError(self)
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """End a half-open trial that proved nothing either way"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+def response_status(exception: Exception) -> Optional[int]:
+    """HTTP status of the response attached to an exception (SanityAPIError.response), if any"""
+    response = getattr(exception, "response", None)
+    return getattr(response, "status_code", None)
+
+def retry_after_seconds(exception: Exception) -> Optional[float]:
+    """Seconds requested by the Retry-After header of the exception's response, if any"""
+    headers = getattr(getattr(exception, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = next((v for k, v in headers.items() if k.lower() == "retry-after"), None)
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP-date form
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+@dataclass
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a failed call.
+
+    Only errors that `classify_error` maps to a recoverable type are
+    retried. Delays use decorrelated jitter: each one is drawn from
+    [base_delay, previous delay * backoff_factor], capped at max_delay,
+    so concurrent callers spread out instead of retrying in lockstep.
+    A Retry-After header on the error's response takes precedence (up to
+    max_retry_after). With a circuit breaker, recoverable failures count
+    towards opening it, except rate limiting, which only means the API is
+    busy. Any other response below 500 shows the API is up and counts as
+    a success for the breaker.
+    """
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    backoff_factor: float = 3.0
+    max_delay: float = 30.0
+    max_retry_after: float = 120.0
+    retry_exceptions: tuple = (Exception,)
+    circuit_breaker: Optional[CircuitBreaker] = None
+
+    def is_retryable(self, exception: Exception) -> bool:
+        if isinstance(exception, CircuitOpenError):
+            return False
+        if not isinstance(exception, self.retry_exceptions):
+            return False
+        return is_recoverable_error(classify_error(exception))
+
+    def next_delay(self, previous: float, exception: Exception) -> float:
+        retry_after = retry_after_seconds(exception)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        upper = max(self.base_delay, previous * self.backoff_factor)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def before_attempt(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call()
+
+    def on_success(self):
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+
+    def on_failure(self, exception: Exception) -> bool:
+        """Record a failed attempt; returns whether it may be retried"""
+        retryable = self.is_retryable(exception)
+        breaker = self.circuit_breaker
+        if breaker is not None and not isinstance(exception, CircuitOpenError):
+            status = response_status(exception)
+            if status is not None and status < 500 and status != 429:
+                breaker.record_success()
+            elif retryable and classify_error(exception) != MigrationErrorType.API_RATE_LIMIT:
+                breaker.record_failure()
+            else:
+                # Rate limited, or a local error that says nothing about the API
+                breaker.release()
+        return retryable
+
+    def call(self, func: Callable, *args, on_retry: Optional[Callable] = None, **kwargs):
+        """
+        Call `func` under this policy, sleeping between attempts.
+
+        `on_retry(exception, attempt, delay)` runs before each retry; the
+        last error is raised once no retry is left or allowed.
+        """
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            self.before_attempt()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self.on_failure(e) or attempt == self.max_attempts:
+                    raise
+                delay = self.next_delay(delay, e)
+                if on_retry is not None:
+                    on_retry(e, attempt, delay)
+                time.sleep(delay)
+            else:
+                self.on_success()
+                return result
+
+    async def call_async(self, func: Callable, *args, on_retry: Optional[Callable] = None, **kwargs):
+        """`call` for coroutine functions; waits with asyncio.sleep"""
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            self.before_attempt()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                if not self.on_failure(e) or attempt == self.max_attempts:
+                    raise
+                delay = self.next_delay(delay, e)
+                if on_retry is not None:
+                    on_retry(e, attempt, delay)
+                await asyncio.sleep(delay)
+            else:
+                self.on_success()
+                return result
 
 def retry_on_error(max_attempts: int = 3,
                   backoff_factor: float = 2.0,
-                  retry_exceptions: tuple = (Exception,)):
-    """Decorator for automatic retry with exponential backoff"""
+                  retry_exceptions: tuple = (Exception,),
+                  circuit_breaker: Optional[CircuitBreaker] = None,
+                  policy: Optional[RetryPolicy] = None):
+    """
+    Decorator for automatic retry with jittered exponential backoff.
+
+    Works on plain and `async def` functions; coroutines wait with
+    `asyncio.sleep` so the event loop keeps running. See RetryPolicy for
+    which errors are retried and how delays are chosen; pass `policy` to
+    override everything else.
+    """
+    policy = policy or RetryPolicy(
+        max_attempts=max_attempts,
+        backoff_factor=backoff_factor,
+        retry_exceptions=retry_exceptions,
+        circuit_breaker=circuit_breaker
+    )
 
     def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await policy.call_async(partial(func, *args, **kwargs))
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-
-            for attempt in range(max_attempts):
-                try:
-                    return func(*args, **kwargs)
-                except retry_exceptions as e:
-                    last_exception = e
-                    if attempt < max_attempts - 1:
-                        delay = backoff_factor ** attempt
-                        time.sleep(delay)
-                        continue
-                    else:
-                        raise last_exception
-
-            return None
+            return policy.call(partial(func, *args, **kwargs))
 
         return wrapper
     return decorator
@@ -408,6 +1171,19 @@ def create_migration_error(error_type: MigrationErrorType,
 def classify_error(exception: Exception, context: Dict[str, Any] = None) -> MigrationErrorType:
     """Automatically classify an exception into a migration error type"""
 
+    # HTTP status of an attached response beats guessing from the message
+    status = response_status(exception)
+    if status in (401, 403):
+        return MigrationErrorType.AUTHENTICATION_ERROR
+    elif status == 429:
+        return MigrationErrorType.API_RATE_LIMIT
+    elif status == 404:
+        return MigrationErrorType.FILE_NOT_FOUND
+    elif status == 408 or (status is not None and status >= 500):
+        return MigrationErrorType.SANITY_API_ERROR
+    elif status is not None and status >= 400:
+        return MigrationErrorType.VALIDATION_ERROR
+
     error_message = str(exception).lower()
 
     if "network" in error_message or "connection" in error_message:
@@ -0,0 +1,319 @@
+"""
+Migration State Store
+Sustainable Digital Nomads Directory - SQLite Migration State Backend
+
+SQLite (WAL mode) backend for MigrationLogger. Items, their errors and
+every status transition are rows in indexed tables, so only the session
+statistics and a small status record per item are held in memory, and
+failed/retryable/by-type lookups are index queries instead of scans. Writes arrive in batches from the
+logger's writer thread and are committed in few, larger transactions.
+
+Usage:
+    store = SQLiteStateStore(LOGS_DIR / "migration_state.db")
+    migration_logger = MigrationLogger(LOGS_DIR, state_store=store)
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from migration_recovery import (
+    MigrationError, MigrationErrorType, MigrationItem, MigrationStatus, error_from_dict, json_default
+)
+
+DEFAULT_BATCH_SIZE = 500
+# Longest time written items stay uncommitted
+DEFAULT_COMMIT_INTERVAL = 1.0  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    session_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    item_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    success_at TEXT,
+    -- Whether the latest error is recoverable (1 while there are no errors)
+    recoverable INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (session_id, item_id)
+);
+CREATE INDEX IF NOT EXISTS items_by_status ON items (session_id, status, attempts);
+CREATE INDEX IF NOT EXISTS items_by_type ON items (session_id, item_type, status);
+CREATE TABLE IF NOT EXISTS errors (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    context TEXT NOT NULL,
+    stack_trace TEXT,
+    retry_count INTEGER NOT NULL DEFAULT 0,
+    is_recoverable INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS errors_by_item ON errors (session_id, item_id);
+CREATE INDEX IF NOT EXISTS errors_by_type ON errors (session_id, error_type);
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    old_status TEXT,
+    new_status TEXT NOT NULL,
+    at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_by_item ON transitions (session_id, item_id);
+"""
+
+ITEM_COLUMNS = "item_id, item_type, status, data, created_at, updated_at, attempts, success_at"
+STATUS_COLUMNS = "item_id, item_type, status, created_at, updated_at, attempts, success_at"
+
+class SQLiteStateStore:
+    """
+    MigrationLogger state backend on stdlib sqlite3 (same interface as JournalStateStore).
+
+    One database can hold many sessions. Safe to share between threads.
+    The logger's writer thread hands over batches of item writes; they are
+    committed, together with the session statistics, every `batch_size`
+    writes, every `commit_interval` seconds and at every checkpoint.
+    """
+
+    def __init__(self, db_path: Path, batch_size: int = DEFAULT_BATCH_SIZE,
+                 commit_interval: float = DEFAULT_COMMIT_INTERVAL):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.session_id: Optional[str] = None
+
+        self._lock = threading.RLock()
+        # item_id -> (item_type, status, created_at, updated_at, attempts, success_at)
+        # for the open session, so status changes never wait on the database
+        self._statuses: Dict[str, Tuple[str, str, str, str, int, Optional[str]]] = {}
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: committed transactions survive a crash of this process
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def open(self, session_id: str):
+        with self._lock:
+            self._commit()
+            self.session_id = session_id
+            rows = self._conn.execute(
+                f"SELECT {STATUS_COLUMNS} FROM items WHERE session_id = ?", (session_id,)
+            ).fetchall()
+            self._statuses = {row[0]: row[1:] for row in rows}
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE session_id = ? UNION ALL "
+                "SELECT 1 FROM items WHERE session_id = ? LIMIT 1",
+                (session_id, session_id)
+            ).fetchone()
+        return row is not None
+
+    def get_item(self, item_id: str) -> Optional[MigrationItem]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {ITEM_COLUMNS} FROM items WHERE session_id = ? AND item_id = ?",
+                (self.session_id, item_id)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._item_from_row(row, self._errors_for(item_id))
+
+    def get_item_status(self, item_id: str) -> Optional[MigrationItem]:
+        """
+        The item's status fields from memory, to apply a status change to.
+        `data` is None and `errors` is empty: use get_item() for the whole item.
+        """
+        record = self._statuses.get(item_id)
+        if record is None:
+            return None
+        item_type, status, created_at, updated_at, attempts, success_at = record
+        return MigrationItem(
+            item_id=item_id, item_type=item_type, status=MigrationStatus(status), data=None,
+            errors=[], created_at=created_at, updated_at=updated_at, attempts=attempts,
+            success_at=success_at
+        )
+
+    def put_items(self, batch: List[Tuple[MigrationItem, Dict[str, Any]]]):
+        """Write a batch of (item, event) pairs in the current transaction"""
+        for item, event in batch:
+            # Lock per row, so lookups from other threads never wait for a whole batch
+            with self._lock:
+                self._put_item(item, event)
+                self._pending += 1
+
+    def _put_item(self, item: MigrationItem, event: Dict[str, Any]):
+        self._statuses[item.item_id] = (item.item_type, item.status.value, item.created_at,
+                                         item.updated_at, item.attempts, item.success_at)
+        if event["op"] == "add":
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO items ({ITEM_COLUMNS}, session_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (item.item_id, item.item_type, item.status.value,
+                 json.dumps(item.data, default=json_default), item.created_at, item.updated_at,
+                 item.attempts, item.success_at, self.session_id)
+            )
+            return
+
+        # The item may already reflect later events; transitions and
+        # errors are taken from the event itself
+        error = error_from_dict(event["error"]) if event.get("error") else None
+        self._conn.execute(
+            "UPDATE items SET status = ?, updated_at = ?, attempts = ?, success_at = ?, "
+            "recoverable = COALESCE(?, recoverable) WHERE session_id = ? AND item_id = ?",
+            (item.status.value, item.updated_at, item.attempts, item.success_at,
+             None if error is None else int(error.is_recoverable), self.session_id, item.item_id)
+        )
+        self._conn.execute(
+            "INSERT INTO transitions (session_id, item_id, old_status, new_status, at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.session_id, item.item_id, event.get("old_status"), event["status"], event["at"])
+        )
+        if error is not None:
+            self._insert_error(item.item_id, error)
+
+    def checkpoint_due(self, pending: int) -> bool:
+        return self._pending + pending >= self.batch_size
+
+    def capture(self, unwritten: Dict[str, MigrationItem]) -> bool:
+        """Nothing to copy: items are already rows (True marks a checkpoint)"""
+        return True
+
+    def _insert_error(self, item_id: str, error: MigrationError):
+        self._conn.execute(
+            "INSERT INTO errors (session_id, item_id, error_type, message, timestamp, context, "
+            "stack_trace, retry_count, is_recoverable) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.session_id, item_id, error.error_type.value, error.message, error.timestamp,
+             json.dumps(error.context, default=json_default), error.stack_trace,
+             error.retry_count, int(error.is_recoverable))
+        )
+
+    def restore_item(self, item: MigrationItem):
+        """Nothing to replay: every write is already in the database"""
+
+    def find_items(self, statuses: Optional[List[MigrationStatus]] = None,
+                   item_type: Optional[str] = None,
+                   max_attempts: Optional[int] = None,
+                   recoverable_only: bool = False) -> List[MigrationItem]:
+        return list(self.iter_items(statuses, item_type, max_attempts, recoverable_only))
+
+    def iter_items(self, statuses: Optional[List[MigrationStatus]] = None,
+                   item_type: Optional[str] = None,
+                   max_attempts: Optional[int] = None,
+                   recoverable_only: bool = False,
+                   error_type: Optional[MigrationErrorType] = None) -> Iterator[MigrationItem]:
+        """Matching items, fetched from the indexes in chunks rather than all at once"""
+        clauses = ["session_id = ?"]
+        params: List[Any] = [self.session_id]
+        if statuses is not None:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params += [status.value for status in statuses]
+        if item_type is not None:
+            clauses.append("item_type = ?")
+            params.append(item_type)
+        if max_attempts is not None:
+            clauses.append("attempts < ?")
+            params.append(max_attempts)
+        if recoverable_only:
+            clauses.append("recoverable = 1")
+        if error_type is not None:
+            clauses.append("item_id IN (SELECT item_id FROM errors WHERE session_id = ? AND error_type = ?)")
+            params += [self.session_id, error_type.value]
+
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {ITEM_COLUMNS} FROM items WHERE {' AND '.join(clauses)} ORDER BY rowid", params
+            )
+            rows = cursor.fetchmany(self.batch_size)
+        while rows:
+            for row in rows:
+                with self._lock:
+                    errors = self._errors_for(row[0])
+                yield self._item_from_row(row, errors)
+            with self._lock:
+                rows = cursor.fetchmany(self.batch_size)
+
+    def _errors_for(self, item_id: str) -> List[MigrationError]:
+        rows = self._conn.execute(
+            "SELECT error_type, message, timestamp, context, stack_trace, retry_count, is_recoverable "
+            "FROM errors WHERE session_id = ? AND item_id = ? ORDER BY id",
+            (self.session_id, item_id)
+        ).fetchall()
+        return [
+            MigrationError(
+                error_type=MigrationErrorType(error_type), message=message, timestamp=timestamp,
+                context=json.loads(context), stack_trace=stack_trace, retry_count=retry_count,
+                is_recoverable=bool(is_recoverable)
+            )
+            for error_type, message, timestamp, context, stack_trace, retry_count, is_recoverable in rows
+        ]
+
+    @staticmethod
+    def _item_from_row(row, errors: List[MigrationError]) -> MigrationItem:
+        item_id, item_type, status, data, created_at, updated_at, attempts, success_at = row
+        return MigrationItem(
+            item_id=item_id, item_type=item_type, status=MigrationStatus(status),
+            data=json.loads(data), errors=errors, created_at=created_at, updated_at=updated_at,
+            attempts=attempts, success_at=success_at
+        )
+
+    def status_counts(self) -> Dict[str, int]:
+        """Current number of items per status"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM items WHERE session_id = ? GROUP BY status",
+                (self.session_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def save(self, state: Dict[str, Any], captured: Optional[bool] = None):
+        """
+        Store the session-level state; commit on a checkpoint or when the
+        last commit is `commit_interval` seconds old.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state) VALUES (?, ?)",
+                (self.session_id, json.dumps(state, default=json_default))
+            )
+            if captured or time.monotonic() - self._last_commit >= self.commit_interval:
+                self._commit()
+
+    def load(self, session_id: str):
+        """
+        Switch to `session_id`.
+
+        Returns:
+            (session state or None, []); items stay in the database
+        """
+        self.open(session_id)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (json.loads(row[0]) if row else None), []
+
+    def _commit(self):
+        self._conn.commit()
+        self._pending = 0
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        """Commit pending writes (the connection stays usable for other sessions)"""
+        with self._lock:
+            self._commit()
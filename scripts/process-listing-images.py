@@ -10,6 +10,8 @@ from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 
+from rendition_engine import OutputFormat, RenditionEngine
+
 # Image size configurations
 IMAGE_SIZES = {
     'thumbnail': (150, 150),
@@ -22,12 +24,19 @@ IMAGE_SIZES = {
 JPEG_QUALITY = 85
 WEBP_QUALITY = 85
 
+# Every size is written in each of these formats
+OUTPUT_FORMATS = [
+    OutputFormat('jpg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True}),
+    OutputFormat('webp', 'WEBP', {'quality': WEBP_QUALITY}),
+]
+
 class ImageProcessor:
     def __init__(self, base_dir):
         self.base_dir = Path(base_dir)
         self.public_dir = self.base_dir / 'app-next-directory' / 'public'
         self.images_dir = self.public_dir / 'images' / 'listings'
         self.temp_dir = self.base_dir / 'temp_images'
+        self.renditions = RenditionEngine(IMAGE_SIZES, OUTPUT_FORMATS)
         self.setup_directories()
 
     def setup_directories(self):
@@ -61,40 +70,23 @@ class ImageProcessor:
     def process_image(self, image_path, listing_id, is_primary=False):
         """Process a single image into multiple sizes and formats"""
         try:
-            image = Image.open(image_path)
             image_hash = image_path.stem.split('_')[1]  # Get hash part from filename
 
-            # Convert RGBA to RGB if necessary
-            if image.mode == 'RGBA':
-                background = Image.new('RGB', image.size, 'white')
-                background.paste(image, mask=image.split()[3])
-                image = background
-
-            paths = {}
+            # One decode, sizes resized from the next larger one, both formats per size
+            renditions = self.renditions.render(image_path)
 
-            # Process each size
-            for size_name, dimensions in IMAGE_SIZES.items():
-                img_copy = image.copy()
-                img_copy.thumbnail(dimensions, Image.Resampling.LANCZOS)
-
-                # Save both JPEG and WebP versions
-                for fmt in ['jpg', 'webp']:
-                    output_dir = self.images_dir / listing_id
-                    output_dir.mkdir(exist_ok=True)
+            output_dir = self.images_dir / listing_id
+            output_dir.mkdir(exist_ok=True)
 
+            paths = {}
+            for size_name, formats in renditions.items():
+                for fmt, rendition in formats.items():
                     filename = f"{size_name}_{image_hash}.{fmt}"
-                    output_path = output_dir / filename
-
-                    if fmt == 'jpg':
-                        img_copy.save(output_path, 'JPEG', quality=JPEG_QUALITY, optimize=True)
-                    else:
-                        img_copy.save(output_path, 'WEBP', quality=WEBP_QUALITY)
+                    (output_dir / filename).write_bytes(rendition.data)
 
                     # Store relative path for the database
                     relative_path = f"/images/listings/{listing_id}/{filename}"
-                    if size_name not in paths:
-                        paths[size_name] = {}
-                    paths[size_name][fmt] = relative_path
+                    paths.setdefault(size_name, {})[fmt] = relative_path
 
             return paths
         except Exception as e:
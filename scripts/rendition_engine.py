@@ -0,0 +1,218 @@
+"""
+Rendition Engine
+Sustainable Digital Nomads Directory - Multi-Size Image Renditions
+
+Builds every size/format variant of an image from a single decode. Sizes
+are produced as a descending cascade, each one resized from the next larger
+rendition rather than from the full-size original, and every configured
+output format is encoded from the same resized image.
+
+JPEG sources are decoded in draft mode: libjpeg's DCT scaling produces the
+image directly at 1/2, 1/4 or 1/8 resolution, picking the smallest scale
+that still leaves at least `draft_gap` times the largest rendition's pixels
+for the LANCZOS pass. Other formats are decoded in full.
+"""
+
+import io
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from PIL import Image
+
+ImageSource = Union[str, Path, BinaryIO, Image.Image]
+
+@dataclass(frozen=True)
+class OutputFormat:
+    """An encoding every rendition is written in"""
+    extension: str
+    pil_format: str
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def mime_type(self) -> str:
+        return Image.MIME.get(self.pil_format, f"image/{self.pil_format.lower()}")
+
+@dataclass
+class Rendition:
+    """One encoded size/format variant"""
+    name: str
+    extension: str
+    data: bytes
+    dimensions: Tuple[int, int]
+    mime_type: str
+
+def fit_within(size: Tuple[int, int], box: Tuple[int, int]) -> Optional[Tuple[int, int]]:
+    """
+    Dimensions of `size` scaled down to fit `box`, rounded exactly like
+    Image.thumbnail(). None if it already fits.
+    """
+    width, height = size
+    x, y = map(math.floor, box)
+    if x >= width and y >= height:
+        return None
+
+    def round_aspect(number, key):
+        return max(min(math.floor(number), math.ceil(number), key=key), 1)
+
+    aspect = width / height
+    if x / y >= aspect:
+        x = round_aspect(y * aspect, key=lambda n: abs(aspect - n / y))
+    else:
+        y = round_aspect(x / aspect, key=lambda n: 0 if n == 0 else abs(aspect - x / n))
+    return x, y
+
+# EXIF orientations that swap width and height when applied
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+# Draft decodes keep at least this multiple of the largest target size
+DEFAULT_DRAFT_GAP = 1.0
+
+def draft_for_boxes(image: Image.Image, boxes: Iterable[Tuple[int, int]],
+                    draft_gap: Optional[float] = DEFAULT_DRAFT_GAP,
+                    exif_oriented: bool = False) -> Tuple[int, int]:
+    """
+    Put a not-yet-loaded JPEG into draft mode for the given target boxes.
+
+    The decoder is asked for at least `draft_gap` times every fitted target
+    size, so no rendition is ever upscaled. Non-JPEG and already-loaded
+    images are left untouched. Set `exif_oriented` when the boxes apply
+    after ImageOps.exif_transpose().
+
+    Returns:
+        The image's full-resolution (stored, untransposed) size
+    """
+    full_size = image.size
+    if image.format != 'JPEG' or not draft_gap:
+        return full_size
+
+    boxes = list(boxes)
+    if exif_oriented and image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+        boxes = [(height, width) for width, height in boxes]
+
+    needed = [0, 0]
+    for box in boxes:
+        target = fit_within(full_size, box) or full_size
+        needed[0] = max(needed[0], math.ceil(target[0] * draft_gap))
+        needed[1] = max(needed[1], math.ceil(target[1] * draft_gap))
+
+    if needed[0] < full_size[0] and needed[1] < full_size[1]:
+        image.draft(None, tuple(needed))
+    return full_size
+
+def flatten(image: Image.Image, background: Union[str, Tuple[int, int, int]] = "white") -> Image.Image:
+    """Composite transparency onto `background` and convert to a JPEG/WebP-safe mode"""
+    if image.mode == 'P':
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    if image.mode in ('RGBA', 'LA'):
+        flat = Image.new('RGB', image.size, background)
+        flat.paste(image, mask=image.getchannel('A'))
+        return flat
+    if image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    return image
+
+class RenditionEngine:
+    """
+    Decode once, resize in a cascade, encode all outputs in one pass.
+
+    `sizes` maps rendition names to bounding boxes; each rendition is fitted
+    inside its box with the same dimensions Image.thumbnail() would give
+    when applied to the original, and is never upscaled. Transparency is
+    composited onto `background` unless `flatten_alpha` is False (for
+    callers that prepare the image themselves). `draft_gap=None` disables
+    draft-mode decoding.
+    """
+
+    def __init__(self, sizes: Mapping[str, Tuple[int, int]], formats: Iterable[OutputFormat],
+                 resample: int = Image.Resampling.LANCZOS, reducing_gap: Optional[float] = 2.0,
+                 background: Union[str, Tuple[int, int, int]] = "white", flatten_alpha: bool = True,
+                 draft_gap: Optional[float] = DEFAULT_DRAFT_GAP):
+        self.sizes = dict(sizes)
+        self.formats = list(formats)
+        self.resample = resample
+        self.reducing_gap = reducing_gap
+        self.background = background
+        self.flatten_alpha = flatten_alpha
+        self.draft_gap = draft_gap
+
+        # Largest box first so every step resizes from the closest larger rendition
+        self.cascade: List[Tuple[str, Tuple[int, int]]] = sorted(
+            self.sizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True
+        )
+
+    def decode(self, source: ImageSource) -> Tuple[Image.Image, Tuple[int, int]]:
+        """
+        Open and decode a source image (flattened to RGB/L unless disabled).
+
+        Returns:
+            (image, full-resolution size); the image is smaller than the
+            full size when the JPEG decoder scaled it down
+        """
+        if isinstance(source, Image.Image):
+            image = source
+            full_size = source.size
+        else:
+            image = Image.open(source)
+            full_size = image.size
+            if self.draft_gap:
+                full_size = draft_for_boxes(image, self.sizes.values(), self.draft_gap)
+            # Decodes the pixels and releases the file for single-frame images
+            image.load()
+        if self.flatten_alpha:
+            image = flatten(image, self.background)
+        return image, full_size
+
+    def resize_cascade(self, image: Image.Image,
+                       full_size: Optional[Tuple[int, int]] = None) -> Dict[str, Image.Image]:
+        """
+        Resized images by rendition name; sizes that already fit share the larger image.
+
+        Targets are computed from `full_size` (default: the image's own size)
+        so a draft-decoded image yields the same dimensions as a full decode.
+        """
+        full_size = full_size or image.size
+        resized: Dict[str, Image.Image] = {}
+        current = image
+        for name, box in self.cascade:
+            target = fit_within(full_size, box) or full_size
+            if target != current.size:
+                # Boxes that are not nested (e.g. a wide banner) can need more
+                # pixels than the previous step kept; derive those from the original
+                larger = current if target[0] <= current.width and target[1] <= current.height else image
+                current = image if target == image.size else larger.resize(
+                    target, self.resample, reducing_gap=self.reducing_gap
+                )
+            resized[name] = current
+        return resized
+
+    def encode(self, image: Image.Image, output_format: OutputFormat) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, output_format.pil_format, **output_format.options)
+        return buffer.getvalue()
+
+    def render(self, source: ImageSource,
+               full_size: Optional[Tuple[int, int]] = None) -> Dict[str, Dict[str, Rendition]]:
+        """
+        All renditions as `{name: {extension: Rendition}}`, in `sizes` order.
+
+        Pass `full_size` with an already-opened image that was put into
+        draft mode by the caller (see draft_for_boxes).
+        """
+        image, decoded_full_size = self.decode(source)
+        resized = self.resize_cascade(image, full_size or decoded_full_size)
+        renditions: Dict[str, Dict[str, Rendition]] = {}
+        for name in self.sizes:
+            image = resized[name]
+            renditions[name] = {
+                output_format.extension: Rendition(
+                    name=name,
+                    extension=output_format.extension,
+                    data=self.encode(image, output_format),
+                    dimensions=image.size,
+                    mime_type=output_format.mime_type
+                )
+                for output_format in self.formats
+            }
+        return renditions
@@ -0,0 +1,285 @@
+"""
+Sanity API Rate Limiting
+Sustainable Digital Nomads Directory - Sanity API Access
+
+Client-side throttling shared by every SanityClient / AsyncSanityClient call:
+token buckets give mutations, queries and asset uploads separate request
+budgets, and an AIMD concurrency limit grows while the API keeps up and
+backs off multiplicatively on 429s, server errors or rising latency.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from urllib3.util import Retry
+
+from migration_config import RATE_LIMIT_CONFIG
+
+# Request categories with independent budgets
+MUTATION = "mutation"
+QUERY = "query"
+ASSET = "asset"
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens, going into debt if needed.
+
+        Returns:
+            Seconds the caller must wait before its reservation is covered
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= tokens
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0):
+        """Block the calling thread until the tokens are available"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Wait for the tokens without blocking the event loop"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for the next `seconds` (e.g. after Retry-After)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit.
+
+    Every successful request completing under `latency_target` grows the
+    limit by 1/limit (about +1 per full window). A throttled, failed (5xx or
+    no response) or slow request shrinks it by `decrease_factor`, at most
+    once per `cooldown` seconds so a burst of 429s from one window only
+    counts once. Threads wait on a condition; coroutines on a future that
+    `release()` resolves from whichever thread frees the slot.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 decrease_factor: float = 0.5, latency_target: Optional[float] = None,
+                 cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.stats = {"increases": 0, "decreases": 0, "throttled": 0}
+
+        self._cond = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free"""
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Block the calling thread until a slot is free"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """Wait for a slot without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._cond:
+                    if (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                raise
+
+    def release(self, latency: Optional[float] = None, ok: bool = True):
+        """
+        Free a slot and adapt the limit: grow it only after a successful
+        request under the latency target, shrink it when the request failed
+        (`ok` False) or was slow
+        """
+        with self._cond:
+            self.in_flight -= 1
+            slow = self.latency_target is not None and latency is not None and latency > self.latency_target
+            if not ok or slow:
+                self._decrease()
+            elif self.limit < self.max_limit:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.stats["increases"] += 1
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def on_throttle(self):
+        """Back off after the API answered 429"""
+        with self._cond:
+            self.stats["throttled"] += 1
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+        self.stats["decreases"] += 1
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+class RequestSlot:
+    """
+    A held rate-limit slot, yielded by `limit()` / `limit_async()`.
+
+    Set `ok = False` when the API answered with a server error; an exception
+    leaving the block marks the request failed as well.
+    """
+
+    __slots__ = ("ok",)
+
+    def __init__(self):
+        self.ok = True
+
+class SanityRateLimiter:
+    """
+    Per-category token buckets plus one shared adaptive concurrency limit.
+
+    Wrap each API call in `limit(category)` (threads) or
+    `limit_async(category)` (coroutines) and mark 5xx responses on the
+    yielded RequestSlot; report 429s with `on_throttle()`.
+    """
+
+    def __init__(self, mutations_per_second: float = 25, queries_per_second: float = 100,
+                 asset_uploads_per_second: float = 10, burst_seconds: float = 1.0,
+                 concurrency: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.buckets: Dict[str, TokenBucket] = {
+            MUTATION: TokenBucket(mutations_per_second, mutations_per_second * burst_seconds),
+            QUERY: TokenBucket(queries_per_second, queries_per_second * burst_seconds),
+            ASSET: TokenBucket(asset_uploads_per_second, asset_uploads_per_second * burst_seconds),
+        }
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.request_counts = {category: 0 for category in self.buckets}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]] = None) -> 'SanityRateLimiter':
+        """Build a limiter from RATE_LIMIT_CONFIG-style settings"""
+        config = config or RATE_LIMIT_CONFIG
+        return cls(
+            mutations_per_second=config["mutations_per_second"],
+            queries_per_second=config["queries_per_second"],
+            asset_uploads_per_second=config["asset_uploads_per_second"],
+            burst_seconds=config["burst_seconds"],
+            concurrency=AdaptiveConcurrencyLimiter(
+                initial=config["initial_concurrency"],
+                min_limit=config["min_concurrency"],
+                max_limit=config["max_concurrency"],
+                latency_target=config["latency_target"]
+            )
+        )
+
+    @contextmanager
+    def limit(self, category: str) -> Iterator[RequestSlot]:
+        """Hold a token and a concurrency slot for the duration of one request"""
+        self.buckets[category].acquire()
+        self.concurrency.acquire()
+        self.request_counts[category] += 1
+        slot = RequestSlot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            slot.ok = False
+            raise
+        finally:
+            self.concurrency.release(time.monotonic() - start, slot.ok)
+
+    @asynccontextmanager
+    async def limit_async(self, category: str) -> AsyncIterator[RequestSlot]:
+        """Async counterpart of `limit()`"""
+        await self.buckets[category].acquire_async()
+        await self.concurrency.acquire_async()
+        self.request_counts[category] += 1
+        slot = RequestSlot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception:
+            slot.ok = False
+            raise
+        finally:
+            self.concurrency.release(time.monotonic() - start, slot.ok)
+
+    def on_throttle(self, category: Optional[str] = None, retry_after: Optional[float] = None):
+        """Record a 429: shrink concurrency and, given Retry-After, pause the category's bucket"""
+        self.concurrency.on_throttle()
+        if category and retry_after:
+            self.buckets[category].pause(retry_after)
+
+class ThrottleAwareRetry(Retry):
+    """
+    urllib3 Retry that reports every 429 it retries to a SanityRateLimiter.
+
+    Without this, throttled attempts retried inside urllib3 would never be
+    seen by the limiter.
+    """
+
+    def __init__(self, *args, rate_limiter: Optional[SanityRateLimiter] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    def new(self, **kwargs) -> 'ThrottleAwareRetry':
+        retry = super().new(**kwargs)
+        retry.rate_limiter = self.rate_limiter
+        return retry
+
+    def is_retry(self, method, status_code, has_retry_after=False) -> bool:
+        # A 429 means the request was rejected unprocessed, so even POST
+        # mutations and uploads (not retried by urllib3 by default) are safe to resend
+        if status_code == 429 and self.status_forcelist and 429 in self.status_forcelist:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if self.rate_limiter is not None and response is not None and response.status == 429:
+            self.rate_limiter.on_throttle()
+        return super().increment(method=method, url=url, response=response, error=error,
+                                 _pool=_pool, _stacktrace=_stacktrace)
@@ -2,16 +2,41 @@
 Offline Migration Test Script (Workstream 3.1/3.2)
 
 Tests the migration logic without requiring Sanity API connection.
-Validates data transformation, image path resolution, and document structure.
+Validates data transformation, image path resolution, and document structure,
+and exercises SanityClient batching and retries against the local fake API.
 """
 
+import asyncio
+import io
 import json
+import sqlite3
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from pathlib import Path
 
 # Import functions from the main migration script
 sys.path.append(str(Path(__file__).parent))
-from migrate_listings_to_sanity import find_image_path, slugify_for_sanity_id, get_content_type
+from migrate_listings_to_sanity import (
+    find_image_path, get_content_type, SanityAPIError, SanityClient, upload_image_asset
+)
+from listing_transformer import LISTING_TRANSFORMER
+from fake_sanity_server import FakeSanityServer
+from asset_cache import AssetUploadCache
+from derivative_cache import DerivativeCache
+from image_index import ImageIndex, search_roots
+from image_dedupe import BKTree, ImageFingerprint, dedupe_listings, find_near_duplicates, hamming
+from PIL import Image, ImageDraw
+from migration_recovery import (
+    CircuitBreaker, CircuitOpenError, MigrationErrorType, MigrationLogger, MigrationStatus,
+    RetryPolicy, create_migration_error, retry_on_error
+)
+from migration_state_store import SQLiteStateStore
+from sanity_rate_limit import QUERY, AdaptiveConcurrencyLimiter, SanityRateLimiter
+from image_processing_pipeline import ProcessedImage, SanityImageUploader
 
 # --- Configuration ---
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -40,20 +65,24 @@ def test_data_transformation():
     success_count = 0
     error_count = 0
 
+    # Transform all listings through the shared field mapping
+    transformed = LISTING_TRANSFORMER.transform_all(test_listings)
+
     for index, listing in enumerate(test_listings):
         print(f"Processing listing {index + 1}: {listing.get('name', 'N/A')}")
 
         try:
-            # Test ID generation
-            doc_id_base = listing.get('slug') or listing.get('id') or listing.get('name')
-            doc_id = slugify_for_sanity_id(doc_id_base)
+            # Test ID generation and field mapping
+            sanity_doc, warnings = transformed[index]
 
-            if not doc_id:
+            if sanity_doc is None:
                 print(f"  ❌ Invalid ID generation for: {listing.get('name', 'N/A')}")
                 error_count += 1
                 continue
 
-            print(f"  📋 Document ID: {doc_id}")
+            print(f"  📋 Document ID: {sanity_doc['_id']}")
+            for warning in warnings:
+                print(f"  ⚠️ {warning.strip()}")
 
             # Test image path resolution
             main_image = listing.get("primary_image_url")
@@ -76,23 +105,13 @@ def test_data_transformation():
                 print(f"  🖼️  Gallery images: {found_gallery}/{len(gallery_images)} found")
 
             # Test coordinate parsing
-            coords = listing.get("coordinates")
-            if coords and isinstance(coords, dict):
-                try:
-                    lat = float(coords.get("latitude", 0))
-                    lng = float(coords.get("longitude", 0))
-                    print(f"  📍 Location: {lat}, {lng}")
-                except (ValueError, TypeError):
-                    print(f"  ⚠️  Invalid coordinates: {coords}")
+            location = sanity_doc.get("location")
+            if location:
+                print(f"  📍 Location: {location['lat']}, {location['lng']}")
 
             # Test sustainability rating
-            s_rating = listing.get("sustainability_rating")
-            if s_rating is not None:
-                try:
-                    rating = float(s_rating)
-                    print(f"  🌱 Sustainability rating: {rating}")
-                except (ValueError, TypeError):
-                    print(f"  ⚠️  Invalid sustainability rating: {s_rating}")
+            if "sustainabilityRating" in sanity_doc:
+                print(f"  🌱 Sustainability rating: {sanity_doc['sustainabilityRating']}")
 
             print(f"  ✅ Document structure valid\n")
             success_count += 1
@@ -108,6 +127,490 @@ def test_data_transformation():
 
     return error_count == 0
 
+def test_client_against_fake_server():
+    """Batch commit, bulk lookup, query, asset upload and 429 retry against the fake Sanity API"""
+    print("=== Fake Sanity API Test ===\n")
+
+    with FakeSanityServer(token="offline-token", retry_after=0) as server:
+        client = SanityClient("offline", "test", "offline-token", "2025-05-24", api_host=server.url)
+
+        with client.batch(max_mutations=3) as batch:
+            for i in range(7):
+                batch.create({"_id": f"listing-{i}", "_type": "listing", "name": f"Listing {i}"}, key=i)
+        print(f"Committed {len(batch.results)} documents in {batch.transactions_committed} transactions")
+        assert len(batch.results) == 7 and not batch.errors
+        assert batch.transactions_committed == 3
+
+        revisions = client.get_many([f"listing-{i}" for i in range(9)])
+        assert sorted(revisions) == [f"listing-{i}" for i in range(7)]
+
+        # A create conflicting with an existing ID fails only its own key
+        with client.batch() as batch:
+            batch.create({"_id": "listing-0", "_type": "listing"}, key="duplicate")
+            batch.create({"_id": "listing-new", "_type": "listing"}, key="new")
+        assert list(batch.errors) == ["duplicate"] and "new" in batch.results
+
+        # Default keys never reuse an explicit key
+        with client.batch() as batch:
+            batch.patch("listing-1", {"name": "Listing 1"}, key=1)
+            batch.patch("listing-0", {"name": "Listing 0"})
+            batch.patch("listing-2", {"name": "Listing 2"})
+        assert sorted(batch.results) == [0, 1, 2] and not batch.errors
+
+        # Errors that aren't about specific mutations are raised, not retried one by one
+        mutate_requests = server.stats["requests:data/mutate"]
+        server.fail_next(1, status=401)
+        try:
+            with client.batch() as batch:
+                for i in range(3):
+                    batch.create({"_id": f"unauthorized-{i}", "_type": "listing"}, key=i)
+            assert False, "401 should be raised"
+        except SanityAPIError:
+            assert sorted(batch.errors) == [0, 1, 2]
+        assert server.stats["requests:data/mutate"] == mutate_requests + 1
+
+        ids = client.query("*[_type == $type]{_id}", {"type": "listing"})
+        assert len(ids) == 8
+
+        server.fail_next(1, status=429)
+        asset = client.assets_upload(b"\xff\xd8 offline image", "image/jpeg", "offline.jpg")
+        print(f"Uploaded asset {asset['_id']} after a throttled attempt")
+        assert asset["_id"].startswith("image-")
+        assert server.stats["throttled"] == 1 and server.stats["assets_uploaded"] == 1
+
+    print("✅ Fake API round trip passed\n")
+    return True
+
+def test_image_index_snapshot():
+    """Image index priority order and incremental refresh from a snapshot"""
+    print("=== Image Index Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        roots = search_roots(tmp_path / "staging", tmp_path / "public")
+        for relative in ("staging/images/listings/cafe.jpg", "staging/optimized/cafe.webp",
+                         "public/images/listings/cafe.jpg", "public/images/listings/hostel.png"):
+            (tmp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+            (tmp_path / relative).write_bytes(b"image")
+
+        index = ImageIndex(roots).build()
+        assert index.resolve("/listings/cafe.jpg") == tmp_path / "staging/optimized/cafe.webp"
+        assert index.resolve("/images/listings/hostel.png") == tmp_path / "public/images/listings/hostel.png"
+        assert index.resolve("https://example.com/cafe.jpg") is None
+        assert index.lookup("/images/listings/hostel.png").size == 5
+
+        snapshot_file = tmp_path / "image_index.json"
+        index.save(snapshot_file)
+        (tmp_path / "public/images/listings/cowork.webp").write_bytes(b"new image")
+
+        refreshed = ImageIndex.from_snapshot(snapshot_file, roots)
+        assert refreshed.resolve("/images/listings/cowork.webp") == tmp_path / "public/images/listings/cowork.webp"
+        # Only the directory that gained a file is listed again
+        assert refreshed.stats["scanned"] == 1
+
+        # Case-insensitive filesystems match any spelling; directory symlinks
+        # are followed, and a link back to an ancestor doesn't loop
+        (tmp_path / "public/images/listings/loop").symlink_to(tmp_path / "public/images")
+        (tmp_path / "shared").mkdir()
+        (tmp_path / "shared/map.png").write_bytes(b"image")
+        (tmp_path / "public/linked").symlink_to(tmp_path / "shared")
+        folded = ImageIndex(roots, case_insensitive=True).build()
+        assert folded.resolve("/Images/Listings/HOSTEL.png") == tmp_path / "public/images/listings/hostel.png"
+        assert folded.resolve("/linked/map.png") == tmp_path / "public/linked/map.png"
+        assert ImageIndex(roots, case_insensitive=False).build().resolve("/images/listings/HOSTEL.png") is None
+        print(f"Indexed {len(refreshed)} files, {refreshed.stats['reused']} directories reused from snapshot")
+
+    print("✅ Image index passed\n")
+    return True
+
+def test_image_dedupe():
+    """Near-duplicate detection across listings and BK-tree range search"""
+    print("=== Image Dedupe Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        photo = Image.new("RGB", (640, 480), "white")
+        ImageDraw.Draw(photo).ellipse((100, 80, 500, 400), fill="darkgreen")
+        other = Image.new("RGB", (640, 480), "white")
+        ImageDraw.Draw(other).rectangle((0, 0, 320, 480), fill="navy")
+
+        photo.save(tmp_path / "original.jpg", quality=95)
+        photo.resize((320, 240)).save(tmp_path / "resized.jpg", quality=60)
+        other.save(tmp_path / "other.png")
+
+        listings = [
+            {"id": "a", "primary_image_url": "original.jpg", "gallery_image_urls": ["resized.jpg", "other.png"]},
+            {"id": "b", "primary_image_url": "resized.jpg", "gallery_image_urls": []},
+        ]
+        report = dedupe_listings(listings, lambda ref: tmp_path / ref, collapse=True)
+        assert report["duplicate_images"] == 1
+        assert report["groups"][0]["keep"] == "original.jpg"
+        assert report["groups"][0]["listings"] == ["a", "b"]
+        assert listings[0]["gallery_image_urls"] == ["original.jpg", "other.png"]
+        assert listings[1]["primary_image_url"] == "original.jpg"
+
+    # A chain a~b~c with a and c out of range: c is not collapsed onto a
+    chain = {"a.jpg": (0, 400), "b.jpg": (0xF, 300), "c.jpg": (0xFF, 200)}
+    cache = SimpleNamespace(fingerprint=lambda path: ImageFingerprint(path, *chain[path.name], 1))
+    groups, _ = find_near_duplicates([Path(name) for name in chain], threshold=5, hash_cache=cache)
+    assert [(group.keep, group.duplicates, group.max_distance) for group in groups] == \
+        [(Path("a.jpg"), [Path("b.jpg")], 4)]
+
+    tree = BKTree()
+    hashes = [0, 0b1, 0b111, 0xFF, 0xFFFF]
+    for value in hashes:
+        tree.add(value, value)
+    found = sorted(item for _, item in tree.search(0b11, 2))
+    assert found == [value for value in hashes if hamming(value, 0b11) <= 2]
+
+    print("✅ Image dedupe passed\n")
+    return True
+
+def test_migration_state_journal():
+    """Migration state survives a restart via snapshot plus journal replay"""
+    print("=== Migration State Journal Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp)
+        migration_logger = MigrationLogger(log_dir, "journal_test", snapshot_interval=5,
+                                           background_writes=False)
+        for i in range(8):
+            migration_logger.add_item(f"image_{i}", "image", {"path": f"{i}.jpg"})
+        migration_logger.update_item_status("image_0", MigrationStatus.SUCCESS)
+        error = create_migration_error(MigrationErrorType.NETWORK_ERROR, "timeout", {"image": 1})
+        migration_logger.update_item_status("image_1", MigrationStatus.FAILED, error)
+        migration_logger.state_store.close()
+
+        restored = MigrationLogger(log_dir, "restart")
+        assert restored.load_state("journal_test")
+        items = restored.migration_state["items"]
+        assert len(items) == 8
+        assert items["image_0"].status == MigrationStatus.SUCCESS
+        assert items["image_1"].errors[0].error_type == MigrationErrorType.NETWORK_ERROR
+        assert restored.migration_state["statistics"] == migration_logger.migration_state["statistics"]
+        assert [item.item_id for item in restored.get_failed_items()] == ["image_1"]
+
+        # Written by the background writer, persisted by finalize_session's flush
+        restored.update_item_status("image_2", MigrationStatus.SKIPPED)
+        restored.finalize_session()
+        reloaded = MigrationLogger(log_dir, "reload")
+        assert reloaded.load_state("journal_test")
+        assert reloaded.get_item("image_2").status == MigrationStatus.SKIPPED
+        assert reloaded.migration_state["status"] == "completed"
+        reloaded.close()
+        # Closed last: its final checkpoint would have replaced the journal replayed above
+        migration_logger.close()
+        print(f"Replayed {len(items)} items from snapshot + journal")
+
+    print("✅ Migration state journal passed\n")
+    return True
+
+def test_sqlite_state_store():
+    """SQLite state backend: indexed status queries and resuming a session"""
+    print("=== SQLite State Store Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp)
+        migration_logger = MigrationLogger(log_dir, "sqlite_test",
+                                           state_store=SQLiteStateStore(log_dir / "state.db", batch_size=3))
+        for i in range(6):
+            migration_logger.add_item(f"item_{i}", "image" if i % 2 else "listing", {"index": i})
+        network = create_migration_error(MigrationErrorType.NETWORK_ERROR, "timeout", {})
+        invalid = create_migration_error(MigrationErrorType.VALIDATION_ERROR, "bad data", {}, is_recoverable=False)
+        migration_logger.update_item_status("item_1", MigrationStatus.FAILED, network)
+        migration_logger.update_item_status("item_2", MigrationStatus.FAILED, invalid)
+        migration_logger.update_item_status("item_3", MigrationStatus.SUCCESS)
+        migration_logger.save_state()
+
+        assert "items" not in migration_logger.migration_state
+        assert sorted(item.item_id for item in migration_logger.get_failed_items()) == ["item_1", "item_2"]
+        assert [item.item_id for item in migration_logger.get_retryable_items()] == ["item_1"]
+        assert [item.item_id for item in migration_logger.get_items_by_type(
+            "image", [MigrationStatus.SUCCESS])] == ["item_3"]
+
+        resumed = MigrationLogger(log_dir, "resume", state_store=SQLiteStateStore(log_dir / "state.db"))
+        assert resumed.load_state("sqlite_test")
+        assert resumed.migration_state["statistics"] == migration_logger.migration_state["statistics"]
+        assert resumed.get_item("item_2").errors[0].error_type == MigrationErrorType.VALIDATION_ERROR
+        resumed.update_item_status("item_1", MigrationStatus.SUCCESS)
+        assert resumed.get_item("item_1").attempts == 2
+
+        # Status changes to items the store already has don't read the database
+        get_item = resumed.state_store.get_item
+        resumed.flush()
+        resumed.state_store.get_item = None
+        resumed.update_item_status("item_5", MigrationStatus.FAILED, invalid)
+        resumed.state_store.get_item = get_item
+        assert resumed.get_item("item_5").errors[-1].message == "bad data"
+        assert resumed.get_retryable_items() == []
+
+        # A failed write keeps the batch queued and its items readable
+        put_items = resumed.state_store.put_items
+        def failing_put_items(batch):
+            raise sqlite3.OperationalError("database is locked")
+        resumed.state_store.put_items = failing_put_items
+        resumed.update_item_status("item_4", MigrationStatus.SKIPPED)
+        resumed.flush()
+        assert resumed.get_item("item_4").status == MigrationStatus.SKIPPED
+        resumed.state_store.put_items = put_items
+        resumed.flush()
+        assert resumed.state_store.get_item("item_4").status == MigrationStatus.SKIPPED
+        resumed.finalize_session()
+        print(f"Resumed session with {resumed.migration_state['statistics']['total_items']} items")
+
+    print("✅ SQLite state store passed\n")
+    return True
+
+def test_queued_logging():
+    """Listener-thread logging: NDJSON sink and rate-limited console lines"""
+    print("=== Queued Logging Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp)
+        migration_logger = MigrationLogger(log_dir, "log_test", structured_log=True,
+                                           console_summary_interval=60)
+        console = migration_logger.log_listener.handlers[2]
+        console.stream = io.StringIO()
+        for i in range(50):
+            migration_logger.add_item(f"item_{i}", "listing", {})
+            migration_logger.update_item_status(f"item_{i}", MigrationStatus.SUCCESS)
+        error = create_migration_error(MigrationErrorType.NETWORK_ERROR, "timeout", {})
+        migration_logger.update_item_status("item_0", MigrationStatus.FAILED, error)
+        migration_logger.close()
+
+        records = [json.loads(line) for line in open(log_dir / "log_test_log.ndjson", encoding="utf-8")]
+        assert sum(1 for record in records if record.get("status") == "success") == 50
+        assert [record["error_type"] for record in records if record["level"] == "ERROR"] == ["network_error"]
+        console_lines = console.stream.getvalue().splitlines()
+        assert sum("-> success" in line for line in console_lines) == 1
+        assert "... 49 more item events" in console_lines
+        assert any("Error for item item_0: timeout" in line for line in console_lines)
+        print(f"{len(records)} structured records, {len(console_lines)} console lines")
+
+    print("✅ Queued logging passed\n")
+    return True
+
+def test_retry_policy():
+    """retry_on_error: awaited retries, Retry-After, error classification, circuit breaker"""
+    print("=== Retry Policy Test ===\n")
+
+    def api_error(status, headers=None):
+        response = SimpleNamespace(status_code=status, headers=headers or {})
+        return SanityAPIError(f"API request failed: {status}", response=response)
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    policy = RetryPolicy(max_attempts=3, base_delay=0, circuit_breaker=breaker)
+    calls = []
+
+    @retry_on_error(policy=policy)
+    async def upload(errors):
+        calls.append(errors[0] if errors else None)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    # Throttled, then the server is briefly unavailable: retried and awaited
+    errors = [api_error(429, {"retry-after": "0"}), api_error(503)]
+    assert asyncio.run(upload(errors)) == "ok" and len(calls) == 3
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    # Client errors are not retried
+    calls.clear()
+    try:
+        asyncio.run(upload([api_error(400)]))
+        assert False, "400 should not be retried"
+    except SanityAPIError:
+        assert len(calls) == 1
+
+    # Three consecutive server errors open the circuit; later calls fail fast
+    calls.clear()
+    for expected in (SanityAPIError, CircuitOpenError):
+        try:
+            asyncio.run(upload([api_error(502) for _ in range(3)]))
+            assert False, "call should have failed"
+        except expected:
+            pass
+    assert breaker.state == CircuitBreaker.OPEN and len(calls) == 3
+    print(f"Circuit opened after {breaker.failures} failures")
+
+    # A client error on the half-open trial call still shows the API is up
+    breaker._opened_at -= breaker.reset_timeout
+    try:
+        asyncio.run(upload([api_error(400)]))
+    except SanityAPIError:
+        pass
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.failures == 0
+
+    attempts = []
+
+    @retry_on_error(policy=RetryPolicy(base_delay=0))
+    def sync_call():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise ConnectionError("connection reset")
+        return len(attempts)
+
+    assert sync_call() == 2
+
+    print("✅ Retry policy passed\n")
+    return True
+
+def test_asset_cache_concurrent_saves():
+    """AssetUploadCache autosave from many threads at once"""
+    print("=== Asset Cache Concurrency Test ===\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = Path(tmp) / "asset_cache.json"
+        cache = AssetUploadCache(cache_file, autosave_every=1)
+
+        def store(worker):
+            for i in range(50):
+                cache.put(f"{worker}-{i}", f"image-{worker}-{i}")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(store, range(8)))
+        cache.save()
+
+        assert len(AssetUploadCache(cache_file).entries) == 400
+        assert [path.name for path in Path(tmp).iterdir()] == ["asset_cache.json"]
+        print(f"{cache.stats['stored']} entries stored from 8 threads")
+
+    print("✅ Asset cache concurrency passed\n")
+    return True
+
+def test_inflight_upload_dedupe():
+    """Identical images uploaded concurrently reach the API only once"""
+    print("=== In-flight Upload Dedupe Test ===\n")
+
+    class SlowClient:
+        def __init__(self):
+            self.uploads = 0
+
+        def assets_upload(self, image_path, content_type, filename):
+            self.uploads += 1
+            time.sleep(0.1)
+            return {"_id": f"image-{self.uploads}"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for name in ("main.jpg", "gallery_copy.jpg"):
+            paths.append(Path(tmp) / name)
+            paths[-1].write_bytes(b"same image bytes")
+        client = SlowClient()
+        cache = AssetUploadCache(Path(tmp) / "asset_cache.json")
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assets = list(pool.map(lambda path: upload_image_asset(client, path, cache, log=lambda line: None),
+                                   paths * 2))
+        assert client.uploads == 1
+        assert {asset["_id"] for asset in assets} == {"image-1"}
+        print(f"{len(assets)} concurrent requests, {client.uploads} upload")
+
+    print("✅ In-flight upload dedupe passed\n")
+    return True
+
+def test_upload_retry_bookkeeping():
+    """An upload that succeeds on retry is recorded as retried, not failed"""
+    print("=== Upload Retry Bookkeeping Test ===\n")
+
+    class FlakyClient:
+        def __init__(self):
+            self.calls = 0
+
+        async def assets_upload(self, data, mime_type, filename):
+            self.calls += 1
+            if self.calls == 1:
+                raise SanityAPIError("API request failed: 503",
+                                     response=SimpleNamespace(status_code=503, headers={}))
+            return {"_id": "image-abc"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        migration_logger = MigrationLogger(Path(tmp), "upload_retry", background_writes=False)
+        uploader = SanityImageUploader(FlakyClient(), migration_logger)
+        uploader.retry_policy = RetryPolicy(base_delay=0, circuit_breaker=CircuitBreaker())
+        processed = ProcessedImage(Path("cafe.jpg"), b"bytes", "JPEG", "image/jpeg", (1, 1), 5, "0123456789ab")
+
+        result = asyncio.run(uploader.upload_image(processed))
+        assert result["asset"]["_ref"] == "image-abc"
+        assert uploader.upload_stats["successful_uploads"] == 1
+        assert uploader.upload_stats["failed_uploads"] == 0
+        stats = migration_logger.migration_state["statistics"]
+        assert (stats["successful"], stats["failed"], stats["retried"]) == (1, 0, 1)
+        assert migration_logger.migration_state["errors_by_type"] == {}
+        migration_logger.close()
+        print(f"Statistics after retry: {stats}")
+
+    print("✅ Upload retry bookkeeping passed\n")
+    return True
+
+def test_derivative_cache():
+    """Derivative cache hits, misses and LRU eviction shared between processes"""
+    print("=== Derivative Cache Test ===\n")
+
+    def disk_bytes(directory):
+        return sum(path.stat().st_size for path in Path(directory).rglob("*") if path.is_file())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DerivativeCache(Path(tmp), max_bytes=2000)
+        assert cache.get("a" * 64) is None
+        cache.put("a" * 64, b"x" * 100, b"t" * 10, {"format": "WEBP"})
+        data, thumbnail, info = cache.get("a" * 64)
+        assert (data, thumbnail, info["format"]) == (b"x" * 100, b"t" * 10, "WEBP")
+        assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+        # Two instances stand in for two worker processes sharing the directory
+        other = DerivativeCache(Path(tmp), max_bytes=2000)
+        for i in range(40):
+            (cache if i % 2 else other).put(f"{i:064x}", b"y" * 100, None, {})
+            cache.get("a" * 64)  # most recently used, so never the victim
+        assert cache.get("a" * 64) is not None
+        assert cache.get(f"{0:064x}") is None
+        assert disk_bytes(tmp) <= 2000 + 200
+        print(f"{disk_bytes(tmp)} bytes on disk after {cache.stats['evicted'] + other.stats['evicted']} evictions")
+
+    print("✅ Derivative cache passed\n")
+    return True
+
+def test_adaptive_concurrency():
+    """AIMD limit: grows only on success, shrinks on server errors; async waiters are woken"""
+    print("=== Adaptive Concurrency Test ===\n")
+
+    limiter = SanityRateLimiter(concurrency=AdaptiveConcurrencyLimiter(initial=1, max_limit=4, cooldown=0))
+    concurrency = limiter.concurrency
+    with limiter.limit(QUERY):
+        pass
+    assert concurrency.limit == 2.0
+    with limiter.limit(QUERY) as slot:
+        slot.ok = False  # e.g. a 503
+    assert concurrency.limit == 1.0 and concurrency.stats["decreases"] == 1
+    try:
+        with limiter.limit(QUERY):
+            raise ConnectionError("connection reset")
+    except ConnectionError:
+        pass
+    assert concurrency.stats["increases"] == 1 and concurrency.stats["decreases"] == 2
+
+    # A coroutine waiting for the only slot is woken by a release from another thread
+    async def wait_for_slot():
+        concurrency.acquire()
+        threading.Timer(0.05, concurrency.release).start()
+        started = time.monotonic()
+        await concurrency.acquire_async()
+        concurrency.release()
+        return time.monotonic() - started
+    waited = asyncio.run(wait_for_slot())
+    assert 0.03 < waited < 1.0 and concurrency.in_flight == 0
+
+    print(f"Async waiter woken after {waited * 1000:.0f}ms")
+    print("✅ Adaptive concurrency passed\n")
+    return True
+
 if __name__ == "__main__":
-    success = test_data_transformation()
+    success = (test_data_transformation() and test_client_against_fake_server()
+               and test_image_index_snapshot() and test_image_dedupe()
+               and test_migration_state_journal() and test_sqlite_state_store()
+               and test_queued_logging() and test_retry_policy()
+               and test_asset_cache_concurrent_saves() and test_inflight_upload_dedupe()
+               and test_upload_retry_bookkeeping() and test_derivative_cache()
+               and test_adaptive_concurrency())
     exit(0 if success else 1)